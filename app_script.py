@@ -1,6 +1,11 @@
 import argparse
+import asyncio
+import multiprocessing
 import os
-from typing import Optional
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Awaitable, Callable, NamedTuple, Optional
 from dotenv import load_dotenv
 import logging
 from langchain_openai.chat_models import AzureChatOpenAI
@@ -14,11 +19,14 @@ from src.config_utils import (
     read_config_query,
     read_config_scopes,
 )
-from src.paper_query.pubmed_query import (
-    query_count,
-    query_pmids,
-)
-from src.workflow.identify_workflow import IdentifyWorkflow, identify_workflow
+from src.paper_query.pubmed_query import PubMedPaperRetriever
+from src.workflow.identify_workflow import IdentifyWorkflow, PaperUnavailableError, aidentify_workflow, identify_workflow
+from src.agents.identify_abstract_relevance_step import DEFAULT_ABSTRACT_RELEVANCE_THRESHOLD
+from src.agents.llm_cache import set_llm_cache
+from src.database.run_state_db import RunStateDB
+from src.database.llm_cache_db import DEFAULT_LLM_CACHE_MAX_MB, DEFAULT_LLM_CACHE_TTL_DAYS, LLMCacheDB
+from src.paper_query.http_session import aclose_async_client
+from src.workflow.concurrent_utils import aordered_concurrent_map, ordered_concurrent_map
 from src.log_utils import initialize_logger
 
 load_dotenv()
@@ -48,6 +56,7 @@ def output_info(msg: str):
     logger.info(msg)
 
 g_token_usage = {**DEFAULT_TOKEN_USAGE}
+g_token_usage_lock = threading.Lock()
 def output_step(
     step_name: Optional[str] = None,
     step_description: Optional[str] = None,
@@ -64,8 +73,9 @@ def output_step(
     if token_usage is not None:
         usage_str = f"step total tokens: {token_usage['total_tokens']}, step prompt tokens: {token_usage['prompt_tokens']}, step completion tokens: {token_usage['completion_tokens']}"
         output_info(usage_str)
-        g_token_usage = increase_token_usage(g_token_usage, token_usage)
-        usage_str = f"overall total tokens: {g_token_usage['total_tokens']}, overall prompt tokens: {g_token_usage['prompt_tokens']}, overall completion tokens: {g_token_usage['completion_tokens']}"
+        with g_token_usage_lock:
+            g_token_usage = increase_token_usage(g_token_usage, token_usage)
+            usage_str = f"overall total tokens: {g_token_usage['total_tokens']}, overall prompt tokens: {g_token_usage['prompt_tokens']}, overall completion tokens: {g_token_usage['completion_tokens']}"
         output_info(usage_str)
     if step_reasoning_process is not None:
         output_info(f"\n\n{step_reasoning_process}\n\n")
@@ -83,6 +93,115 @@ def output_collect_result(
         else:
             f.write(f"{pmid} is NOT relevant to {scope}.\n")
 
+def create_html_executor(html_processes: int):
+    """
+    A process pool for html to plaintext conversion, or a null context if html_processes is 0.
+    At most one html document per worker (or coroutine) is in flight, which bounds the pool's queue.
+    The pool processes are started lazily from the worker threads (or the event loop), so they are
+    spawned: forking a multi-threaded process can deadlock the child on locks held by other threads.
+    """
+    if html_processes > 0:
+        return ProcessPoolExecutor(max_workers=html_processes, mp_context=multiprocessing.get_context("spawn"))
+    return nullcontext()
+
+def create_llm_cache() -> LLMCacheDB:
+    """
+    The llm response cache, the entries expire after $LLM_CACHE_TTL_DAYS days
+    and the cache is kept below $LLM_CACHE_MAX_MB MB.
+    """
+    return LLMCacheDB(
+        ttl_days=float(os.environ.get("LLM_CACHE_TTL_DAYS", DEFAULT_LLM_CACHE_TTL_DAYS)),
+        max_mb=float(os.environ.get("LLM_CACHE_MAX_MB", DEFAULT_LLM_CACHE_MAX_MB)),
+    )
+
+# the run state stage of a whole identify workflow run
+IDENTIFY_STAGE = "identify"
+
+def split_finished_pmids(
+    run_state: RunStateDB,
+    scope: str,
+    pmids: list[str],
+    resume: bool,
+) -> tuple[dict[str, bool], list[str]]:
+    """
+    Split the PMIDs into the ones a previous run of the scope has finished (with their results)
+    and the ones to process. Nothing is finished unless resuming, failed PMIDs are processed again.
+    """
+    if not resume:
+        return {}, pmids
+    finished_states = run_state.select_finished(scope, IDENTIFY_STAGE)
+    finished = {pmid: finished_states[pmid] for pmid in pmids if pmid in finished_states}
+    logger.info(f"Resuming {scope}: {len(finished)} PMIDs finished before, {len(pmids) - len(finished)} to process")
+    return finished, [pmid for pmid in pmids if pmid not in finished]
+
+def identify_with_run_state(
+    run_state: RunStateDB,
+    scope: str,
+    pmid: str,
+    identify: Callable[[], bool],
+) -> Optional[bool]:
+    """
+    Run identify() and record it in the run state. A paper that couldn't be retrieved is recorded
+    as failed, not as a negative result, so that --resume retries it.
+    Returns:
+        bool: The result of identify(), None if it raised.
+    """
+    run_state.mark_started(scope, pmid, IDENTIFY_STAGE)
+    try:
+        valid = identify()
+    except PaperUnavailableError as e:
+        logger.warning(f"PMID {pmid} failed in {scope}: {e}")
+        run_state.mark_failed(scope, pmid, IDENTIFY_STAGE, str(e))
+        return None
+    except Exception as e:
+        # one failing paper doesn't stop the run, it is retried by --resume
+        logger.exception(f"PMID {pmid} failed in {scope}: {e}")
+        run_state.mark_failed(scope, pmid, IDENTIFY_STAGE, repr(e))
+        return None
+    run_state.mark_done(scope, pmid, IDENTIFY_STAGE, valid)
+    return valid
+
+async def aidentify_with_run_state(
+    run_state: RunStateDB,
+    scope: str,
+    pmid: str,
+    aidentify: Callable[[], Awaitable[bool]],
+) -> Optional[bool]:
+    """
+    See identify_with_run_state, the run state is written in worker threads to keep
+    its sqlite writes off the event loop.
+    """
+    await asyncio.to_thread(run_state.mark_started, scope, pmid, IDENTIFY_STAGE)
+    try:
+        valid = await aidentify()
+    except PaperUnavailableError as e:
+        logger.warning(f"PMID {pmid} failed in {scope}: {e}")
+        await asyncio.to_thread(run_state.mark_failed, scope, pmid, IDENTIFY_STAGE, str(e))
+        return None
+    except Exception as e:
+        logger.exception(f"PMID {pmid} failed in {scope}: {e}")
+        await asyncio.to_thread(run_state.mark_failed, scope, pmid, IDENTIFY_STAGE, repr(e))
+        return None
+    await asyncio.to_thread(run_state.mark_done, scope, pmid, IDENTIFY_STAGE, valid)
+    return valid
+
+class ScopeConfig(NamedTuple):
+    query: str
+    mindate: str
+    maxdate: str
+    identify_original_instructions: str
+    identify_relevant_instructions: str
+
+def read_scope_config(scope: str) -> ScopeConfig:
+    query, mindate, maxdate = read_config_query(scope)
+    return ScopeConfig(
+        query=query,
+        mindate=mindate,
+        maxdate=maxdate,
+        identify_original_instructions=read_config_identify_original_instructions(scope),
+        identify_relevant_instructions=read_config_identify_relevant_instructions(scope),
+    )
+
 def execute_collection(
     scope: str,
     query: str,
@@ -90,48 +209,335 @@ def execute_collection(
     maxdate: str,
     identify_original_instructions: str,
     identify_relevant_instructions: str,
+    max_workers: int = 1,
+    html_processes: int = 0,
+    workflow_options: Optional[dict] = None,
+    resume: bool = False,
 ): 
-    count = query_count(query, mindate, maxdate)
-    logger.info(f"Total articles found: {count}")
-    pmids = query_pmids(query, count, mindate, maxdate)
-    all_pmids = []
+    """
+    Run one scope, see execute_scopes.
+    Returns:
+        list: The relevant PMIDs.
+    """
+    scope_config = ScopeConfig(query, mindate, maxdate, identify_original_instructions, identify_relevant_instructions)
+    return _execute_scopes(
+        {scope: scope_config},
+        max_workers=max_workers,
+        html_processes=html_processes,
+        workflow_options=workflow_options,
+        resume=resume,
+    )[scope]
+
+async def aexecute_collection(
+    scope: str,
+    query: str,
+    mindate: str,
+    maxdate: str,
+    identify_original_instructions: str,
+    identify_relevant_instructions: str,
+    max_concurrency: int = 1,
+    html_processes: int = 0,
+    workflow_options: Optional[dict] = None,
+    resume: bool = False,
+):
+    """
+    Run one scope as coroutines in one event loop, see execute_scopes.
+    """
+    scope_config = ScopeConfig(query, mindate, maxdate, identify_original_instructions, identify_relevant_instructions)
+    valid_pmids = await _aexecute_scopes(
+        {scope: scope_config},
+        max_concurrency=max_concurrency,
+        html_processes=html_processes,
+        workflow_options=workflow_options,
+        resume=resume,
+    )
+    return valid_pmids[scope]
+
+def output_collection_summary(
+    scope: str,
+    all_pmids: list[str],
+    valid_pmids: list[str],
+    failed_pmids: Optional[list[str]] = None,
+):
+    logger.info("=" * 64)
+    logger.info(f"Final Result: {scope}")
+    logger.info(f"Query results number: {len(all_pmids)}, Total relevant PMIDs: {len(valid_pmids)}")
+    logger.info(f"Relevant PMIDs: {valid_pmids}")
+    if failed_pmids:
+        logger.info(f"Failed PMIDs ({len(failed_pmids)}), rerun with --resume to retry them: {failed_pmids}")
+
+def query_scopes_pmids(scope_configs: dict[str, ScopeConfig]) -> dict[str, list[str]]:
+    """
+    Query the PMIDs of every scope, prefetch their titles and abstracts and resolve their article ids,
+    papers found by several scopes are fetched once.
+    """
+    paper_retriever = PubMedPaperRetriever()
+    scopes_pmids = {}
+    for scope, scope_config in scope_configs.items():
+        pmids, webenv, query_key = paper_retriever.query_pmids_with_history(
+            scope_config.query, scope_config.mindate, scope_config.maxdate,
+        )
+        logger.info(f"Total articles found for {scope}: {len(pmids)}")
+        paper_retriever.prefetch_title_abstracts(pmids, webenv=webenv, query_key=query_key)
+        paper_retriever.resolve_article_ids(pmids)
+        scopes_pmids[scope] = pmids
+    return scopes_pmids
+
+def split_scopes_pmids(
+    run_state: RunStateDB,
+    scopes_pmids: dict[str, list[str]],
+    resume: bool,
+) -> tuple[dict[str, dict[str, bool]], dict[str, list[str]]]:
+    """
+    Returns:
+        tuple: The finished PMIDs of each scope with their results, and the union of the PMIDs
+            to process mapped to their scopes, in the order the PMIDs are first found.
+    """
+    finished = {}
+    pmid_scopes: dict[str, list[str]] = {}
+    for scope, pmids in scopes_pmids.items():
+        finished[scope], pending = split_finished_pmids(run_state, scope, pmids, resume)
+        for pmid in pending:
+            pmid_scopes.setdefault(pmid, []).append(scope)
+    logger.info(f"{len(pmid_scopes)} distinct PMIDs to process for {len(scopes_pmids)} scopes")
+    return finished, pmid_scopes
+
+class ScopesResults:
+    """
+    The results of a multi-scope run, results.txt and the logs are written as papers finish.
+    """
+    def __init__(self, finished: dict[str, dict[str, bool]]):
+        self.all_pmids = {scope: list(pmids) for scope, pmids in finished.items()}
+        self.valid_pmids = {scope: [pmid for pmid, valid in pmids.items() if valid] for scope, pmids in finished.items()}
+        self.failed_pmids = {scope: [] for scope in finished}
+
+    def add(self, pmid: str, scope_results: dict[str, Optional[bool]]):
+        for scope, valid in scope_results.items():
+            self.all_pmids[scope].append(pmid)
+            if valid is None:
+                self.failed_pmids[scope].append(pmid)
+                continue
+            if valid:
+                self.valid_pmids[scope].append(pmid)
+                logger.info(f"PMID {pmid} is relevant to {scope}")
+            else:
+                logger.info(f"PMID {pmid} is NOT relevant to {scope}")
+            output_collect_result(scope=scope, pmid=pmid, relevant=valid)
+
+    def output_summary(self) -> dict[str, list[str]]:
+        for scope in self.all_pmids:
+            output_collection_summary(scope, self.all_pmids[scope], self.valid_pmids[scope], self.failed_pmids[scope])
+        return self.valid_pmids
+
+
+def _prepare_scopes_run(
+    scope_configs: dict[str, ScopeConfig],
+    resume: bool,
+) -> tuple[RunStateDB, ScopesResults, dict[str, list[str]]]:
+    """
+    Query the PMIDs of the scopes and skip the finished ones if resuming.
+    Returns:
+        tuple: The run state, the results (with the finished PMIDs) and the PMIDs to process mapped to their scopes.
+    """
+    scopes_pmids = query_scopes_pmids(scope_configs)
+    run_state = RunStateDB()
+    finished, pmid_scopes = split_scopes_pmids(run_state, scopes_pmids, resume)
+    return run_state, ScopesResults(finished), pmid_scopes
+
+def _create_workflow(html_executor: Optional[ProcessPoolExecutor], workflow_options: Optional[dict]) -> IdentifyWorkflow:
+    # the workflow doesn't depend on the scope, the scope is a parameter of each identify call.
+    # It is shared by the worker threads (paper database connections are per thread) or the coroutines
     wf = IdentifyWorkflow(
         llm=get_azure_openai(),
         step_callback=output_step,
         two_steps_agent=True,
+        html_executor=html_executor,
+        **(workflow_options or {}),
     )
     wf.compile()
-    valid_pmids = []
-    for pmid in pmids:
-        all_pmids.append(pmid)
-        logger.info(f"PMID: {pmid}")
-        valid = identify_workflow(
-            wf=wf,
-            pmid=pmid,
-            research_goal=scope,
-            identify_original_instructions=identify_original_instructions,
-            identify_relevant_instructions=identify_relevant_instructions,
-        )
-        if valid:
-            valid_pmids.append(pmid)
-            logger.info(f"PMID {pmid} is relevant to {scope}")
-        else:
-            logger.info(f"PMID {pmid} is NOT relevant to {scope}")
-        output_collect_result(
-            scope=scope, pmid=pmid, relevant=valid
+    return wf
+
+def _identify_kwargs(wf: IdentifyWorkflow, scope: str, scope_config: ScopeConfig, pmid: str) -> dict:
+    return dict(
+        wf=wf,
+        pmid=pmid,
+        research_goal=scope,
+        identify_original_instructions=scope_config.identify_original_instructions,
+        identify_relevant_instructions=scope_config.identify_relevant_instructions,
+        # recorded as failed in the run state and retried by --resume
+        raise_if_unavailable=True,
+    )
+
+def execute_scopes(
+    scopes: list[str],
+    max_workers: int = 1,
+    html_processes: int = 0,
+    workflow_options: Optional[dict] = None,
+    resume: bool = False,
+) -> dict[str, list[str]]:
+    """
+    Run several scopes in one process. Every paper of the union of the scopes' PMIDs is processed once
+    by a worker, which runs the workflows of its scopes concurrently: the first one retrieves and extracts
+    the full text, the others wait for it and read it from the plaintext cache. The workers share the llm client,
+    the html process pool and the NCBI rate limits.
+    Returns:
+        dict: The relevant PMIDs of each scope.
+    """
+    return _execute_scopes(
+        {scope: read_scope_config(scope) for scope in scopes},
+        max_workers=max_workers,
+        html_processes=html_processes,
+        workflow_options=workflow_options,
+        resume=resume,
+    )
+
+def _execute_scopes(
+    scope_configs: dict[str, ScopeConfig],
+    max_workers: int,
+    html_processes: int,
+    workflow_options: Optional[dict],
+    resume: bool,
+) -> dict[str, list[str]]:
+    run_state, results, pmid_scopes = _prepare_scopes_run(scope_configs, resume)
+    with create_html_executor(html_processes) as html_executor:
+        wf = _create_workflow(html_executor, workflow_options)
+
+        def identify_scope(pmid: str, scope: str) -> Optional[bool]:
+            return identify_with_run_state(run_state, scope, pmid, lambda: identify_workflow(
+                **_identify_kwargs(wf, scope, scope_configs[scope], pmid),
+            ))
+
+        # the scopes of a paper run concurrently, they share one fetch and extraction of the full text
+        with ThreadPoolExecutor(max_workers=max(1, max_workers) * len(scope_configs)) as scope_executor:
+
+            def identify_pmid(pmid: str) -> dict[str, Optional[bool]]:
+                logger.info(f"PMID: {pmid}, scopes: {pmid_scopes[pmid]}")
+                futures = {scope: scope_executor.submit(identify_scope, pmid, scope) for scope in pmid_scopes[pmid]}
+                return {scope: future.result() for scope, future in futures.items()}
+
+            # results are yielded in PMID order, so results.txt keeps the query order
+            for pmid, scope_results in ordered_concurrent_map(identify_pmid, list(pmid_scopes), max_workers):
+                results.add(pmid, scope_results)
+        return results.output_summary()
+
+async def aexecute_scopes(
+    scopes: list[str],
+    max_concurrency: int = 1,
+    html_processes: int = 0,
+    workflow_options: Optional[dict] = None,
+    resume: bool = False,
+) -> dict[str, list[str]]:
+    """
+    Run several scopes as coroutines in one event loop, see execute_scopes.
+    """
+    return await _aexecute_scopes(
+        {scope: read_scope_config(scope) for scope in scopes},
+        max_concurrency=max_concurrency,
+        html_processes=html_processes,
+        workflow_options=workflow_options,
+        resume=resume,
+    )
+
+async def _aexecute_scopes(
+    scope_configs: dict[str, ScopeConfig],
+    max_concurrency: int,
+    html_processes: int,
+    workflow_options: Optional[dict],
+    resume: bool,
+) -> dict[str, list[str]]:
+    run_state, results, pmid_scopes = await asyncio.to_thread(_prepare_scopes_run, scope_configs, resume)
+    with create_html_executor(html_processes) as html_executor:
+        wf = _create_workflow(html_executor, workflow_options)
+
+        async def aidentify_pmid(pmid: str) -> dict[str, Optional[bool]]:
+            logger.info(f"PMID: {pmid}, scopes: {pmid_scopes[pmid]}")
+            scopes = pmid_scopes[pmid]
+            # the scopes of the paper run concurrently, they share one fetch and extraction of the full text
+            scope_results = await asyncio.gather(*[
+                aidentify_with_run_state(run_state, scope, pmid, lambda scope=scope: aidentify_workflow(
+                    **_identify_kwargs(wf, scope, scope_configs[scope], pmid),
+                ))
+                for scope in scopes
+            ])
+            return dict(zip(scopes, scope_results))
+
+        async for pmid, scope_results in aordered_concurrent_map(aidentify_pmid, list(pmid_scopes), max_concurrency):
+            results.add(pmid, scope_results)
+        return results.output_summary()
+
+async def arun_and_close_client(coro: Awaitable):
+    """
+    Await coro, then close the pooled http client of the event loop.
+    """
+    try:
+        return await coro
+    finally:
+        await aclose_async_client()
+
+def main_scopes(
+    scopes: list[str],
+    max_workers: int = 1,
+    use_async: bool = False,
+    html_processes: int = 0,
+    workflow_options: Optional[dict] = None,
+    llm_cache: bool = True,
+    resume: bool = False,
+) -> dict[str, list[str]]:
+    """
+    Run several scopes in one process, the arguments are the same as main().
+    """
+    set_llm_cache(create_llm_cache() if llm_cache else None)
+    if use_async:
+        valid_pmids = asyncio.run(arun_and_close_client(aexecute_scopes(
+            scopes,
+            max_concurrency=max_workers,
+            html_processes=html_processes,
+            workflow_options=workflow_options,
+            resume=resume,
+        )))
+    else:
+        valid_pmids = execute_scopes(
+            scopes,
+            max_workers=max_workers,
+            html_processes=html_processes,
+            workflow_options=workflow_options,
+            resume=resume,
         )
-    
-    logger.info("=" * 64)
-    logger.info(f"Final Result: {scope}")
-    logger.info(f"Query results number: {len(all_pmids)}, Total relevant PMIDs: {len(valid_pmids)}")
-    logger.info(f"Relevant PMIDs: {valid_pmids}")
-    
+
+    for handler in logger.handlers:
+        handler.flush()
     return valid_pmids
 
-def main_execute(scope: str):
+def main_execute(
+    scope: str,
+    max_workers: int = 1,
+    use_async: bool = False,
+    html_processes: int = 0,
+    workflow_options: Optional[dict] = None,
+    resume: bool = False,
+):
+    """
+    Args:
+        workflow_options (dict, optional): Extra keyword arguments of IdentifyWorkflow, e.g. abstract_prefilter.
+        resume (bool): Skip the PMIDs a previous run of the scope has finished, retry the failed ones.
+    """
     query, mindate, maxdate = read_config_query(scope) # '("Alzheimer") AND ("scRNA-seq" OR "single cell RNA sequencing"  OR "snRNA-seq" OR "single nucleus RNA sequencing")' # '(Alzheimer AND ("single cell" OR "single nucleus" OR "single-cell")) AND ("RNA sequencing" OR "RNA-seq" OR "single-cell RNA-seq")'
     identify_original_instructions = read_config_identify_original_instructions(scope)
     identify_relevant_instructions = read_config_identify_relevant_instructions(scope)
+    if use_async:
+        valid_pmids = asyncio.run(arun_and_close_client(aexecute_collection(
+            scope=scope,
+            query=query,
+            mindate=mindate,
+            maxdate=maxdate,
+            identify_original_instructions=identify_original_instructions,
+            identify_relevant_instructions=identify_relevant_instructions,
+            max_concurrency=max_workers,
+            html_processes=html_processes,
+            workflow_options=workflow_options,
+            resume=resume,
+        )))
+        return valid_pmids
     valid_pmids = execute_collection(
         scope=scope,
         query=query,
@@ -139,13 +545,34 @@ def main_execute(scope: str):
         maxdate=maxdate,
         identify_original_instructions=identify_original_instructions,
         identify_relevant_instructions=identify_relevant_instructions,
+        max_workers=max_workers,
+        html_processes=html_processes,
+        workflow_options=workflow_options,
+        resume=resume,
     )
     
     return valid_pmids    
 
 
-def main(scope):
-    main_execute(scope)
+def main(
+    scope,
+    max_workers: int = 1,
+    use_async: bool = False,
+    html_processes: int = 0,
+    workflow_options: Optional[dict] = None,
+    llm_cache: bool = True,
+    resume: bool = False,
+):
+    # identical prompts of a rerun are answered from the cache
+    set_llm_cache(create_llm_cache() if llm_cache else None)
+    main_execute(
+        scope,
+        max_workers=max_workers,
+        use_async=use_async,
+        html_processes=html_processes,
+        workflow_options=workflow_options,
+        resume=resume,
+    )
 
     for handler in logger.handlers:
         handler.flush()
@@ -158,9 +585,31 @@ if __name__ == "__main__":
     str_entries = str_entries[:-1]
     parser = argparse.ArgumentParser()
     parser.add_argument("-s", "--scope", default="SC_Alzheimer", help=f"disease scope, like {str_entries}")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of PMIDs processed concurrently")
+    parser.add_argument("--use-async", action="store_true", help="process PMIDs as coroutines in one event loop instead of worker threads")
+    parser.add_argument("--html-processes", type=int, default=0, help="number of processes converting html to plaintext, 0 converts in the workers")
+    parser.add_argument("--abstract-prefilter", action="store_true", help="reject clearly irrelevant papers from the title and abstract before the full text is retrieved")
+    parser.add_argument("--abstract-prefilter-threshold", type=float, default=DEFAULT_ABSTRACT_RELEVANCE_THRESHOLD, help="minimum confidence of a 'not relevant' prefilter answer to reject a paper")
+    parser.add_argument("--lexical-prefilter", action="store_true", help="skip the original data llm call for papers without accessions, repository links or instruction keywords")
+    parser.add_argument("--no-llm-cache", action="store_true", help="always call the llm, don't read or write the llm response cache")
+    parser.add_argument("--resume", action="store_true", help="skip the PMIDs a previous run of the scope has finished and retry the failed ones")
+    parser.add_argument("--reuse-original-verdicts", action="store_true", help="check original data once per paper and data modality, shared by the scopes and runs, the targeted disease is checked by the relevance step")
     args = parser.parse_args()
     args = vars(args)
     if not args["scope"] or args["scope"] not in entries:
         parser.print_usage()
     else:
-        main(args["scope"])
+        main(
+            args["scope"],
+            max_workers=args["workers"],
+            use_async=args["use_async"],
+            html_processes=args["html_processes"],
+            workflow_options={
+                "abstract_prefilter": args["abstract_prefilter"],
+                "abstract_relevance_threshold": args["abstract_prefilter_threshold"],
+                "lexical_prefilter": args["lexical_prefilter"],
+                "reuse_original_verdicts": args["reuse_original_verdicts"],
+            },
+            llm_cache=not args["no_llm_cache"],
+            resume=args["resume"],
+        )
@@ -0,0 +1,156 @@
+"""
+Benchmark the html section extraction on saved pages.
+
+    python -m benchmarks.bench_html_extractor [page.html ...] [--scale 20] [--depth 12] [--rounds 5] > bench_output.txt
+
+Run it as a module from the repository root, the benchmarks package imports src from there
+(python benchmarks/bench_html_extractor.py can't import src).
+
+Without pages the sample articles in system_tests/data are used, --scale and --depth repeat
+the body of each page in nested wrappers to emulate large publisher pages. The find_all_next based section extractor
+that HtmlTableParser used before is kept below as the baseline, dataframe_to_markdown and
+convert_html_table_to_dataframe are only imported for it.
+"""
+import argparse
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup, Tag
+
+from src.paper_query.html_extractor import HtmlTableExtractor, HtmlTableParser
+from src.paper_query.table_utils import dataframe_to_markdown
+from src.paper_query.utils import convert_html_table_to_dataframe
+
+SAMPLE_PAGES = [
+    "system_tests/data/sample_pmc_article.html",
+    "system_tests/data/sample_publisher_article.html",
+]
+
+class BaselineHtmlTableParser(HtmlTableParser):
+    def _find_first_occurrence(self, soup: BeautifulSoup, keywords: List[str]) -> Optional[Tag]:
+        kw_lower = [k.lower() for k in keywords]
+        valid_tags = {"section", "div", "article", "main", "h1", "h2", "h3", "p", "ul", "ol", "table", "article"}
+        for el in soup.find_all(True):
+            if el.name not in valid_tags:
+                continue
+            if any(kw in cls.lower() for cls in el.get("class", []) for kw in kw_lower):
+                return el
+            if any(kw in (el.get("id", "").lower()) for kw in kw_lower):
+                return el
+            direct = ''.join(el.find_all(string=True, recursive=False)).strip().lower()
+            if any(kw in direct for kw in kw_lower):
+                return el
+        return None
+
+    def extract_sections(self, html: str):
+        stop_sections = [
+            "reference", "references",
+            "acknowledgement", "acknowledgment",
+            "acknowledgements", "acknowledgments",
+            "supplementary", "supplements"
+        ]
+        soup = BeautifulSoup(html, "html.parser")
+        for a in soup.find_all("a"):
+            a.decompose()
+        start = self._find_first_occurrence(soup, ["abstract"])
+        if not start:
+            return None
+
+        sections: List[Dict[str, str]] = []
+        current: Optional[Dict[str, str]] = None
+        seen_global = set()
+        heading_tags = ["h1", "h2", "h3", "h4"]
+        block_tags = ["p", "ul", "ol", "div", "section", "article"]
+        for el in start.find_all_next():
+            if el.name in heading_tags:
+                h_raw = el.get_text(strip=True)
+                h_low = h_raw.lower()
+                if any(kw in h_low for kw in stop_sections):
+                    if current and current["content"].strip():
+                        lines = list(dict.fromkeys(current["content"].splitlines()))
+                        current["content"] = "\n".join(lines).strip()
+                        sections.append(current)
+                    break
+                if current and current["content"].strip():
+                    lines = list(dict.fromkeys(current["content"].splitlines()))
+                    current["content"] = "\n".join(lines).strip()
+                    sections.append(current)
+                current = {"section": h_raw, "content": ""}
+                continue
+            if current is None:
+                continue
+            if el.name == "table":
+                try:
+                    markdown = dataframe_to_markdown(convert_html_table_to_dataframe(str(el)))
+                    if markdown and markdown not in seen_global:
+                        current["content"] += markdown + "\n"
+                        seen_global.add(markdown)
+                    continue
+                except Exception:
+                    pass
+            if el.name in block_tags:
+                txt = el.get_text(separator="\n", strip=True)
+                if txt and txt not in seen_global:
+                    current["content"] += txt + "\n"
+                    seen_global.add(txt)
+        if current and current["content"].strip():
+            lines = list(dict.fromkeys(current["content"].splitlines()))
+            current["content"] = "\n".join(lines).strip()
+            sections.append(current)
+        return sections
+
+def scale_page(html: str, scale: int, depth: int) -> str:
+    """
+    Repeat the body of the page inside {depth} nested <div> wrappers, as publisher pages
+    nest their content, the stop sections are only kept at the end.
+    """
+    if scale <= 1:
+        return html
+    match = re.search(r"<body[^>]*>(.*)</body>", html, flags=re.S) \
+        or re.search(r"<html[^>]*>(.*)</html>", html, flags=re.S)
+    if match is None:
+        return html
+    body = match.group(1)
+    stop = re.search(r"<(h[1-4]|section)[^>]*>\s*(<h[1-4][^>]*>)?\s*(Acknowledg|References)", body)
+    head, tail = (body[:stop.start()], body[stop.start():]) if stop else (body, "")
+    copy = "<div>" * depth + re.sub(r"Abstract|abstract", "Summary", head) + "</div>" * depth
+    scaled = head + copy * (scale - 1) + tail
+    return html[:match.start(1)] + scaled + html[match.end(1):]
+
+def time_it(fn: Callable, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark html section extraction")
+    parser.add_argument("pages", nargs="*", default=SAMPLE_PAGES)
+    parser.add_argument("--scale", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=12)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    for page in args.pages:
+        with open(page, "r") as f:
+            html = scale_page(f.read(), args.scale, args.depth)
+        baseline = BaselineHtmlTableParser()
+        generic = HtmlTableParser()
+        assert baseline.extract_sections(html) == generic.extract_sections(html), \
+            f"{page}: sections differ from the baseline"
+        parse_ms = time_it(lambda: BeautifulSoup(html, "html.parser"), args.rounds)
+        baseline_ms = time_it(lambda: baseline.extract_sections(html), args.rounds) - parse_ms
+        generic_ms = time_it(lambda: generic.extract_sections(html), args.rounds) - parse_ms
+        extract_all_ms = time_it(lambda: HtmlTableExtractor().extract_all(html), args.rounds)
+        print(
+            f"{page} ({len(html) // 1024} KB): parse {parse_ms:.1f} ms, "
+            f"extract_sections after parse: baseline {baseline_ms:.1f} ms, "
+            f"streaming {generic_ms:.1f} ms ({baseline_ms / generic_ms:.1f}x); "
+            f"extract_all {extract_all_ms:.1f} ms"
+        )
+
+if __name__ == "__main__":
+    main()
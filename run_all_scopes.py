@@ -1,5 +1,5 @@
 
-import os
+import argparse
 import subprocess
 
 def run_command(command: list, cwd: str = None, timeout: int = None):
@@ -42,7 +42,7 @@ scopes_to_run = [
     # 'Prion_diseases_Spatial',
 ]
 
-def main():
+def run_scopes_in_subprocesses():
     for scope in scopes_to_run:
         out, error, code = run_command([
             "python", "./app_script.py", "-s", scope
@@ -53,6 +53,30 @@ def main():
         with open(f"./{scope}_success.log", "w") as fobj:
             fobj.write(out)
 
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subprocess", action="store_true", help="run every scope in its own app_script.py process, one after another")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of PMIDs processed concurrently")
+    parser.add_argument("--use-async", action="store_true", help="process PMIDs as coroutines in one event loop instead of worker threads")
+    parser.add_argument("--html-processes", type=int, default=0, help="number of processes converting html to plaintext, 0 converts in the workers")
+    parser.add_argument("--resume", action="store_true", help="skip the PMIDs a previous run of a scope has finished and retry the failed ones")
+    parser.add_argument("--reuse-original-verdicts", action="store_true", help="check original data once per paper and data modality, shared by the scopes, the targeted disease is checked by the relevance step")
+    args = parser.parse_args()
+    if args.subprocess:
+        run_scopes_in_subprocesses()
+        return
+
+    # one process for all scopes: a paper found by several scopes is fetched and extracted once
+    from app_script import main_scopes
+    main_scopes(
+        scopes_to_run,
+        max_workers=args.workers,
+        use_async=args.use_async,
+        html_processes=args.html_processes,
+        resume=args.resume,
+        workflow_options={"reuse_original_verdicts": args.reuse_original_verdicts},
+    )
+
 
 if __name__ == "__main__":
     main()
@@ -32,9 +32,18 @@ class IdentifyState(TypedDict):
     title: str
     abstract: str
     content: str
+    sections: Optional[list[dict]]  # [{"section": ..., "content": ...}, ...] the content is built from
     step_output_callback: Optional[Callable[[str], None]]  # Callback for step output
     identify_original_instructions: Optional[str]
     identify_relevant_instructions: Optional[str]  # Instructions for identifying relevance
+    # the research goal of the original data step if it differs from research_goal,
+    # e.g. the scope independent one when the verdicts are shared by scopes
+    original_research_goal: Optional[str]
+
+    # prefilter result, False if the abstract is clearly not relevant
+    abstract_relevant: Optional[bool]
+    # accessions, links and keywords found in the content by the lexical prefilter
+    lexical_evidence: Optional[list[dict]]
 
     # final answer
     relevant: Optional[bool]
@@ -1,3 +1,4 @@
+import asyncio
 from typing import Any, Callable, Optional
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai.chat_models.base import BaseChatOpenAI
@@ -9,6 +10,8 @@ import logging
 from .agent_utils import (
     increase_token_usage,
 )
+from .constants import DEFAULT_TOKEN_USAGE
+from .llm_cache import build_llm_cache_key, dump_result, get_llm_cache, load_result
 
 logger = logging.getLogger(__name__)
 
@@ -60,18 +63,123 @@ class CommonAgent:
                 return None, None, None, None
         
         system_prompt = system_prompt.replace("{", "(").replace("}", ")")
-        return self._invoke_agent(
+        cache_key, cached = self._select_cached_result(
+            system_prompt, instruction_prompt, schema, post_process, **kwargs,
+        )
+        if cached is not None:
+            return cached
+        result = self._invoke_agent(
             system_prompt,
             instruction_prompt,
             schema,
             post_process,
             **kwargs,
         )
+        self._insert_cached_result(cache_key, result)
+        return result
+
+    async def ago(
+        self,
+        system_prompt: str,
+        instruction_prompt: str,
+        schema: Any,
+        pre_process: Optional[Callable] = None,
+        post_process: Optional[Callable] = None,
+        **kwargs: Optional[Any],
+    ) -> tuple[Any, Any, dict | None, Any]:
+        """
+        execute agent asynchronously, the arguments and return value are the same as go()
+        """
+        self._initialize()
+        if pre_process is not None:
+            is_OK = pre_process(**kwargs)
+            if not is_OK:  # skip
+                return None, None, None, None
+
+        system_prompt = system_prompt.replace("{", "(").replace("}", ")")
+        # the llm cache is sqlite (and evicts every EVICT_INTERVAL insertions), keep it off the event loop
+        cache_key, cached = await asyncio.to_thread(
+            self._select_cached_result,
+            system_prompt, instruction_prompt, schema, post_process, **kwargs,
+        )
+        if cached is not None:
+            return cached
+        result = await self._ainvoke_agent(
+            system_prompt,
+            instruction_prompt,
+            schema,
+            post_process,
+            **kwargs,
+        )
+        await asyncio.to_thread(self._insert_cached_result, cache_key, result)
+        return result
 
     def _initialize(self):
         self.exception = None
         self.token_usage = None
 
+    def _select_cached_result(
+        self,
+        system_prompt: str,
+        instruction_prompt: str,
+        schema: Any,
+        post_process: Optional[Callable] = None,
+        **kwargs: Optional[Any],
+    ) -> tuple[str | None, tuple[Any, Any, dict | None, Any] | None]:
+        """
+        Look up the response of the same agent, model and prompts in the llm cache (see set_llm_cache).
+        Returns:
+            (cache key or None if caching is disabled, cached agent result or None)
+        """
+        cache = get_llm_cache()
+        if cache is None:
+            return None, None
+        cache_key = build_llm_cache_key(
+            type(self).__name__, self.llm, system_prompt, instruction_prompt, schema,
+        )
+        value = cache.select(cache_key)
+        if value is None:
+            return cache_key, None
+        try:
+            res = load_result(value["result"], schema)
+            processed_res = self._post_process_result(res, post_process, **kwargs)
+        except Exception as e:
+            logger.warning(f"Ignoring llm cache entry {cache_key}: {e}")
+            return cache_key, None
+        # nothing is paid for a cached response
+        return cache_key, (res, processed_res, {**DEFAULT_TOKEN_USAGE}, value.get("reasoning_process"))
+
+    def _insert_cached_result(self, cache_key: str | None, result: tuple[Any, Any, dict | None, Any]):
+        cache = get_llm_cache()
+        if cache is None or cache_key is None:
+            return
+        res, _, _, reasoning_process = result
+        if res is None:
+            return
+        cache.insert(cache_key, {
+            "result": dump_result(res),
+            "reasoning_process": reasoning_process,
+        })
+
+    def _post_process_result(
+        self,
+        res: Any,
+        post_process: Optional[Callable] = None,
+        **kwargs: Optional[Any],
+    ) -> Any:
+        processed_res = res
+        if post_process is not None:
+            try:
+                processed_res = post_process(res, **kwargs)
+            except RetryException as e:
+                logger.error(str(e))
+                self.exception = e
+                raise e
+            except Exception as e:
+                logger.error(str(e))
+                raise e
+        return processed_res
+
     def _process_retryexception_message(
         self, prompt: ChatPromptTemplate
     ) -> ChatPromptTemplate:
@@ -124,16 +232,40 @@ class CommonAgent:
         except Exception as e:
             logger.error(str(e))
             raise e
-        processed_res = res
-        if post_process is not None:
-            try:
-                processed_res = post_process(res, **kwargs)
-            except RetryException as e:
-                logger.error(str(e))
-                self.exception = e
-                raise e
-            except Exception as e:
-                logger.error(str(e))
-                raise e
+        processed_res = self._post_process_result(res, post_process, **kwargs)
+        return res, processed_res, self.token_usage, None
+
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_incrementing(start=1.0, increment=3, max=10),
+    )
+    async def _ainvoke_agent(
+        self,
+        system_prompt: str,
+        instruction_prompt: str,
+        schema: Any,
+        post_process: Optional[Callable] = None,
+        **kwargs: Optional[Any],
+    ) -> tuple[Any, Any, dict | None, Any]:
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", system_prompt),
+            ("human", instruction_prompt),
+        ])
+        # Initialize the callback handler
+        callback_handler = OpenAICallbackHandler()
+
+        updated_prompt = self._process_retryexception_message(prompt)
+        agent = updated_prompt | self.llm.with_structured_output(schema)
+        try:
+            res = await agent.ainvoke(
+                input={},
+                config={
+                    "callbacks": [callback_handler],
+                },
+            )
+            self._incre_token_usage(callback_handler)
+        except Exception as e:
+            logger.error(str(e))
+            raise e
+        processed_res = self._post_process_result(res, post_process, **kwargs)
         return res, processed_res, self.token_usage, None
-    
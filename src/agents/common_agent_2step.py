@@ -56,6 +56,49 @@ class CommonAgentTwoSteps(CommonAgent):
         )]
         return ChatPromptTemplate.from_messages(msgs)
 
+    def _build_final_prompt(
+        self,
+        system_prompt: str,
+        reasoning_process: str,
+    ) -> ChatPromptTemplate:
+        processed_reasoning_process = reasoning_process.replace("{", "(").replace("}", ")")
+        return self._build_prompt_for_final_step(
+            system_prompt=system_prompt,
+            cot_msg=processed_reasoning_process,
+        )
+
+    def _process_cot_result(self, cot_res: Any) -> str:
+        if cot_res is None or cot_res.llm_output is None:
+            raise Exception("llm generate invalid output")
+        reasoning_process = cot_res.generations[0][0].text
+        token_usage: Any = cot_res.llm_output.get("token_usage")
+        cot_tokens = {
+            "total_tokens": token_usage.get("total_tokens", 0),
+            "prompt_tokens": token_usage.get("prompt_tokens", 0),
+            "completion_tokens": token_usage.get("completion_tokens", 0),
+        }
+        self._incre_token_usage(cot_tokens)
+        return reasoning_process
+
+    def _post_process_result(
+        self,
+        res: Any,
+        post_process: Optional[Callable] = None,
+        **kwargs: Optional[Any],
+    ) -> Any:
+        processed_res = None
+        if post_process is not None:
+            try:
+                processed_res = post_process(res, **kwargs)
+            except RetryException as e:
+                logger.error(str(e))
+                self.exceptions = [e] if self.exceptions is None else self.exceptions + [e]
+                raise e
+            except Exception as e:
+                logger.error(str(e))
+                raise e
+        return processed_res
+
     @retry(
         stop=stop_after_attempt(5),
         wait=wait_incrementing(start=1.0, increment=3, max=10),
@@ -81,26 +124,16 @@ class CommonAgentTwoSteps(CommonAgent):
             msgs = cot_prompt.invoke(input={}).to_messages()
             
             cot_res = self.llm.generate(messages=[msgs])
-            if cot_res is None or cot_res.llm_output is None:
-                raise Exception("llm generate invalid output")
-            reasoning_process = cot_res.generations[0][0].text
-            token_usage: Any = cot_res.llm_output.get("token_usage")
-            cot_tokens = {
-                "total_tokens": token_usage.get("total_tokens", 0),
-                "prompt_tokens": token_usage.get("prompt_tokens", 0),
-                "completion_tokens": token_usage.get("completion_tokens", 0),
-            }
-            self._incre_token_usage(cot_tokens)
+            reasoning_process = self._process_cot_result(cot_res)
         except Exception as e:
             logger.error(str(e))
             raise e
                 
         try:
             # Then use the reasoning process to do the structured output
-            processed_reasoning_process = reasoning_process.replace("{", "(").replace("}", ")")
-            updated_prompt = self._build_prompt_for_final_step(
+            updated_prompt = self._build_final_prompt(
                 system_prompt=processed_system_prompt,
-                cot_msg=processed_reasoning_process,
+                reasoning_process=reasoning_process,
             )
             agent = updated_prompt | self.llm.with_structured_output(schema)
             res = agent.invoke(
@@ -113,46 +146,21 @@ class CommonAgentTwoSteps(CommonAgent):
         except Exception as e:
             logger.error(str(e))
             raise e
-        processed_res = None
-        if post_process is not None:
-            try:
-                processed_res = post_process(res, **kwargs)
-            except RetryException as e:
-                logger.error(str(e))
-                self.exceptions = [e] if self.exceptions is None else self.exceptions + [e]
-                raise e
-            except Exception as e:
-                logger.error(str(e))
-                raise e
+        processed_res = self._post_process_result(res, post_process, **kwargs)
         return res, processed_res, self.token_usage, reasoning_process
-    
-FINAL_STEP_SYSTEM_PROMPTS = ChatPromptTemplate.from_template("""
----
-
-You will be given a response generated by a LLM, which includes a **step-by-step reasoning process** followed by a clearly marked **final answer**.
-
-### **Your Task:**
-
-Extract and return only the content of the **final answer**.
-
----
-
-### **Important Instructions:**
-1. Your task is to **extract only the final answer** from the provided reasoning process.
-   **Do not** make any judgments, interpretations, or modifications to the content.
-
-### **Input:**
-
-{llm_response}
-
----
-""")
-
-class CommonAgentTwoChainSteps(CommonAgentTwoSteps):
-    def __init__(self, llm):
-        super().__init__(llm)
 
-    def _invoke_agent(self, system_prompt, instruction_prompt, schema, post_process = None, **kwargs):
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_incrementing(start=1.0, increment=3, max=10),
+    )
+    async def _ainvoke_agent(
+        self,
+        system_prompt: str,
+        instruction_prompt: str,
+        schema: Any,
+        post_process: Optional[Callable] = None,
+        **kwargs: Optional[Any],
+    ) -> tuple[Any, Any, dict | None, Any]:
         # Initialize the callback handler
         callback_handler = OpenAICallbackHandler()
         processed_system_prompt = system_prompt.replace("{", "(").replace("}", ")")
@@ -165,34 +173,20 @@ class CommonAgentTwoChainSteps(CommonAgentTwoSteps):
             # First, use llm to do CoT
             msgs = cot_prompt.invoke(input={}).to_messages()
             
-            cot_res = self.llm.generate(messages=[msgs])
-            if cot_res is None or cot_res.llm_output is None:
-                raise Exception("llm generate invalid output")
-            reasoning_process = cot_res.generations[0][0].text
-            token_usage: Any = cot_res.llm_output.get("token_usage")
-            cot_tokens = {
-                "total_tokens": token_usage.get("total_tokens", 0),
-                "prompt_tokens": token_usage.get("prompt_tokens", 0),
-                "completion_tokens": token_usage.get("completion_tokens", 0),
-            }
-            self._incre_token_usage(cot_tokens)
+            cot_res = await self.llm.agenerate(messages=[msgs])
+            reasoning_process = self._process_cot_result(cot_res)
         except Exception as e:
             logger.error(str(e))
             raise e
                 
         try:
             # Then use the reasoning process to do the structured output
-            processed_reasoning_process = reasoning_process.replace("{", "(").replace("}", ")")
-            final_msg = FINAL_STEP_SYSTEM_PROMPTS.format(
-                llm_response=processed_reasoning_process,
+            updated_prompt = self._build_final_prompt(
+                system_prompt=processed_system_prompt,
+                reasoning_process=reasoning_process,
             )
-            msgs = [(
-                "human",
-                final_msg,
-            )]
-            final_prompt = ChatPromptTemplate.from_messages(msgs)
-            agent = final_prompt | self.llm.with_structured_output(schema)
-            res = agent.invoke(
+            agent = updated_prompt | self.llm.with_structured_output(schema)
+            res = await agent.ainvoke(
                 input={},
                 config={
                     "callbacks": [callback_handler],
@@ -202,17 +196,42 @@ class CommonAgentTwoChainSteps(CommonAgentTwoSteps):
         except Exception as e:
             logger.error(str(e))
             raise e
-        processed_res = None
-        if post_process is not None:
-            try:
-                processed_res = post_process(res, **kwargs)
-            except RetryException as e:
-                logger.error(str(e))
-                self.exceptions = [e] if self.exceptions is None else self.exceptions + [e]
-                raise e
-            except Exception as e:
-                logger.error(str(e))
-                raise e
+        processed_res = self._post_process_result(res, post_process, **kwargs)
         return res, processed_res, self.token_usage, reasoning_process
+    
+FINAL_STEP_SYSTEM_PROMPTS = ChatPromptTemplate.from_template("""
+---
+
+You will be given a response generated by a LLM, which includes a **step-by-step reasoning process** followed by a clearly marked **final answer**.
+
+### **Your Task:**
+
+Extract and return only the content of the **final answer**.
 
+---
+
+### **Important Instructions:**
+1. Your task is to **extract only the final answer** from the provided reasoning process.
+   **Do not** make any judgments, interpretations, or modifications to the content.
+
+### **Input:**
 
+{llm_response}
+
+---
+""")
+
+class CommonAgentTwoChainSteps(CommonAgentTwoSteps):
+    def __init__(self, llm):
+        super().__init__(llm)
+
+    def _build_final_prompt(self, system_prompt, reasoning_process):
+        processed_reasoning_process = reasoning_process.replace("{", "(").replace("}", ")")
+        final_msg = FINAL_STEP_SYSTEM_PROMPTS.format(
+            llm_response=processed_reasoning_process,
+        )
+        msgs = [(
+            "human",
+            final_msg,
+        )]
+        return ChatPromptTemplate.from_messages(msgs)
@@ -1,4 +1,5 @@
 
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Any, Callable, Optional, TypedDict
 import logging
@@ -48,6 +49,15 @@ class CommonStep(ABC):
         self.leave_step(state, token_usage)
         return state
 
+    async def aexecute(self, state):
+        """
+        Execute the step asynchronously.
+        """
+        self.enter_step(state)
+        state, token_usage = await self._aexecute_directly(state)
+        self.leave_step(state, token_usage)
+        return state
+
     def _print_step(
         self,
         state,
@@ -80,6 +90,17 @@ class CommonStep(ABC):
         """
         pass
 
+    async def _aexecute_directly(self, state: dict) -> tuple[dict | None, dict[str, int] | None]:
+        """
+        Execute the step directly and asynchronously. Subclasses that can await their llm calls
+        should override this method, by default _execute_directly is run in a worker thread.
+        Args:
+            state (CommonState): The state of the workflow.
+        Returns:
+            tuple[dict, dict[str, int]]: The updated state and token usage.
+        """
+        return await asyncio.to_thread(self._execute_directly, state)
+
 
 class sskindCommonStep(CommonStep):
     """
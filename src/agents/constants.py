@@ -2,4 +2,10 @@ DEFAULT_TOKEN_USAGE = {
     "total_tokens": 0,
     "completion_tokens": 0,
     "prompt_tokens": 0,
-}
\ No newline at end of file
+}
+# prompt token budgets of the paper content in the identify steps,
+# overridden by the environment variables below, 0 disables packing
+IDENTIFY_ORIGINAL_CONTENT_TOKENS_ENV = "IDENTIFY_ORIGINAL_CONTENT_TOKENS"
+IDENTIFY_RELEVANCE_CONTENT_TOKENS_ENV = "IDENTIFY_RELEVANCE_CONTENT_TOKENS"
+DEFAULT_ORIGINAL_CONTENT_TOKENS = 24000
+DEFAULT_RELEVANCE_CONTENT_TOKENS = 12000
@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # token counts fall back to the chars / 4 estimate
+    tiktoken = None
+
+TOKENIZER_ENCODING = "o200k_base"
+CHARS_PER_TOKEN = 4
+# a section is cut to the remaining budget only if at least this many tokens are left
+MIN_PARTIAL_SECTION_TOKENS = 64
+
+ORIGINAL_DATA_SECTION_PRIORITIES = [
+    "data availability", "availability", "accession", "method", "materials",
+]
+RELEVANCE_SECTION_PRIORITIES = [
+    "abstract", "introduction", "result",
+]
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+    with _encoding_lock:
+        if not _encoding_loaded:
+            if tiktoken is not None:
+                try:
+                    # the encoding file is downloaded (or read from TIKTOKEN_CACHE_DIR) once
+                    _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                except Exception as e:
+                    logger.warning(f"tiktoken encoding {TOKENIZER_ENCODING} is unavailable, estimating tokens: {e}")
+            _encoding_loaded = True
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of text with tiktoken, or estimate them as chars / 4 if tiktoken is unavailable.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+def get_content_token_budget(env_name: str, default: int) -> int:
+    """
+    The content token budget from the environment variable {env_name}, 0 or less disables packing.
+    """
+    try:
+        return int(os.environ.get(env_name, default))
+    except ValueError:
+        logger.error(f"Invalid {env_name}: {os.environ.get(env_name)}, using {default}")
+        return default
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+def dedupe_sections(sections: list[dict]) -> list[dict]:
+    """
+    Drop empty sections and sections whose (whitespace normalized) content repeats or is
+    contained in a section kept before it, e.g. the Data Availability and Methods sections
+    appended after the sections they were extracted from.
+    """
+    kept: list[dict] = []
+    kept_contents: list[str] = []
+    hashes = set()
+    for section in sections:
+        content = _normalize(section.get("content", ""))
+        if not content:
+            continue
+        digest = hashlib.sha1(content.encode("utf-8")).hexdigest()
+        if digest in hashes or any(content in kept_content for kept_content in kept_contents):
+            continue
+        hashes.add(digest)
+        kept.append(section)
+        kept_contents.append(content)
+    return kept
+
+def format_section(section: dict, content: Optional[str] = None) -> str:
+    """
+    Format a section as its heading line followed by its content, the plaintext of a paper
+    (see workflow_utils.join_sections) is made of the formatted sections too.
+    """
+    content = section["content"] if content is None else content
+    return section["section"].strip() + "\n" + content.strip()
+
+def _priority(heading: str, priorities: list[str]) -> int:
+    heading = heading.lower()
+    for ix, keyword in enumerate(priorities):
+        if keyword in heading:
+            return ix
+    return len(priorities)
+
+def pack_sections(
+    sections: list[dict],
+    token_budget: int,
+    priorities: list[str],
+) -> str:
+    """
+    Pack the deduplicated sections into at most token_budget tokens.
+    Sections whose heading matches a priority keyword are picked first (in the order of the keywords),
+    then the rest in document order, the picked sections are joined in document order.
+    Args:
+        sections (list[dict]): The sections, [{"section": ..., "content": ...}, ...].
+        token_budget (int): The token budget, 0 or less packs all sections.
+        priorities (list[str]): Lower case keywords of the headings to pick first.
+    Returns:
+        str: The packed content.
+    """
+    sections = dedupe_sections(sections)
+    if token_budget <= 0:
+        return "\n".join(format_section(section) for section in sections)
+
+    order = sorted(range(len(sections)), key=lambda ix: (_priority(sections[ix]["section"], priorities), ix))
+    picked: dict[int, str] = {}
+    remaining = token_budget
+    for ix in order:
+        text = format_section(sections[ix])
+        tokens = count_tokens(text) + 1  # + the joining new line
+        if tokens <= remaining:
+            picked[ix] = text
+            remaining -= tokens
+        elif remaining >= MIN_PARTIAL_SECTION_TOKENS:
+            picked[ix] = truncate_to_tokens(text, remaining - 1)
+            remaining = 0
+        if remaining <= 0:
+            break
+    return "\n".join(picked[ix] for ix in sorted(picked))
+
+def pack_content(
+    content: str,
+    sections: Optional[list[dict]],
+    token_budget: int,
+    priorities: list[str],
+) -> str:
+    """
+    The paper content to put into a prompt, packed from the sections if they are available,
+    otherwise the plain content cut to the token budget.
+    """
+    if sections:
+        return pack_sections(sections, token_budget, priorities)
+    if token_budget <= 0 or content is None:
+        return content
+    return truncate_to_tokens(content, token_budget)
@@ -0,0 +1,120 @@
+
+from typing import Optional
+from langchain_openai.chat_models.base import BaseChatOpenAI
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, Field
+
+from .common_step import sskindCommonStep
+from .common_agent import CommonAgent
+from .agent_utils import IdentifyState
+
+IDENTIFY_ABSTRACT_RELEVANCE_SYSTEM_PROMPT = ChatPromptTemplate.from_template("""
+---
+
+You are an expert in **biomedical research**.
+
+We are collecting data from published literature related to **{research_goal}**.
+You will be provided with the **title** and **abstract** of a scientific paper, the full text is not available yet.
+
+Your task is to screen out papers that are **clearly not relevant** to our research focus.
+If the title and abstract don't clearly show the paper is off-topic, consider it relevant.
+
+---
+### **Instructions**
+{identify_relevant_instructions}
+
+---
+
+### **Input**
+
+**Title:**
+{title}
+
+**Abstract:**
+{abstract}
+
+---
+
+### **Output**
+
+Answer whether the paper may be relevant to research on {research_goal},
+and how confident you are in your answer (0.0 - 1.0).
+Keep the reasoning process to one or two sentences.
+""")
+
+IDENTIFY_ABSTRACT_RELEVANCE_INSTRUCTION_PROMPT = "Now, let's screen the relevance of this paper from its title and abstract."
+
+# a paper is only rejected if the answer is "not relevant" with at least this confidence
+DEFAULT_ABSTRACT_RELEVANCE_THRESHOLD = 0.8
+
+class IdentifyAbstractRelevanceResult(BaseModel):
+    reasoning_process: Optional[str] = Field(
+        description="A short reasoning process used to determine relevance."
+    )
+    relevant: bool = Field(
+        description="Indicates whether the paper may be relevant to the research topic."
+    )
+    confidence: float = Field(
+        description="The confidence in the answer, from 0.0 to 1.0."
+    )
+
+class IdentifyAbstractRelevanceStep(sskindCommonStep):
+    """
+    This class implements the prefilter step to reject clearly irrelevant papers
+    from the title and abstract, before the full text is retrieved.
+    """
+    def __init__(
+        self,
+        llm: BaseChatOpenAI,
+        threshold: float = DEFAULT_ABSTRACT_RELEVANCE_THRESHOLD,
+    ):
+        super().__init__(llm)
+        self.llm = llm
+        self.step_name = "Identify Abstract Relevance Step"
+        self.threshold = threshold
+
+    def _prepare_agent(self, typed_state: IdentifyState) -> tuple[CommonAgent, str]:
+        pmid = typed_state.get("pmid", "N/A")
+        self._print_step(typed_state, step_output=f"PMID: {pmid}")
+        agent = CommonAgent(self.llm)
+        system_prompt = IDENTIFY_ABSTRACT_RELEVANCE_SYSTEM_PROMPT.format(
+            research_goal=typed_state.get("research_goal"),
+            title=typed_state.get("title"),
+            abstract=typed_state.get("abstract"),
+            identify_relevant_instructions=typed_state.get("identify_relevant_instructions", "N/A"),
+        )
+        return agent, system_prompt
+
+    def _update_state(self, typed_state: IdentifyState, res: IdentifyAbstractRelevanceResult):
+        rejected = not res.relevant and res.confidence >= self.threshold
+        typed_state["abstract_relevant"] = not rejected
+        if rejected:
+            typed_state["relevant"] = False
+        self._print_step(
+            typed_state,
+            step_output=f"relevant: {res.relevant}, confidence: {res.confidence}\n{res.reasoning_process}",
+        )
+
+    def _execute_directly(self, state: dict) -> tuple[dict | None, dict[str, int] | None]:
+        typed_state: IdentifyState = IdentifyState(**state)
+        agent, system_prompt = self._prepare_agent(typed_state)
+        res, _, token_usage, _ = agent.go(
+            system_prompt=system_prompt,
+            instruction_prompt=IDENTIFY_ABSTRACT_RELEVANCE_INSTRUCTION_PROMPT,
+            schema=IdentifyAbstractRelevanceResult,
+        )
+        self._update_state(typed_state, res)
+
+        return dict(typed_state), token_usage
+
+    async def _aexecute_directly(self, state: dict) -> tuple[dict | None, dict[str, int] | None]:
+        typed_state: IdentifyState = IdentifyState(**state)
+        agent, system_prompt = self._prepare_agent(typed_state)
+        res, _, token_usage, _ = await agent.ago(
+            system_prompt=system_prompt,
+            instruction_prompt=IDENTIFY_ABSTRACT_RELEVANCE_INSTRUCTION_PROMPT,
+            schema=IdentifyAbstractRelevanceResult,
+        )
+        self._update_state(typed_state, res)
+
+        return dict(typed_state), token_usage
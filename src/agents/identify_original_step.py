@@ -1,4 +1,8 @@
 
+import asyncio
+import hashlib
+import json
+import re
 from typing import Callable, Optional, TypedDict
 from langchain_openai.chat_models.base import BaseChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
@@ -8,6 +12,11 @@ from .common_step import sskindCommonStep
 from .common_agent import CommonAgent
 from .common_agent_2step import CommonAgentTwoSteps, CommonAgentTwoChainSteps
 from .agent_utils import IdentifyState, RESEARCH_GOAL_DICT
+from .constants import IDENTIFY_ORIGINAL_CONTENT_TOKENS_ENV, DEFAULT_ORIGINAL_CONTENT_TOKENS
+from .content_packing import ORIGINAL_DATA_SECTION_PRIORITIES, get_content_token_budget, pack_content
+from .lexical_prefilter import format_lexical_evidence
+from .llm_cache import get_model_id
+from ..database.original_verdict_db import OriginalVerdictDB
 
 
 IDENTIFY_ORIGINAL_DATA_SYSTEM_PROMPT = ChatPromptTemplate.from_template("""
@@ -49,6 +58,8 @@ Respond in the following format:
 **FinalAnswer**: [Yes / No]
 """)
 
+IDENTIFY_ORIGINAL_DATA_INSTRUCTION_PROMPT = "Before jumping to final answer, you need to explain **the reasoning process** first.\nNow, let's identify if the data is original and accessible."
+
 class IdentifyOriginalDataResult(BaseModel):
     reasoning_process: Optional[str] = Field(
         description="The reasoning process used to determine relevance."
@@ -57,6 +68,59 @@ class IdentifyOriginalDataResult(BaseModel):
         description="Indicates whether the data in the paper is original and not previously published, and publicly accessible."
     )
 
+# the data modality of a "<Disease>_<Modality>" scope
+SCOPE_DATA_MODALITY_DICT = {
+    "SingleCell": "**single-cell RNA sequencing**",
+    "Spatial": "**spatial transcriptomics**",
+}
+# the instruction lines that depend on the scope, e.g.
+# "2. Moreover, the data related to the targeted disease: AD is the focus of the study, ..."
+SCOPE_INSTRUCTION_PATTERN = re.compile(r"targeted disease", re.IGNORECASE)
+
+def get_scope_independent_research_goal(research_goal: str) -> str:
+    """
+    The data modality of a scope, e.g. "Alzheimer_SingleCell" -> "**single-cell RNA sequencing**",
+    the research goal itself if the scope has no known modality.
+    """
+    return SCOPE_DATA_MODALITY_DICT.get(research_goal.rsplit("_", 1)[-1], research_goal)
+
+def split_scope_instructions(instructions: Optional[str]) -> tuple[str, list[str]]:
+    """
+    Split the original data instructions into the part shared by the scopes and the scope specific lines
+    (the targeted disease), the latter are checked by the relevance step when the verdicts are shared.
+    Returns:
+        tuple: The shared instructions and the scope specific lines without their enumeration.
+    """
+    shared_lines = []
+    scope_lines = []
+    for line in (instructions or "N/A").splitlines():
+        if SCOPE_INSTRUCTION_PATTERN.search(line):
+            # without the enumeration, the lines are appended to other instructions
+            scope_lines.append(re.sub(r"^\d+\.\s*", "", line.strip()))
+        else:
+            shared_lines.append(line)
+    return "\n".join(shared_lines).strip(), scope_lines
+
+def hash_instructions(instructions: Optional[str]) -> str:
+    """
+    The hash of the instructions with case, whitespace, markdown emphasis and quote style normalized,
+    so trivially different copies of the same instructions share their verdicts.
+    """
+    text = (instructions or "N/A").lower()
+    text = text.replace("**", "").translate(str.maketrans("“”‘’", "\"\"''"))
+    text = re.sub(r"\s+", " ", text).strip()
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def build_verdict_key(research_goal: str, important_instructions: str, title: Optional[str], full_text: str) -> str:
+    """
+    The key of a verdict: the research goal, the normalized instructions (with the lexical evidence)
+    and the hash of the title and packed content. A new extractor version or token budget changes
+    the content, so verdicts on the old content aren't reused.
+    """
+    content_hash = hashlib.sha256(f"{title}\n{full_text}".encode("utf-8")).hexdigest()
+    key = json.dumps([research_goal, hash_instructions(important_instructions), content_hash])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
 class IdentifyOriginalDataStep(sskindCommonStep):
     """
     This class implements the step to identify if the data in a paper is original.
@@ -65,21 +129,81 @@ class IdentifyOriginalDataStep(sskindCommonStep):
         self, 
         llm: BaseChatOpenAI,
         two_steps_agent: bool = False,
+        content_token_budget: Optional[int] = None,
+        verdict_db: Optional[OriginalVerdictDB] = None,
     ):
+        """
+        Args:
+            content_token_budget (int, optional): The token budget of the paper content in the prompt,
+                defaults to $IDENTIFY_ORIGINAL_CONTENT_TOKENS or DEFAULT_ORIGINAL_CONTENT_TOKENS, 0 puts all content into the prompt.
+            verdict_db (OriginalVerdictDB, optional): Reuse the verdict on the same paper with the same research goal,
+                (normalized) instructions, content and model, e.g. from another scope, instead of asking the llm again.
+        """
         super().__init__(llm)
         self.llm = llm
         self.step_name = "Identify Original Data Step"
         self.two_steps_agent = two_steps_agent
+        self.content_token_budget = (
+            content_token_budget if content_token_budget is not None
+            else get_content_token_budget(IDENTIFY_ORIGINAL_CONTENT_TOKENS_ENV, DEFAULT_ORIGINAL_CONTENT_TOKENS)
+        )
+        self.verdict_db = verdict_db
 
-    def _execute_directly(self, state: dict) -> tuple[dict | None, dict[str, int] | None]:
-        typed_state: IdentifyState = IdentifyState(**state)
+    def _select_verdict(self, typed_state: IdentifyState, verdict_key: str) -> bool:
+        """
+        Set the memorized verdict on the state, returns False if there is none.
+        """
+        if self.verdict_db is None:
+            return False
+        original, reasoning_process = self.verdict_db.select_verdict(
+            typed_state.get("pmid"),
+            verdict_key,
+            get_model_id(self.llm),
+        )
+        if original is None:
+            return False
+        typed_state["original"] = original
+        self._print_step(
+            typed_state,
+            step_output=f"PMID: {typed_state.get('pmid', 'N/A')}, reused verdict: {original}\n{reasoning_process}",
+        )
+        return True
+
+    def _insert_verdict(self, typed_state: IdentifyState, verdict_key: str, reasoning_process: Optional[str]):
+        if self.verdict_db is None or typed_state.get("pmid") is None:
+            return
+        self.verdict_db.insert_verdict(
+            typed_state["pmid"],
+            verdict_key,
+            get_model_id(self.llm),
+            typed_state["original"],
+            reasoning_process,
+        )
+
+    def _prepare_agent(self, typed_state: IdentifyState) -> tuple[CommonAgent, str, str]:
+        """
+        Returns:
+            tuple: The agent, the system prompt and the verdict key of the prompt inputs.
+        """
         pmid = typed_state.get("pmid", "N/A")
         self._print_step(typed_state, step_output=f"PMID: {pmid}")
         
-        research_goal = typed_state.get("research_goal")
+        research_goal = typed_state.get("original_research_goal") or typed_state.get("research_goal")
         important_instructions = typed_state.get("identify_original_instructions", "N/A")
+        lexical_evidence = typed_state.get("lexical_evidence")
+        if lexical_evidence:
+            important_instructions += (
+                "\n\nThe following identifiers and keywords were found in the full text, "
+                "verify them in their context:\n" + format_lexical_evidence(lexical_evidence)
+            )
         title = typed_state.get("title")
-        full_text = typed_state.get("content")
+        # deduplicated sections, the prioritized ones first, within the token budget
+        full_text = pack_content(
+            typed_state.get("content"),
+            typed_state.get("sections"),
+            self.content_token_budget,
+            ORIGINAL_DATA_SECTION_PRIORITIES,
+        )
 
         agent = CommonAgent(llm=self.llm) if not self.two_steps_agent else CommonAgentTwoChainSteps(self.llm)
         system_prompt = IDENTIFY_ORIGINAL_DATA_SYSTEM_PROMPT.format(
@@ -88,16 +212,46 @@ class IdentifyOriginalDataStep(sskindCommonStep):
             full_text=full_text,
             important_instructions=important_instructions,
         )
-        res, _, token_usage, reasoning_process = agent.go(
-            system_prompt=system_prompt,
-            instruction_prompt="Before jumping to final answer, you need to explain **the reasoning process** first.\nNow, let's identify if the data is original and accessible.",
-            schema=IdentifyOriginalDataResult,
-        )
+        return agent, system_prompt, build_verdict_key(research_goal, important_instructions, title, full_text)
+
+    def _update_state(self, typed_state: IdentifyState, res: IdentifyOriginalDataResult, reasoning_process: Optional[str]):
         typed_state["original"] = res.original_and_accessible
         self._print_step(
             typed_state,
             step_output=res.reasoning_process if reasoning_process is None else reasoning_process,
         )
 
+    def _execute_directly(self, state: dict) -> tuple[dict | None, dict[str, int] | None]:
+        typed_state: IdentifyState = IdentifyState(**state)
+        agent, system_prompt, verdict_key = self._prepare_agent(typed_state)
+        if self._select_verdict(typed_state, verdict_key):
+            return dict(typed_state), None
+        res, _, token_usage, reasoning_process = agent.go(
+            system_prompt=system_prompt,
+            instruction_prompt=IDENTIFY_ORIGINAL_DATA_INSTRUCTION_PROMPT,
+            schema=IdentifyOriginalDataResult,
+        )
+        self._update_state(typed_state, res, reasoning_process)
+        self._insert_verdict(typed_state, verdict_key, res.reasoning_process if reasoning_process is None else reasoning_process)
+
+        return dict(typed_state), token_usage
+
+    async def _aexecute_directly(self, state: dict) -> tuple[dict | None, dict[str, int] | None]:
+        typed_state: IdentifyState = IdentifyState(**state)
+        agent, system_prompt, verdict_key = self._prepare_agent(typed_state)
+        # the verdict database is sqlite, keep it off the event loop
+        if await asyncio.to_thread(self._select_verdict, typed_state, verdict_key):
+            return dict(typed_state), None
+        res, _, token_usage, reasoning_process = await agent.ago(
+            system_prompt=system_prompt,
+            instruction_prompt=IDENTIFY_ORIGINAL_DATA_INSTRUCTION_PROMPT,
+            schema=IdentifyOriginalDataResult,
+        )
+        self._update_state(typed_state, res, reasoning_process)
+        await asyncio.to_thread(
+            self._insert_verdict,
+            typed_state, verdict_key, res.reasoning_process if reasoning_process is None else reasoning_process,
+        )
+
         return dict(typed_state), token_usage
 
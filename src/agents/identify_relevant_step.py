@@ -8,6 +8,8 @@ from .common_step import sskindCommonStep
 from .common_agent import CommonAgent
 from .common_agent_2step import CommonAgentTwoSteps, CommonAgentTwoChainSteps
 from .agent_utils import IdentifyState, RESEARCH_GOAL_DICT
+from .constants import IDENTIFY_RELEVANCE_CONTENT_TOKENS_ENV, DEFAULT_RELEVANCE_CONTENT_TOKENS
+from .content_packing import RELEVANCE_SECTION_PRIORITIES, get_content_token_budget, pack_content
 
 IDENTIFY_RELEVANCE_SYSTEM_PROMPT = ChatPromptTemplate.from_template("""
 ---
@@ -45,6 +47,8 @@ Respond in the following format:
 **FinalAnswer**: [Yes / No]
 """)
 
+IDENTIFY_RELEVANCE_INSTRUCTION_PROMPT = "Before jumping to final answer, you need to explain **the reasoning process** first.\nNow, let's identify the relevance of this paper."
+
 class IdentifyRelevanceResult(BaseModel):
     reasoning_process: Optional[str] = Field(
         description="The reasoning process used to determine relevance."
@@ -62,21 +66,36 @@ class IdentifyRelevanceStep(sskindCommonStep):
         self, 
         llm: BaseChatOpenAI,
         two_steps_agent: bool = False,
+        content_token_budget: Optional[int] = None,
     ):
+        """
+        Args:
+            content_token_budget (int, optional): The token budget of the paper content in the prompt,
+                defaults to $IDENTIFY_RELEVANCE_CONTENT_TOKENS or DEFAULT_RELEVANCE_CONTENT_TOKENS, 0 puts all content into the prompt.
+        """
         super().__init__(llm)
         self.llm = llm
         self.step_name = "Identify Relevance Step"
         self.two_steps_agent = two_steps_agent
+        self.content_token_budget = (
+            content_token_budget if content_token_budget is not None
+            else get_content_token_budget(IDENTIFY_RELEVANCE_CONTENT_TOKENS_ENV, DEFAULT_RELEVANCE_CONTENT_TOKENS)
+        )
 
-    def _execute_directly(self, state: dict) -> tuple[dict | None, dict[str, int] | None]:
-        typed_state: IdentifyState = IdentifyState(**state)
+    def _prepare_agent(self, typed_state: IdentifyState) -> tuple[CommonAgent, str]:
         pmid = typed_state.get("pmid", "N/A")
         self._print_step(typed_state, step_output=f"PMID: {pmid}")
         research_goal = typed_state.get("research_goal")
         identify_relevant_instructions = typed_state.get("identify_relevant_instructions", "N/A")
         title = typed_state.get("title")
         abstract = typed_state.get("abstract")
-        full_text = typed_state.get("content")
+        # deduplicated sections, the prioritized ones first, within the token budget
+        full_text = pack_content(
+            typed_state.get("content"),
+            typed_state.get("sections"),
+            self.content_token_budget,
+            RELEVANCE_SECTION_PRIORITIES,
+        )
 
         agent = CommonAgent(self.llm) if not self.two_steps_agent else CommonAgentTwoChainSteps(self.llm)
         system_prompt = IDENTIFY_RELEVANCE_SYSTEM_PROMPT.format(
@@ -85,15 +104,35 @@ class IdentifyRelevanceStep(sskindCommonStep):
             full_text=full_text,
             identify_relevant_instructions=identify_relevant_instructions,
         )
-        res, _, token_usage, reasoning_process = agent.go(
-            system_prompt=system_prompt,
-            instruction_prompt="Before jumping to final answer, you need to explain **the reasoning process** first.\nNow, let's identify the relevance of this paper.",
-            schema=IdentifyRelevanceResult,
-        )
+        return agent, system_prompt
+
+    def _update_state(self, typed_state: IdentifyState, res: IdentifyRelevanceResult, reasoning_process: Optional[str]):
         typed_state["relevant"] = res.relevant
         self._print_step(
             typed_state,
             step_output=res.reasoning_process if reasoning_process is None else reasoning_process,
         )
 
+    def _execute_directly(self, state: dict) -> tuple[dict | None, dict[str, int] | None]:
+        typed_state: IdentifyState = IdentifyState(**state)
+        agent, system_prompt = self._prepare_agent(typed_state)
+        res, _, token_usage, reasoning_process = agent.go(
+            system_prompt=system_prompt,
+            instruction_prompt=IDENTIFY_RELEVANCE_INSTRUCTION_PROMPT,
+            schema=IdentifyRelevanceResult,
+        )
+        self._update_state(typed_state, res, reasoning_process)
+
+        return dict(typed_state), token_usage
+
+    async def _aexecute_directly(self, state: dict) -> tuple[dict | None, dict[str, int] | None]:
+        typed_state: IdentifyState = IdentifyState(**state)
+        agent, system_prompt = self._prepare_agent(typed_state)
+        res, _, token_usage, reasoning_process = await agent.ago(
+            system_prompt=system_prompt,
+            instruction_prompt=IDENTIFY_RELEVANCE_INSTRUCTION_PROMPT,
+            schema=IdentifyRelevanceResult,
+        )
+        self._update_state(typed_state, res, reasoning_process)
+
         return dict(typed_state), token_usage
@@ -0,0 +1,140 @@
+import re
+from functools import lru_cache
+from typing import Optional, TypedDict
+
+# the evidence kinds, a paper without any DATA_SIGNAL_KINDS evidence is short-circuited
+EVIDENCE_ACCESSION = "accession"
+EVIDENCE_LINK = "link"
+EVIDENCE_KEYWORD = "keyword"
+EVIDENCE_REQUEST_ONLY = "request_only"
+DATA_SIGNAL_KINDS = (EVIDENCE_ACCESSION, EVIDENCE_LINK, EVIDENCE_KEYWORD)
+
+# at most this many pieces of evidence are kept, and this many characters around each match
+MAX_EVIDENCE = 20
+EVIDENCE_CONTEXT_CHARS = 80
+
+ACCESSION_PATTERN = re.compile(r"""
+    \b(?:
+        G(?:SE|SM|DS)\d{3,}                     # GEO
+        | syn\d{6,}                             # Synapse
+        | PRJ(?:NA|EB|DB)\d+                    # BioProject
+        | [SDE]R[PRSX]\d{6,}                    # SRA / ENA / DDBJ
+        | E-[A-Z]{4}-\d+                        # ArrayExpress
+        | EGA[SD]\d{11}                         # EGA
+        | phs\d{6}(?:\.v\d+)?                   # dbGaP
+        | (?:HRA|CRA)\d{6}                      # GSA
+        | 10\.5281/zenodo\.\d+                  # zenodo DOI
+        | 10\.6084/m9\.figshare\.\d+            # figshare DOI
+    )\b
+""", re.VERBOSE)
+
+LINK_PATTERN = re.compile(r"""
+    (?:https?://)?(?:www\.)?
+    (?:
+        github\.com
+        | zenodo\.org
+        | figshare\.com
+        | synapse\.org
+        | ncbi\.nlm\.nih\.gov/(?:geo|sra|bioproject)
+        | ebi\.ac\.uk
+        | cellxgene\.cziscience\.com
+        | ngdc\.cncb\.ac\.cn
+        | datadryad\.org
+    )[^\s,;)\]]*
+""", re.VERBOSE | re.IGNORECASE)
+
+REQUEST_ONLY_PATTERN = re.compile(
+    r"available\s+(?:from\s+the\s+(?:corresponding\s+)?authors?\s+)?(?:up)?on\s+(?:reasonable\s+)?request",
+    re.IGNORECASE,
+)
+
+# "* keyword" bullets in the instructions
+_BULLET_PATTERN = re.compile(r"^\s*\*\s+(.+?)\s*$", re.MULTILINE)
+
+class LexicalEvidence(TypedDict):
+    kind: str
+    match: str
+    context: str
+
+def extract_instruction_keywords(instructions: Optional[str]) -> tuple[str, ...]:
+    """
+    The literal keywords listed as "* keyword" bullets in the scope instructions,
+    e.g. "snRNA-seq" or "10X Genomics". Descriptive bullets (with markdown emphasis, parentheses
+    or a trailing period) are skipped, "A / B" bullets are split into both keywords.
+    """
+    if not instructions:
+        return ()
+    keywords = []
+    for bullet in _BULLET_PATTERN.findall(instructions):
+        if "**" in bullet or "(" in bullet or bullet.endswith((".", ",", ":")):
+            continue
+        for keyword in bullet.split("/"):
+            keyword = keyword.strip()
+            if keyword and keyword.lower() not in (k.lower() for k in keywords):
+                keywords.append(keyword)
+    return tuple(keywords)
+
+@lru_cache(maxsize=64)
+def compile_keyword_pattern(keywords: tuple[str, ...]) -> Optional[re.Pattern]:
+    """
+    One case insensitive alternation of the keywords, spaces and hyphens in a keyword match
+    any (or no) spaces and hyphens, so "snRNA-seq" also matches "snRNA seq" and "snRNAseq".
+    """
+    alternatives = []
+    for keyword in sorted(keywords, key=len, reverse=True):
+        words = [re.escape(word) for word in re.split(r"[\s\-]+", keyword) if word]
+        if words:
+            alternatives.append(r"[\s\-]*".join(words))
+    if not alternatives:
+        return None
+    return re.compile(r"(?<!\w)(?:" + "|".join(alternatives) + r")(?!\w)", re.IGNORECASE)
+
+def _context(text: str, start: int, end: int) -> str:
+    left = max(0, start - EVIDENCE_CONTEXT_CHARS)
+    right = min(len(text), end + EVIDENCE_CONTEXT_CHARS)
+    return re.sub(r"\s+", " ", text[left:right]).strip()
+
+def find_lexical_evidence(text: Optional[str], instructions: Optional[str] = None) -> list[LexicalEvidence]:
+    """
+    Find accession numbers, repository links, the instruction keywords and "available upon request"
+    statements in the text. Every distinct match is reported once, accessions and links first.
+    Args:
+        text (str): The plaintext of the paper.
+        instructions (str, optional): The scope instructions the keywords are extracted from.
+    Returns:
+        list[LexicalEvidence]: At most MAX_EVIDENCE pieces of evidence.
+    """
+    if not text:
+        return []
+    patterns = [
+        (EVIDENCE_ACCESSION, ACCESSION_PATTERN),
+        (EVIDENCE_LINK, LINK_PATTERN),
+        (EVIDENCE_KEYWORD, compile_keyword_pattern(extract_instruction_keywords(instructions))),
+        (EVIDENCE_REQUEST_ONLY, REQUEST_ONLY_PATTERN),
+    ]
+    evidence: list[LexicalEvidence] = []
+    seen = set()
+    for kind, pattern in patterns:
+        if pattern is None:
+            continue
+        for m in pattern.finditer(text):
+            match = m.group(0).rstrip(".")
+            key = (kind, re.sub(r"[\s\-]+", "", match.lower()))
+            if key in seen:
+                continue
+            seen.add(key)
+            evidence.append(LexicalEvidence(kind=kind, match=match, context=_context(text, m.start(), m.end())))
+            if len(evidence) >= MAX_EVIDENCE:
+                return evidence
+    return evidence
+
+def has_data_signal(evidence: list[LexicalEvidence]) -> bool:
+    return any(item["kind"] in DATA_SIGNAL_KINDS for item in evidence)
+
+def format_lexical_evidence(evidence: list[LexicalEvidence]) -> str:
+    """
+    The evidence as a markdown list for the prompt.
+    """
+    return "\n".join(
+        f"- {item['kind']}: **{item['match']}** ... {item['context']} ..." for item in evidence
+    )
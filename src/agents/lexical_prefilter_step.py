@@ -0,0 +1,35 @@
+
+from .common_step import CommonStep
+from .agent_utils import IdentifyState
+from .lexical_prefilter import find_lexical_evidence, has_data_signal
+
+class LexicalPrefilterStep(CommonStep):
+    """
+    This class implements the deterministic step before the original data step, it looks for
+    accession numbers, repository links and the keywords of the original data instructions in the full text.
+    Papers without any of them are marked as not original without an llm call,
+    the evidence found is passed to the original data step otherwise.
+    """
+    def __init__(self):
+        super().__init__()
+        self.step_name = "Lexical Prefilter Step"
+
+    def _execute_directly(self, state: dict) -> tuple[dict | None, dict[str, int] | None]:
+        typed_state: IdentifyState = IdentifyState(**state)
+        evidence = find_lexical_evidence(
+            typed_state.get("content"),
+            typed_state.get("identify_original_instructions"),
+        )
+        typed_state["lexical_evidence"] = evidence
+        if not has_data_signal(evidence):
+            typed_state["original"] = False
+        matches = ", ".join(item["match"] for item in evidence) or "none"
+        self._print_step(
+            typed_state,
+            step_output=f"PMID: {typed_state.get('pmid', 'N/A')}, matches: {matches}",
+        )
+        return dict(typed_state), None
+
+    async def _aexecute_directly(self, state: dict) -> tuple[dict | None, dict[str, int] | None]:
+        # regex matching takes microseconds, no need for a worker thread
+        return self._execute_directly(state)
@@ -0,0 +1,62 @@
+import hashlib
+import json
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+from ..database.llm_cache_db import LLMCacheDB
+
+# the process wide llm response cache used by CommonAgent, disabled unless set
+_llm_cache: Optional[LLMCacheDB] = None
+
+def set_llm_cache(cache: Optional[LLMCacheDB]):
+    global _llm_cache
+    _llm_cache = cache
+
+def get_llm_cache() -> Optional[LLMCacheDB]:
+    return _llm_cache
+
+def _schema_json(schema: Any) -> str:
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        return json.dumps(schema.model_json_schema(), sort_keys=True)
+    return json.dumps(schema, sort_keys=True, default=str)
+
+def get_model_id(llm: Any) -> str:
+    """
+    The model and deployment of the llm, e.g. "gpt-4o/my-deployment".
+    """
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None)
+    deployment = getattr(llm, "deployment_name", None)
+    return "/".join(str(name) for name in (model, deployment) if name) or type(llm).__name__
+
+def build_llm_cache_key(
+    agent_name: str,
+    llm: Any,
+    system_prompt: str,
+    instruction_prompt: str,
+    schema: Any,
+) -> str:
+    """
+    The cache key of an agent call: the sha256 of the agent class, the model, deployment and temperature,
+    the output schema and the rendered prompts.
+    """
+    key = json.dumps([
+        agent_name,
+        getattr(llm, "model_name", None) or getattr(llm, "model", None),
+        getattr(llm, "deployment_name", None),
+        getattr(llm, "temperature", None),
+        _schema_json(schema),
+        system_prompt,
+        instruction_prompt,
+    ], default=str)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def dump_result(res: Any) -> Any:
+    if isinstance(res, BaseModel):
+        return res.model_dump(mode="json")
+    return res
+
+def load_result(value: Any, schema: Any) -> Any:
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        return schema.model_validate(value)
+    return value
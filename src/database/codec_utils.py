@@ -0,0 +1,52 @@
+import logging
+import zlib
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:  # zlib is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Compressed values are stored as BLOBs that start with a codec marker,
+# plain TEXT values are legacy rows written before compression was introduced.
+ZSTD_MARKER = b"zstd:"
+ZLIB_MARKER = b"zlib:"
+ZSTD_LEVEL = 9
+ZLIB_LEVEL = 6
+
+def is_compressed(value: bytes | str | None) -> bool:
+    return isinstance(value, bytes) and (
+        value.startswith(ZSTD_MARKER) or value.startswith(ZLIB_MARKER)
+    )
+
+def compress_text(text: str) -> bytes:
+    """
+    Compress text with zstd (or zlib if zstandard is not installed) and prefix the codec marker.
+    """
+    data = text.encode("utf-8")
+    if zstandard is not None:
+        return ZSTD_MARKER + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return ZLIB_MARKER + zlib.compress(data, ZLIB_LEVEL)
+
+def decompress_text(value: bytes | str | None) -> Optional[str]:
+    """
+    Decompress a value written by compress_text, plain text values are returned unchanged.
+    Returns None if the value can't be decompressed.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    try:
+        if value.startswith(ZSTD_MARKER):
+            if zstandard is None:
+                logger.error("zstandard is not installed, can't decompress zstd value")
+                return None
+            data = zstandard.ZstdDecompressor().decompress(value[len(ZSTD_MARKER):])
+            return data.decode("utf-8")
+        if value.startswith(ZLIB_MARKER):
+            return zlib.decompress(value[len(ZLIB_MARKER):]).decode("utf-8")
+        return value.decode("utf-8")
+    except Exception as e:  # zlib.error, zstandard.ZstdError, UnicodeDecodeError
+        logger.error(f"Error decompressing value: {e}")
+        return None
@@ -0,0 +1,105 @@
+import sqlite3
+from sqlite3 import Connection
+import os
+import threading
+from typing import Callable, Optional
+import logging
+
+DATABASE_FOLDER = "database"
+
+# Every thread keeps one long-lived connection per database file, so connections are
+# never shared between threads and a cache lookup doesn't pay for connect/close.
+_thread_local = threading.local()
+# database files whose tables have been checked by this process
+_initialized_db_files: set[str] = set()
+_initialized_lock = threading.Lock()
+
+def get_database_folder() -> str:
+    return os.path.join(os.getenv("DATA_FOLDER", "."), DATABASE_FOLDER)
+
+def _open_connection(db_file: str) -> Connection:
+    # sqlite3 keeps compiled statements per connection (cached_statements), so the
+    # module level sql strings are prepared once per thread and reused afterwards
+    connection = sqlite3.connect(db_file, timeout=30.0, cached_statements=256)
+    # WAL lets readers proceed while another thread or process is writing
+    connection.execute("PRAGMA journal_mode=WAL;")
+    connection.execute("PRAGMA synchronous=NORMAL;")
+    connection.execute("PRAGMA busy_timeout=30000;")
+    return connection
+
+def _ensure_tables(
+    db_file: str,
+    connection: Connection,
+    create_table_sqls: list[str],
+    migrate: Optional[Callable[[Connection], None]] = None,
+):
+    with _initialized_lock:
+        if db_file in _initialized_db_files:
+            return
+        with connection:
+            for sql in create_table_sqls:
+                connection.execute(sql)
+            if migrate is not None:
+                migrate(connection)
+        _initialized_db_files.add(db_file)
+
+def add_missing_columns(connection: Connection, table: str, columns: dict[str, str]):
+    """
+    Add the columns missing in a table created by an older version, `CREATE TABLE IF NOT EXISTS`
+    doesn't change existing tables.
+    Args:
+        connection (Connection): The connection to the database.
+        table (str): The table name.
+        columns (dict[str, str]): The column definitions by column name, e.g. {"doi": "TEXT DEFAULT NULL"}.
+    """
+    existing_columns = {row[1] for row in connection.execute(f"PRAGMA table_info({table});")}
+    for name, definition in columns.items():
+        if name in existing_columns:
+            continue
+        try:
+            connection.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition};")
+        except sqlite3.OperationalError as e:
+            # another process added it in the meantime
+            if "duplicate column" not in str(e):
+                raise
+
+def get_connection(
+    db_name: str,
+    create_table_sqls: list[str],
+    migrate: Optional[Callable[[Connection], None]] = None,
+) -> Optional[Connection]:
+    """
+    Get the calling thread's connection to the database {db_name}.db in the database folder,
+    the connection is created (and the tables are checked) on first use.
+    Args:
+        db_name (str): The database name.
+        create_table_sqls (list[str]): The `CREATE TABLE IF NOT EXISTS` statements of the database.
+        migrate (Callable, optional): Updates tables created by older versions, e.g. with add_missing_columns,
+            it runs after the create statements.
+    Returns:
+        Connection: The connection, or None if the database can't be opened.
+    """
+    db_path = get_database_folder()
+    db_file = os.path.join(db_path, db_name + ".db")
+    connections: dict[str, Connection] | None = getattr(_thread_local, "connections", None)
+    if connections is None:
+        connections = {}
+        _thread_local.connections = connections
+    connection = connections.get(db_file)
+    if connection is not None:
+        return connection
+    try:
+        # Ensure the local path exists
+        os.makedirs(db_path, exist_ok=True)
+        connection = _open_connection(db_file)
+    except (OSError, sqlite3.Error) as e:
+        logging.error(e)
+        return None
+    try:
+        _ensure_tables(db_file, connection, create_table_sqls, migrate)
+    except sqlite3.Error as e:
+        logging.error(e)
+        connection.close()
+        return None
+    connections[db_file] = connection
+    return connection
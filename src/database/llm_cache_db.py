@@ -0,0 +1,140 @@
+
+import json
+import sqlite3
+import threading
+import time
+from sqlite3 import Connection
+from typing import Optional
+import logging
+
+from .codec_utils import compress_text, decompress_text
+from .db_utils import get_connection
+
+LLM_CACHE_DB = "llm_cache"
+llm_cache_create_table_sql = f"""
+CREATE TABLE IF NOT EXISTS {LLM_CACHE_DB} (
+    cache_key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+"""
+llm_cache_create_index_sql = f"""
+CREATE INDEX IF NOT EXISTS {LLM_CACHE_DB}_accessed_at ON {LLM_CACHE_DB} (accessed_at);
+"""
+llm_cache_select_sql = f"""
+SELECT value, created_at FROM {LLM_CACHE_DB} WHERE cache_key = ?;
+"""
+llm_cache_touch_sql = f"""
+UPDATE {LLM_CACHE_DB} SET accessed_at = ? WHERE cache_key = ?;
+"""
+llm_cache_delete_sql = f"""
+DELETE FROM {LLM_CACHE_DB} WHERE cache_key = ?;
+"""
+llm_cache_insert_sql = f"""
+INSERT INTO {LLM_CACHE_DB} (cache_key, value, size, created_at, accessed_at)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(cache_key) DO UPDATE SET
+    value = excluded.value,
+    size = excluded.size,
+    created_at = excluded.created_at,
+    accessed_at = excluded.accessed_at;
+"""
+llm_cache_delete_expired_sql = f"""
+DELETE FROM {LLM_CACHE_DB} WHERE created_at < ?;
+"""
+# keeps the most recently used entries whose sizes add up to at most the limit
+llm_cache_delete_oversize_sql = f"""
+DELETE FROM {LLM_CACHE_DB} WHERE cache_key IN (
+    SELECT cache_key FROM (
+        SELECT cache_key, SUM(size) OVER (ORDER BY accessed_at DESC, cache_key) AS total_size
+        FROM {LLM_CACHE_DB}
+    ) WHERE total_size > ?
+);
+"""
+
+DEFAULT_LLM_CACHE_TTL_DAYS = 30.0
+DEFAULT_LLM_CACHE_MAX_MB = 512.0
+# expired and oversize entries are deleted every this many insertions
+EVICT_INTERVAL = 100
+
+class LLMCacheDB:
+    """
+    The llm response cache, a json value per cache key. Entries expire ttl_days after they
+    are written, and the least recently used entries are evicted once all values take more than max_mb.
+    Connections are owned by the calling thread (see db_utils), one LLMCacheDB can be shared by workers.
+    """
+    def __init__(
+        self,
+        ttl_days: float = DEFAULT_LLM_CACHE_TTL_DAYS,
+        max_mb: float = DEFAULT_LLM_CACHE_MAX_MB,
+    ):
+        self.ttl_seconds = ttl_days * 24 * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._insertions = 0
+        self._insertions_lock = threading.Lock()
+
+    def _connect_db(self) -> Optional[Connection]:
+        return get_connection(LLM_CACHE_DB, [
+            llm_cache_create_table_sql,
+            llm_cache_create_index_sql,
+        ])
+
+    def select(self, cache_key: str) -> Optional[dict]:
+        """
+        Selects the cached value, None if it isn't cached or has expired.
+        """
+        connection = self._connect_db()
+        if connection is None:
+            return None
+        now = time.time()
+        try:
+            row = connection.execute(llm_cache_select_sql, (cache_key,)).fetchone()
+            if not row:
+                return None
+            with connection:
+                if row[1] < now - self.ttl_seconds:
+                    connection.execute(llm_cache_delete_sql, (cache_key,))
+                    return None
+                connection.execute(llm_cache_touch_sql, (now, cache_key))
+            value = decompress_text(row[0])
+            return json.loads(value) if value is not None else None
+        except (sqlite3.Error, ValueError) as e:
+            logging.error(f"Error selecting llm cache entry {cache_key}: {e}")
+            return None
+
+    def insert(self, cache_key: str, value: dict) -> bool:
+        connection = self._connect_db()
+        if connection is None:
+            return False
+        data = compress_text(json.dumps(value))
+        now = time.time()
+        try:
+            with connection:
+                connection.execute(llm_cache_insert_sql, (cache_key, data, len(data), now, now))
+        except sqlite3.Error as e:
+            logging.error(f"Error inserting llm cache entry {cache_key}: {e}")
+            return False
+        with self._insertions_lock:
+            self._insertions += 1
+            evict = self._insertions % EVICT_INTERVAL == 0
+        if evict:
+            self.evict()
+        return True
+
+    def evict(self) -> bool:
+        """
+        Deletes the expired entries, then the least recently used ones beyond the size limit.
+        """
+        connection = self._connect_db()
+        if connection is None:
+            return False
+        try:
+            with connection:
+                connection.execute(llm_cache_delete_expired_sql, (time.time() - self.ttl_seconds,))
+                connection.execute(llm_cache_delete_oversize_sql, (self.max_bytes,))
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Error evicting llm cache entries: {e}")
+            return False
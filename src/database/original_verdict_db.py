@@ -0,0 +1,85 @@
+
+import sqlite3
+from sqlite3 import Connection
+from typing import Optional
+import logging
+
+from .db_utils import get_connection
+
+ORIGINAL_VERDICT_DB = "original_verdict"
+original_verdict_create_table_sql = f"""
+CREATE TABLE IF NOT EXISTS {ORIGINAL_VERDICT_DB} (
+    pmid TEXT NOT NULL,
+    verdict_key TEXT NOT NULL,
+    model TEXT NOT NULL,
+    original BOOLEAN NOT NULL,
+    reasoning_process TEXT DEFAULT NULL,
+    datetime TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now')),
+    PRIMARY KEY (pmid, verdict_key, model)
+);
+"""
+original_verdict_insert_sql = f"""
+INSERT INTO {ORIGINAL_VERDICT_DB} (pmid, verdict_key, model, original, reasoning_process, datetime)
+VALUES (?, ?, ?, ?, ?, strftime('%Y-%m-%d %H:%M:%S', 'now'))
+ON CONFLICT(pmid, verdict_key, model) DO UPDATE SET
+    original = excluded.original,
+    reasoning_process = excluded.reasoning_process,
+    datetime = strftime('%Y-%m-%d %H:%M:%S', 'now');
+"""
+original_verdict_select_sql = f"""
+SELECT original, reasoning_process FROM {ORIGINAL_VERDICT_DB}
+WHERE pmid = ? AND verdict_key = ? AND model = ?;
+"""
+
+class OriginalVerdictDB:
+    """
+    The original data verdicts per (pmid, verdict key, model), shared by the scopes whose original data
+    prompt inputs are the same (see identify_original_step.build_verdict_key).
+    Connections are owned by the calling thread (see db_utils), one OriginalVerdictDB can be shared by workers.
+    """
+    def _connect_db(self) -> Optional[Connection]:
+        return get_connection(ORIGINAL_VERDICT_DB, [original_verdict_create_table_sql])
+
+    def insert_verdict(
+        self,
+        pmid: str,
+        verdict_key: str,
+        model: str,
+        original: bool,
+        reasoning_process: Optional[str] = None,
+    ) -> bool:
+        connection = self._connect_db()
+        if connection is None:
+            return False
+        try:
+            with connection:
+                connection.execute(
+                    original_verdict_insert_sql,
+                    (pmid, verdict_key, model, original, reasoning_process),
+                )
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Error inserting original data verdict of paper with PMID {pmid}: {e}")
+            return False
+
+    def select_verdict(
+        self,
+        pmid: str,
+        verdict_key: str,
+        model: str,
+    ) -> tuple[Optional[bool], Optional[str]]:
+        """
+        Returns:
+            tuple: The verdict and its reasoning process, (None, None) if there is no verdict.
+        """
+        connection = self._connect_db()
+        if connection is None:
+            return None, None
+        try:
+            row = connection.execute(original_verdict_select_sql, (pmid, verdict_key, model)).fetchone()
+            if not row:
+                return None, None
+            return bool(row[0]), row[1]
+        except sqlite3.Error as e:
+            logging.error(f"Error selecting original data verdict of paper with PMID {pmid}: {e}")
+            return None, None
@@ -1,13 +1,22 @@
 
+import json
 import sqlite3
 from sqlite3 import Connection
-import os
-from time import strftime
 from typing import Optional, List
 import logging
 
-DATABASE_FOLDER = "database"
+from .codec_utils import compress_text, decompress_text, is_compressed
+from .db_utils import add_missing_columns, get_connection, get_database_folder
+
 PMID_PAPER_DB = "pmid_paper"
+# the article ids resolved up front (see PubMedPaperRetriever.resolve_article_ids),
+# added to databases created before they were introduced
+PMID_PAPER_ID_COLUMNS = {
+    "pmcid": "TEXT DEFAULT NULL",
+    "doi": "TEXT DEFAULT NULL",
+    "full_text_url": "TEXT DEFAULT NULL",
+    "ids_resolved": "BOOLEAN DEFAULT FALSE",
+}
 pmid_paper_create_table_sql = f"""
 CREATE TABLE IF NOT EXISTS {PMID_PAPER_DB} (
     pmid TEXT PRIMARY KEY,
@@ -15,6 +24,10 @@ CREATE TABLE IF NOT EXISTS {PMID_PAPER_DB} (
     title TEXT DEFAULT NULL,
     abstract TEXT DEFAULT NULL,
     is_preprint BOOLEAN DEFAULT FALSE,
+    pmcid TEXT DEFAULT NULL,
+    doi TEXT DEFAULT NULL,
+    full_text_url TEXT DEFAULT NULL,
+    ids_resolved BOOLEAN DEFAULT FALSE,
     datetime TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now')),
     UNIQUE(pmid)
 );
@@ -38,108 +51,290 @@ ON CONFLICT(pmid) DO UPDATE SET
 pmid_paper_select_html_sql = f"""
 SELECT html_content FROM {PMID_PAPER_DB} WHERE pmid = ?;
 """
+pmid_paper_migrate_html_sql = f"""
+UPDATE {PMID_PAPER_DB} SET html_content = ? WHERE pmid = ?;
+"""
 pmid_paper_select_title_abstract_sql = f"""
 SELECT title, abstract, is_preprint FROM {PMID_PAPER_DB} WHERE pmid = ?;
 """
 
+PMID_PLAINTEXT_DB = "pmid_plaintext"
+pmid_plaintext_create_table_sql = f"""
+CREATE TABLE IF NOT EXISTS {PMID_PLAINTEXT_DB} (
+    pmid TEXT NOT NULL,
+    extractor_version TEXT NOT NULL,
+    plaintext BLOB NOT NULL,
+    sections BLOB DEFAULT NULL,
+    datetime TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now')),
+    PRIMARY KEY (pmid, extractor_version)
+);
+"""
+pmid_plaintext_insert_sql = f"""
+INSERT INTO {PMID_PLAINTEXT_DB} (pmid, extractor_version, plaintext, sections, datetime)
+VALUES (?, ?, ?, ?, strftime('%Y-%m-%d %H:%M:%S', 'now'))
+ON CONFLICT(pmid, extractor_version) DO UPDATE SET
+    plaintext = excluded.plaintext,
+    sections = excluded.sections,
+    datetime = strftime('%Y-%m-%d %H:%M:%S', 'now');
+"""
+pmid_plaintext_select_sql = f"""
+SELECT plaintext, sections FROM {PMID_PLAINTEXT_DB} WHERE pmid = ? AND extractor_version = ?;
+"""
+
+PMID_PAPER_COLUMNS = ["html_content", "title", "abstract", "is_preprint"]
+# the columns upsert_many and select_many accept, select_many returns PMID_PAPER_COLUMNS by default
+PMID_PAPER_ALL_COLUMNS = PMID_PAPER_COLUMNS + list(PMID_PAPER_ID_COLUMNS)
+PMID_PAPER_BOOLEAN_COLUMNS = ["is_preprint", "ids_resolved"]
+# stay well below SQLITE_MAX_VARIABLE_NUMBER (999 in older sqlite builds)
+SELECT_MANY_CHUNK_SIZE = 500
+
+def _build_upsert_sql(columns: tuple[str, ...]) -> str:
+    column_names = ", ".join(columns)
+    placeholders = ", ".join(["?"] * len(columns))
+    updates = ",\n    ".join([f"{col} = excluded.{col}" for col in columns])
+    return f"""
+INSERT INTO {PMID_PAPER_DB} (pmid, {column_names}, datetime)
+VALUES (?, {placeholders}, strftime('%Y-%m-%d %H:%M:%S', 'now'))
+ON CONFLICT(pmid) DO UPDATE SET
+    {updates},
+    datetime = strftime('%Y-%m-%d %H:%M:%S', 'now');
+"""
+
+def _check_columns(columns: List[str] | tuple[str, ...]):
+    unknown_columns = [col for col in columns if col not in PMID_PAPER_ALL_COLUMNS]
+    if len(unknown_columns) > 0:
+        raise ValueError(f"Unknown {PMID_PAPER_DB} columns: {unknown_columns}")
+
+def _migrate_pmid_paper(connection: Connection):
+    add_missing_columns(connection, PMID_PAPER_DB, PMID_PAPER_ID_COLUMNS)
+
 class PMIDPaperDB:
+    """
+    The paper cache. Connections are long-lived and owned by the calling thread (see db_utils),
+    so one PMIDPaperDB can be shared by concurrent workers.
+    """
     def __init__(self):
-        self.db_path = os.path.join(os.getenv("DATA_FOLDER", "."), DATABASE_FOLDER)
-        self.connection: Optional[Connection] = None
-    
-    def _ensure_tables(self):
-        if self.connection is None:
-            raise ValueError("Database connection is not initialized.")
-        cursor = self.connection.cursor()
-        cursor.execute(pmid_paper_create_table_sql)
-        self.connection.commit()
+        self.db_path = get_database_folder()
+
+    def _connect_db(self) -> Optional[Connection]:
+        return get_connection(PMID_PAPER_DB, [
+            pmid_paper_create_table_sql,
+            pmid_plaintext_create_table_sql,
+        ], migrate=_migrate_pmid_paper)
     
-    def _connect_db(self):
-        if self.connection is not None:
-            return
-        db_path = self.db_path
-        # Ensure the local path exists
+    @staticmethod
+    def _to_db_value(column: str, value):
+        if column == "html_content" and isinstance(value, str):
+            return compress_text(value)
+        return value
+
+    def _read_html_content(self, pmid: str, value: bytes | str | None) -> Optional[str]:
+        """
+        Decompress cached html content. Rows written before compression hold plain text,
+        they are compressed in place the first time they are read.
+        """
+        if value is None or is_compressed(value):
+            return decompress_text(value)
+        html_content = decompress_text(value)
+        if html_content is None:
+            return None
+        connection = self._connect_db()
         try:
-            os.makedirs(db_path, exist_ok=True)
-        except Exception as e:
-            logging.error(e)
-            return False
-        db_path = os.path.join(db_path, PMID_PAPER_DB + ".db")
-        if not os.path.exists(db_path):
-            try:
-                with open(db_path, "w"):
-                    pass
-            except Exception as e:
-                logging.error(e)
-                return False
-        self.connection = sqlite3.connect(db_path)
-        return True
-    
+            with connection:
+                connection.execute(pmid_paper_migrate_html_sql, (compress_text(html_content), pmid))
+        except sqlite3.Error as e:
+            logging.error(f"Error compressing html content of paper with PMID {pmid}: {e}")
+        return html_content
+
     def insert_paper_html_content(self, pmid: str, html_content: str) -> bool:
-        if not self._connect_db():
+        connection = self._connect_db()
+        if connection is None:
             return False
-        self._ensure_tables()
-        cursor = self.connection.cursor()
         try:
-            cursor.execute(pmid_paper_insert_html_sql, (pmid, html_content))
-            self.connection.commit()
+            with connection:
+                connection.execute(pmid_paper_insert_html_sql, (pmid, compress_text(html_content)))
             return True
         except sqlite3.Error as e:
             logging.error(f"Error inserting paper with PMID {pmid}: {e}")
             return False
-        finally:
-            self.connection.close()
-            self.connection = None
         
     def insert_paper_title_abstract(self, pmid: str, title: str, abstract: str, is_preprint: bool) -> bool:
-        if not self._connect_db():
+        connection = self._connect_db()
+        if connection is None:
             return False
-        self._ensure_tables()
-        cursor = self.connection.cursor()
         try:
-            cursor.execute(pmid_paper_insert_title_abstract_sql, (pmid, title, abstract, is_preprint))
-            self.connection.commit()
+            with connection:
+                connection.execute(pmid_paper_insert_title_abstract_sql, (pmid, title, abstract, is_preprint))
             return True
         except sqlite3.Error as e:
             logging.error(f"Error inserting paper with PMID {pmid}: {e}")
             return False
-        finally:
-            self.connection.close()
-            self.connection = None
-        
+
+    def insert_papers_title_abstract(self, rows: List[tuple[str, Optional[str], Optional[str], bool]]) -> bool:
+        """
+        Inserts the title, abstract and preprint status of many papers in one transaction.
+        Args:
+            rows (list): A list of (pmid, title, abstract, is_preprint) tuples.
+        Returns:
+            bool: True if all rows are inserted, False otherwise.
+        """
+        return self.upsert_many([
+            {"pmid": pmid, "title": title, "abstract": abstract, "is_preprint": is_preprint}
+            for pmid, title, abstract, is_preprint in rows
+        ])
+
+    def upsert_many(self, rows: List[dict]) -> bool:
+        """
+        Inserts or updates many papers in one transaction. Only the columns present in a row are written,
+        so title/abstract rows don't overwrite cached html content and vice versa.
+        Args:
+            rows (list): A list of dicts with "pmid" and any of the columns
+                "html_content", "title", "abstract", "is_preprint", "pmcid", "doi", "full_text_url", "ids_resolved".
+        Returns:
+            bool: True if all rows are written, False otherwise.
+        Raises:
+            ValueError: If a row contains an unknown column.
+        """
+        if len(rows) == 0:
+            return True
+        # one executemany per column set
+        groups: dict[tuple[str, ...], list[tuple]] = {}
+        for row in rows:
+            columns = tuple(col for col in PMID_PAPER_ALL_COLUMNS if col in row)
+            _check_columns([col for col in row.keys() if col != "pmid"])
+            groups.setdefault(columns, []).append(
+                (row["pmid"], *[self._to_db_value(col, row[col]) for col in columns])
+            )
+        connection = self._connect_db()
+        if connection is None:
+            return False
+        try:
+            with connection:
+                for columns, values in groups.items():
+                    if len(columns) == 0:
+                        continue
+                    connection.executemany(_build_upsert_sql(columns), values)
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Error upserting {len(rows)} papers: {e}")
+            return False
+
+    def select_many(self, pmids: List[str], columns: Optional[List[str]] = None) -> dict[str, dict]:
+        """
+        Selects many papers with `IN (...)` queries of at most SELECT_MANY_CHUNK_SIZE PMIDs.
+        Args:
+            pmids (list): The PubMed IDs of the papers.
+            columns (list, optional): The columns to select, defaults to all columns.
+        Returns:
+            dict: A dictionary mapping the PMIDs found in the database to a dict of the selected columns.
+        Raises:
+            ValueError: If columns contains an unknown column.
+        """
+        columns = list(columns) if columns is not None else PMID_PAPER_COLUMNS
+        _check_columns(columns)
+        if len(pmids) == 0:
+            return {}
+        connection = self._connect_db()
+        if connection is None:
+            return {}
+        papers = {}
+        try:
+            for ix in range(0, len(pmids), SELECT_MANY_CHUNK_SIZE):
+                chunk = pmids[ix:ix+SELECT_MANY_CHUNK_SIZE]
+                placeholders = ", ".join(["?"] * len(chunk))
+                sql = f"SELECT pmid, {', '.join(columns)} FROM {PMID_PAPER_DB} WHERE pmid IN ({placeholders});"
+                # fetch first, reading html content may update legacy rows
+                for row in connection.execute(sql, chunk).fetchall():
+                    paper = dict(zip(columns, row[1:]))
+                    for col in PMID_PAPER_BOOLEAN_COLUMNS:
+                        if col in paper:
+                            paper[col] = bool(paper[col])
+                    if "html_content" in paper:
+                        paper["html_content"] = self._read_html_content(row[0], paper["html_content"])
+                    papers[row[0]] = paper
+            return papers
+        except sqlite3.Error as e:
+            logging.error(f"Error selecting {len(pmids)} papers: {e}")
+            return {}
+
     def select_paper_html_content(self, pmid: str) -> Optional[str]:
-        if not self._connect_db():
+        connection = self._connect_db()
+        if connection is None:
             return None
-        self._ensure_tables()
-        cursor = self.connection.cursor()
         try:
-            cursor.execute(pmid_paper_select_html_sql, (pmid,))
-            row = cursor.fetchone()
+            row = connection.execute(pmid_paper_select_html_sql, (pmid,)).fetchone()
             if row:
-                return row[0]
+                return self._read_html_content(pmid, row[0])
             return None
         except sqlite3.Error as e:
             logging.error(f"Error selecting paper with PMID {pmid}: {e}")
             return None
-        finally:
-            self.connection.close()
-            self.connection = None
 
     def select_paper_title_abstract(self, pmid: str) -> tuple[Optional[str], Optional[str], bool]:
-        
-        if not self._connect_db():
+        connection = self._connect_db()
+        if connection is None:
             return None, None, False
-        self._ensure_tables()
-        cursor = self.connection.cursor()
         try:
-            cursor.execute(pmid_paper_select_title_abstract_sql, (pmid,))
-            row = cursor.fetchone()
+            row = connection.execute(pmid_paper_select_title_abstract_sql, (pmid,)).fetchone()
             if row:
                 return row[0], row[1], bool(row[2])
             return None, None, False
         except sqlite3.Error as e:
             logging.error(f"Error selecting paper with PMID {pmid}: {e}")
             return None, None, False
-        finally:
-            self.connection.close()
-            self.connection = None
\ No newline at end of file
+
+    def insert_paper_plaintext(
+        self,
+        pmid: str,
+        extractor_version: str,
+        plaintext: str,
+        sections: Optional[List[dict]] = None,
+    ) -> bool:
+        """
+        Caches the plaintext (and sections) extracted from the html content of a paper.
+        Args:
+            pmid (str): The PubMed ID of the paper.
+            extractor_version (str): The version of the extractor that produced the plaintext,
+                entries of other versions are ignored by select_paper_plaintext.
+            plaintext (str): The extracted plaintext.
+            sections (list, optional): The extracted sections, [{"section": ..., "content": ...}, ...].
+        Returns:
+            bool: True if the plaintext is cached, False otherwise.
+        """
+        connection = self._connect_db()
+        if connection is None:
+            return False
+        sections_value = compress_text(json.dumps(sections)) if sections is not None else None
+        try:
+            with connection:
+                connection.execute(
+                    pmid_plaintext_insert_sql,
+                    (pmid, extractor_version, compress_text(plaintext), sections_value),
+                )
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Error inserting plaintext of paper with PMID {pmid}: {e}")
+            return False
+
+    def select_paper_plaintext(
+        self,
+        pmid: str,
+        extractor_version: str,
+    ) -> tuple[Optional[str], Optional[List[dict]]]:
+        """
+        Selects the cached plaintext and sections of a paper.
+        Returns:
+            tuple: A tuple containing the plaintext and the sections, (None, None) if not cached.
+        """
+        connection = self._connect_db()
+        if connection is None:
+            return None, None
+        try:
+            row = connection.execute(pmid_plaintext_select_sql, (pmid, extractor_version)).fetchone()
+            if not row:
+                return None, None
+            sections = decompress_text(row[1])
+            return decompress_text(row[0]), json.loads(sections) if sections is not None else None
+        except (sqlite3.Error, ValueError) as e:
+            logging.error(f"Error selecting plaintext of paper with PMID {pmid}: {e}")
+            return None, None
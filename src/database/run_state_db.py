@@ -0,0 +1,95 @@
+
+import sqlite3
+from sqlite3 import Connection
+from typing import Optional
+import logging
+
+from .db_utils import get_connection
+
+RUN_STATE_DB = "run_state"
+run_state_create_table_sql = f"""
+CREATE TABLE IF NOT EXISTS {RUN_STATE_DB} (
+    scope TEXT NOT NULL,
+    pmid TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    outcome BOOLEAN DEFAULT NULL,
+    error TEXT DEFAULT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    datetime TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now')),
+    PRIMARY KEY (scope, pmid, stage)
+);
+"""
+run_state_start_sql = f"""
+INSERT INTO {RUN_STATE_DB} (scope, pmid, stage, status, outcome, error, attempts, datetime)
+VALUES (?, ?, ?, ?, NULL, NULL, 1, strftime('%Y-%m-%d %H:%M:%S', 'now'))
+ON CONFLICT(scope, pmid, stage) DO UPDATE SET
+    status = excluded.status,
+    outcome = NULL,
+    error = NULL,
+    attempts = attempts + 1,
+    datetime = strftime('%Y-%m-%d %H:%M:%S', 'now');
+"""
+run_state_finish_sql = f"""
+INSERT INTO {RUN_STATE_DB} (scope, pmid, stage, status, outcome, error, attempts, datetime)
+VALUES (?, ?, ?, ?, ?, ?, 1, strftime('%Y-%m-%d %H:%M:%S', 'now'))
+ON CONFLICT(scope, pmid, stage) DO UPDATE SET
+    status = excluded.status,
+    outcome = excluded.outcome,
+    error = excluded.error,
+    datetime = strftime('%Y-%m-%d %H:%M:%S', 'now');
+"""
+run_state_select_sql = f"""
+SELECT pmid, status, outcome FROM {RUN_STATE_DB} WHERE scope = ? AND stage = ?;
+"""
+
+# the statuses of a (scope, pmid, stage)
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+class RunStateDB:
+    """
+    The progress of scope runs, the status and outcome per (scope, pmid, stage),
+    so an interrupted run can skip the PMIDs it has finished.
+    Connections are owned by the calling thread (see db_utils), one RunStateDB can be shared by workers.
+    """
+    def _connect_db(self) -> Optional[Connection]:
+        return get_connection(RUN_STATE_DB, [run_state_create_table_sql])
+
+    def _execute(self, sql: str, params: tuple) -> bool:
+        connection = self._connect_db()
+        if connection is None:
+            return False
+        try:
+            with connection:
+                connection.execute(sql, params)
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Error updating run state {params[:3]}: {e}")
+            return False
+
+    def mark_started(self, scope: str, pmid: str, stage: str) -> bool:
+        return self._execute(run_state_start_sql, (scope, pmid, stage, STATUS_RUNNING))
+
+    def mark_done(self, scope: str, pmid: str, stage: str, outcome: bool) -> bool:
+        return self._execute(run_state_finish_sql, (scope, pmid, stage, STATUS_DONE, outcome, None))
+
+    def mark_failed(self, scope: str, pmid: str, stage: str, error: str) -> bool:
+        return self._execute(run_state_finish_sql, (scope, pmid, stage, STATUS_FAILED, None, error))
+
+    def select_finished(self, scope: str, stage: str) -> dict[str, bool]:
+        """
+        Selects the PMIDs of a scope that have finished the stage.
+        Returns:
+            dict: A dictionary mapping the finished PMIDs to their outcome.
+        """
+        connection = self._connect_db()
+        if connection is None:
+            return {}
+        try:
+            rows = connection.execute(run_state_select_sql, (scope, stage)).fetchall()
+            return {pmid: bool(outcome) for pmid, status, outcome in rows if status == STATUS_DONE}
+        except sqlite3.Error as e:
+            logging.error(f"Error selecting run state of scope {scope}: {e}")
+            return {}
@@ -1,25 +1,77 @@
-from fake_useragent import UserAgent
+import asyncio
 from bs4 import BeautifulSoup
 import logging
 import os
+from typing import NamedTuple, Optional
 import shortuuid
 
-from .make_request import make_article_request, make_get_request
+from .make_request import (
+    ARTICLE_TRANSPORT_INLINE,
+    amake_article_request,
+    amake_get_request,
+    amake_inline_article_request,
+    get_article_max_bytes,
+    get_article_transport,
+    make_article_request,
+    make_get_request,
+    make_inline_article_request,
+)
 from .constants import (
-    headers,
     cookies,
 )
+from .user_agents import build_request_headers
 
 logger = logging.getLogger(__name__)
 
+# the article service doesn't support the inline transport, the article is requested as a file instead
+INLINE_UNSUPPORTED_STATUS_CODES = (400, 404, 405, 501)
+
+def _read_temporary_file(fn: str) -> Optional[str]:
+    """
+    read and remove the temporary file the article service wrote the full-text to,
+    None if it doesn't exist
+    """
+    if not os.path.exists(fn):
+        return None
+    with open(fn, "r") as fobj:
+        text = fobj.read()
+    os.unlink(fn)
+    return text
+
+class ArticleIds(NamedTuple):
+    """
+    The ids of a paper resolved up front (see PubMedPaperRetriever.resolve_article_ids),
+    full_text_url is where the full text is requested from.
+    """
+    pmcid: Optional[str]
+    doi: Optional[str]
+    full_text_url: Optional[str]
+
 class ArticleRetriever(object):
     def __init__(self):
         pass
 
+    def _inline_result(self, url: str, status_code: int, text: str):
+        """
+        The result of an inline article request, None if the request should fall back to the file transport.
+        """
+        if status_code == 200:
+            return True, text, 200
+        if status_code in INLINE_UNSUPPORTED_STATUS_CODES:
+            logger.warning(f"Inline article request of {url} failed ({status_code}), requesting it as a file")
+            return None
+        return False, text, status_code
+
     def _request_full_text_from_url(self, url: str):
         """
-        request full-text by url
+        request full-text by url, the article service returns it in the response body
+        if $ARTICLE_TRANSPORT is inline, or writes it to a temporary file otherwise
         """
+        if get_article_transport() == ARTICLE_TRANSPORT_INLINE:
+            status_code, text = make_inline_article_request(url, get_article_max_bytes())
+            result = self._inline_result(url, status_code, text)
+            if result is not None:
+                return result
         # img_fn = shortuuid.uuid()
         fn = shortuuid.uuid()
         folder = os.environ.get("TEMP_FOLDER", "./tmp")
@@ -56,11 +108,8 @@ class ArticleRetriever(object):
             url = f"https://www.ncbi.nlm.nih.gov/pmc/articles/{pmid}"
         else:
             url = f"https://www.ncbi.nlm.nih.gov/pmc/articles/pmid/{pmid}/"
-        header = headers
-        ua = UserAgent()
-        header["User-Agent"] = str(ua.chrome)
         res = make_get_request(
-            url, headers=header, allow_redirects=True, cookies=cookies
+            url, headers=build_request_headers(), allow_redirects=True, cookies=cookies
         )
         if res.status_code == 200:
             return True, res.text, res.status_code
@@ -84,11 +133,8 @@ class ArticleRetriever(object):
         """
         extract full-text url from pmc abstract page (https://pubmed.ncbi.nlm.nih.gov/{pmid}/)
         """
-        ua = UserAgent()
-        header = headers
-        header["User-Agent"] = str(ua.chrome)
         url = f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/"
-        r = make_get_request(url, headers=header, allow_redirects=True, cookies=cookies)
+        r = make_get_request(url, headers=build_request_headers(), allow_redirects=True, cookies=cookies)
         if r.status_code != 200:
             return (False, "", r.status_code)
         html_content = r.text
@@ -96,23 +142,120 @@ class ArticleRetriever(object):
         # extract full-text link
         return self._extract_full_text_link(html_content)
 
-    def request_article(self, pmid: str):
+    def request_article(self, pmid: str, article_ids: Optional[ArticleIds] = None):
+        """
+        Request the full text of a paper. Without article_ids the PMC page is tried first and then
+        the full-text link of the PubMed abstract page, with article_ids the paper goes straight to
+        its PMC page or full-text link, the abstract page is the fallback only.
+        """
         pmid = pmid.strip()
 
         # support full-text url directly
         if pmid.startswith("http"):
             return self._request_full_text_from_url(pmid)
 
-        res, pmc_article, code = self._request_pmc_full_text(pmid)
-        if res:
-            return True, pmc_article, code
+        if article_ids is None or article_ids.pmcid is not None:
+            pmcid = article_ids.pmcid if article_ids is not None else pmid
+            res, pmc_article, code = self._request_pmc_full_text(pmcid)
+            if res:
+                return True, pmc_article, code
+        elif article_ids.full_text_url is not None:
+            full_text_result = self._request_full_text_from_url(article_ids.full_text_url)
+            if full_text_result[0]:
+                return full_text_result
         res, full_text_url, code = self._extract_full_text_url_from_abstract_page(pmid)
         if not res:
             logger.error("Can't extract full-text url from abstract page")
             return res, full_text_url, code
+        if article_ids is not None and article_ids.pmcid is None and full_text_url == article_ids.full_text_url:
+            # the abstract page links to the full text that failed already, don't request it again
+            return full_text_result
         return self._request_full_text_from_url(str(full_text_url))
 
 
+    async def _arequest_full_text_from_url(self, url: str):
+        """
+        request full-text by url asynchronously, see _request_full_text_from_url
+        """
+        if get_article_transport() == ARTICLE_TRANSPORT_INLINE:
+            status_code, text = await amake_inline_article_request(url, get_article_max_bytes())
+            result = self._inline_result(url, status_code, text)
+            if result is not None:
+                return result
+        fn = shortuuid.uuid()
+        folder = os.environ.get("TEMP_FOLDER", "./tmp")
+        fn = os.path.join(folder, fn)
+        res = await amake_article_request(url, fn)
+        # the temporary file can be large, keep its io off the event loop
+        text = await asyncio.to_thread(_read_temporary_file, fn) if res.status_code == 200 else None
+        if text is not None:
+            return True, text, 200
+        return (
+            False,
+            res.text
+            if res.status_code != 200
+            else f"failed to request full-text article (temporary file does not exist) - {res.reason_phrase}",
+            res.status_code,
+        )
+
+    async def _arequest_pmc_full_text(self, pmid: str):
+        """
+        request pmc full-text asynchronously, see _request_pmc_full_text
+        """
+        if pmid.upper().startswith("PMC"):
+            pmid = pmid.upper()
+            url = f"https://www.ncbi.nlm.nih.gov/pmc/articles/{pmid}"
+        else:
+            url = f"https://www.ncbi.nlm.nih.gov/pmc/articles/pmid/{pmid}/"
+        res = await amake_get_request(
+            url, headers=build_request_headers(), allow_redirects=True, cookies=cookies
+        )
+        if res.status_code == 200:
+            return True, res.text, res.status_code
+        return False, res.reason_phrase, res.status_code
+
+    async def _aextract_full_text_url_from_abstract_page(self, pmid: str):
+        """
+        extract full-text url from pmc abstract page asynchronously
+        """
+        url = f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/"
+        r = await amake_get_request(url, headers=build_request_headers(), allow_redirects=True, cookies=cookies)
+        if r.status_code != 200:
+            return (False, "", r.status_code)
+        html_content = r.text
+
+        # extract full-text link
+        return self._extract_full_text_link(html_content)
+
+    async def arequest_article(self, pmid: str, article_ids: Optional[ArticleIds] = None):
+        """
+        Request the full text of a paper asynchronously, see request_article
+        """
+        pmid = pmid.strip()
+
+        # support full-text url directly
+        if pmid.startswith("http"):
+            return await self._arequest_full_text_from_url(pmid)
+
+        if article_ids is None or article_ids.pmcid is not None:
+            pmcid = article_ids.pmcid if article_ids is not None else pmid
+            res, pmc_article, code = await self._arequest_pmc_full_text(pmcid)
+            if res:
+                return True, pmc_article, code
+        elif article_ids.full_text_url is not None:
+            full_text_result = await self._arequest_full_text_from_url(article_ids.full_text_url)
+            if full_text_result[0]:
+                return full_text_result
+        res, full_text_url, code = await self._aextract_full_text_url_from_abstract_page(pmid)
+        if not res:
+            logger.error("Can't extract full-text url from abstract page")
+            return res, full_text_url, code
+        if article_ids is not None and article_ids.pmcid is None and full_text_url == article_ids.full_text_url:
+            # the abstract page links to the full text that failed already, don't request it again
+            return full_text_result
+        return await self._arequest_full_text_from_url(str(full_text_url))
+
+
 class ExtendArticleRetriever(ArticleRetriever):
     """
     Comparing to ArticleRetriever, ExtendArticleRetriever will check if the article already exists first,
@@ -122,11 +265,19 @@ class ExtendArticleRetriever(ArticleRetriever):
     def __init__(self):
         super().__init__()
 
-    def request_article(self, pmid: str):
+    def request_article(self, pmid: str, article_ids: Optional[ArticleIds] = None):
+        the_file = self._find_existing_article(pmid)
+        if the_file is None:
+            return super().request_article(pmid, article_ids)
+        with open(the_file, "r") as fobj:
+            content = fobj.read()
+            return True, content, 200
+
+    def _find_existing_article(self, pmid: str) -> str | None:
         pmid_folder = os.environ.get("TEMP_FOLDER", "./tmp")
         pmid_folder = os.path.join(pmid_folder, pmid)
         if not os.path.exists(pmid_folder):
-            return super().request_article(pmid)
+            return None
         html_files = []
         root = ""
         for root, dirs, files in os.walk(pmid_folder):
@@ -134,8 +285,13 @@ class ExtendArticleRetriever(ArticleRetriever):
             html_files.sort()
             break
         if len(html_files) == 0:
-            return super().request_article(pmid)
-        the_file = os.path.join(root, html_files[-1])
+            return None
+        return os.path.join(root, html_files[-1])
+
+    async def arequest_article(self, pmid: str, article_ids: Optional[ArticleIds] = None):
+        the_file = self._find_existing_article(pmid)
+        if the_file is None:
+            return await super().arequest_article(pmid, article_ids)
         with open(the_file, "r") as fobj:
             content = fobj.read()
             return True, content, 200
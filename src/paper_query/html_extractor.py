@@ -1,12 +1,28 @@
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
 from typing import Callable, Optional
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, TypedDict
 
 import pandas as pd
 from .table_utils import html_table_to_markdown, dataframe_to_markdown
 from .utils import convert_html_table_to_dataframe, escape_braces_for_format
 
 
+TEXT_STRING_TYPES = (NavigableString, CData)
+
+class ParsedArticle(TypedDict):
+    sections: Optional[List[Dict[str, str]]]
+    data_availability: Optional[str]
+    methods: Optional[str]
+
+def make_soup(html: str | Tag, features: str = "html.parser") -> Tag:
+    """
+    Parse the html with BeautifulSoup, an already parsed tree is returned as is,
+    so that several extractors can share one parse.
+    """
+    if isinstance(html, Tag):
+        return html
+    return BeautifulSoup(html, features)
+
 def get_tag_text(tag: Tag) -> str:
     text = tag.text
     text = text.strip()
@@ -20,8 +36,8 @@ def get_tag_text(tag: Tag) -> str:
         text += the_text
     return text
 
-def extract_data_availability(html: str) -> Optional[str]:
-    soup = BeautifulSoup(html, "html.parser")
+def extract_data_availability(html: str | Tag) -> Optional[str]:
+    soup = make_soup(html)
         
     # Find a heading tag that contains the word "data availability" (case-insensitive)
     data_availability_heading = soup.find(
@@ -48,8 +64,8 @@ def extract_data_availability(html: str) -> Optional[str]:
             text += child_text + "\n"
     return text.strip() if text else None
 
-def extract_methods(html: str) -> Optional[str]:
-    soup = BeautifulSoup(html, "html.parser")
+def extract_methods(html: str | Tag) -> Optional[str]:
+    soup = make_soup(html)
     
     # Find a heading tag that contains the word "methods" (case-insensitive)
     method_names = ["methods", "methodology", "method", "mothodologies"]
@@ -86,8 +102,8 @@ class HtmlTableParser(object):
     CAPTION_CANDIDATES = ["caption", "captions", "title"]
     FOOTNOTE_CANDIDATES = ["note", "legend", "description", "foot", "notes"]
 
-    def __init__(self):
-        pass
+    def __init__(self, features: str = "html.parser"):
+        self.features = features
 
     def _get_caption_or_footnote_text(self, tag: Tag) -> str:
         return get_tag_text(tag)
@@ -183,8 +199,8 @@ class HtmlTableParser(object):
     def _find_caption_and_footnote(self, table_tag: Tag):
         return self._find_caption_and_footnote_recursively(table_tag.parent, 1)
 
-    def extract_tables(self, html: str):
-        soup = BeautifulSoup(html, "html.parser")
+    def extract_tables(self, html: str | Tag):
+        soup = make_soup(html, self.features)
         tags = soup.select("table")
         tables = []
         for tag in tags:
@@ -229,7 +245,7 @@ class HtmlTableParser(object):
             return False
         return False
 
-    def extract_title(self, html: str):
+    def extract_title(self, html: str | Tag):
         def check_title_in_tag_classes(tag: Tag):
             if tag is None:
                 return False
@@ -255,7 +271,7 @@ class HtmlTableParser(object):
             else:
                 return False
         
-        soup = BeautifulSoup(html, "html.parser")
+        soup = make_soup(html, self.features)
         tags = soup.select("h1")
         for tag in tags:
             if self._traverse_up(tag, 1, 5, check_title_in_tag_classes):
@@ -271,19 +287,22 @@ class HtmlTableParser(object):
         kw_lower = [k.lower() for k in keywords]
         valid_tags = {"section", "div", "article", "main", "h1", "h2", "h3", "p", "ul", "ol", "table", "article"}
 
-        for el in soup.find_all(True):
-            if el.name not in valid_tags:
+        # walk the tree lazily and stop at the first match instead of materializing find_all(True)
+        for el in soup.descendants:
+            if not isinstance(el, Tag) or el.name not in valid_tags:
                 continue
             if any(kw in cls.lower() for cls in el.get("class", []) for kw in kw_lower):
                 return el
             if any(kw in (el.get("id", "").lower()) for kw in kw_lower):
                 return el
-            direct = ''.join(el.find_all(string=True, recursive=False)).strip().lower()
+            direct = ''.join(
+                child for child in el.children if isinstance(child, NavigableString)
+            ).strip().lower()
             if any(kw in direct for kw in kw_lower):
                 return el
         return None
 
-    def extract_abstract(self, html: str):
+    def extract_abstract(self, html: str | Tag):
         sections = self.extract_sections(html)
         if sections == None:
             return None
@@ -292,11 +311,13 @@ class HtmlTableParser(object):
                 return section["content"].replace("\n", " ")
         return (sections[0]["section"] + "\n" + sections[0]["content"]).replace("\n", " ") + "\n......" or None
     
-    def extract_sections(self, html: str):
+    def extract_sections(self, html: str | Tag):
         """
         Yichuan 0528
         Generic section extraction for main body content (non-PMC).
         Returns [{'section': ..., 'content': ...}, ...]
+        Note: the <a> tags are removed from the tree, run other extractors sharing
+        the same tree before this one.
         """
         stop_sections = [
                 "reference", "references",
@@ -305,7 +326,7 @@ class HtmlTableParser(object):
                 "supplementary", "supplements"
         ]
 
-        soup = BeautifulSoup(html, "html.parser")
+        soup = make_soup(html, self.features)
         for a in soup.find_all("a"):
             a.decompose()
 
@@ -315,11 +336,23 @@ class HtmlTableParser(object):
 
         sections: List[Dict[str, str]] = []
         current: Optional[Dict[str, str]] = None
+        # content of the current section, joined when the section is finalized
+        parts: List[str] = []
         seen_global = set()
         heading_tags = ["h1", "h2", "h3", "h4"]
         block_tags = ["p", "ul", "ol", "div", "section", "article"]
+        strings, spans = HtmlTableParser._index_block_strings(soup, set(block_tags))
 
-        for el in start.find_all_next():
+        def finalize():
+            content = "".join(parts)
+            if content.strip():
+                lines = list(dict.fromkeys(content.splitlines()))
+                current["content"] = "\n".join(lines).strip()
+                sections.append(current)
+
+        for el in start.next_elements:
+            if not isinstance(el, Tag):
+                continue
             # ── 1. Handle section headings ───────────────────────────────
             if el.name in heading_tags:
                 h_raw = el.get_text(strip=True)
@@ -327,18 +360,15 @@ class HtmlTableParser(object):
 
                 # On encountering References/Acknowledgements → finalize and exit
                 if any(kw in h_low for kw in stop_sections):
-                    if current and current["content"].strip():
-                        lines = list(dict.fromkeys(current["content"].splitlines()))
-                        current["content"] = "\n".join(lines).strip()
-                        sections.append(current)
+                    if current:
+                        finalize()
                     break
 
                 # Normal new heading
-                if current and current["content"].strip():
-                    lines = list(dict.fromkeys(current["content"].splitlines()))
-                    current["content"] = "\n".join(lines).strip()
-                    sections.append(current)
+                if current:
+                    finalize()
                 current = {"section": h_raw, "content": ""}
+                parts = []
                 continue
 
             # ── 2. Collect main body text ───────────────────────────────
@@ -354,43 +384,75 @@ class HtmlTableParser(object):
                     # so I’m not eager to change it either.  - Yichuan 0528
                     markdown = dataframe_to_markdown(df)
                     if markdown and markdown not in seen_global:
-                        current["content"] += markdown + "\n"
+                        parts.append(markdown + "\n")
                         seen_global.add(markdown)
                     continue
                 except Exception:
                     pass
 
             if el.name in block_tags:
-                txt = el.get_text(separator="\n", strip=True)
+                # same as el.get_text(separator="\n", strip=True) without walking the subtree again
+                begin, end = spans[id(el)]
+                txt = "\n".join(strings[begin:end])
                 if txt and txt not in seen_global:
-                    current["content"] += txt + "\n"
+                    parts.append(txt + "\n")
                     seen_global.add(txt)
 
         # Document ended but still has current section
-        if current and current["content"].strip():
-            lines = list(dict.fromkeys(current["content"].splitlines()))
-            current["content"] = "\n".join(lines).strip()
-            sections.append(current)
+        if current:
+            finalize()
 
         return sections
 
+    @staticmethod
+    def _index_block_strings(
+        root: Tag,
+        block_tags: set[str],
+    ) -> tuple[List[str], Dict[int, tuple[int, int]]]:
+        """
+        Walk the tree once, collecting the stripped text strings in document order and, for every
+        block tag, the range of strings it contains, so that the text of nested blocks is a slice
+        instead of another get_text() walk over the subtree.
+        Returns:
+            tuple: The strings and a dict mapping id(tag) to the (begin, end) range of its strings.
+        """
+        strings: List[str] = []
+        spans: Dict[int, tuple[int, int]] = {}
+        stack = [(root, iter(root.contents), 0)]
+        while stack:
+            tag, children, begin = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                if tag.name in block_tags:
+                    spans[id(tag)] = (begin, len(strings))
+                continue
+            if isinstance(child, Tag):
+                stack.append((child, iter(child.contents), len(strings)))
+            # get_text() only yields plain strings and CDATA, not comments, scripts or styles
+            elif type(child) in TEXT_STRING_TYPES:
+                text = child.strip()
+                if text:
+                    strings.append(text)
+        return strings, spans
+
 
 class PMCHtmlTableParser(object):
-    def __init__(self):
-        pass
+    def __init__(self, features: str = "html.parser"):
+        self.features = features
 
-    def extract_tables(self, html: str):
-        soup = BeautifulSoup(html, "html.parser")
+    def extract_tables(self, html: str | Tag):
+        soup = make_soup(html, self.features)
         tags = soup.select("div.table-wrap.anchored.whole_rhythm")
         tables = []
         for tag in tags:
-            tbl_soup = BeautifulSoup(str(tag), "html.parser")
-            caption = tbl_soup.select("div.caption")
+            # select within the table wrapper instead of re-parsing str(tag)
+            caption = tag.select("div.caption")
             caption = caption[0].text if len(caption) > 0 else ""
-            table = tbl_soup.select("div.xtable")
+            table = tag.select("div.xtable")
             table = str(table[0]) if len(table) > 0 else ""
             table = convert_html_table_to_dataframe(table)
-            footnote = tbl_soup.select("div.tblwrap-foot")
+            footnote = tag.select("div.tblwrap-foot")
             footnote = footnote[0].text if len(footnote) > 0 else ""
             tables.append(
                 {
@@ -403,8 +465,8 @@ class PMCHtmlTableParser(object):
 
         return tables
 
-    def extract_title(self, html: str):
-        soup = BeautifulSoup(html, "html.parser")
+    def extract_title(self, html: str | Tag):
+        soup = make_soup(html, self.features)
         tags = soup.select("hgroup h1")
         for tag in tags:
             text = get_tag_text(tag)
@@ -412,11 +474,11 @@ class PMCHtmlTableParser(object):
                 return text.strip()
         return None
 
-    def extract_abstract(self, html: str):
+    def extract_abstract(self, html: str | Tag):
         """
         Yichuan 0501
         """
-        soup = BeautifulSoup(html, "html.parser")
+        soup = make_soup(html, self.features)
 
         # Find a heading tag that contains the word "abstract" (case-insensitive)
         abstract_heading = soup.find(
@@ -439,25 +501,28 @@ class PMCHtmlTableParser(object):
 
         return abstract_text.strip()
     
-    def extract_sections(self, html: str):
+    def extract_sections(self, html: str | Tag):
         """
         Yichuan 0505
         Extracts sections (h2/h3) and content between 'Abstract' and 'References' headings.
         Include tables
+        Returns None if the page has no <body> or no 'Abstract' heading (not a PMC article),
+        so that HtmlTableExtractor falls back to the generic parser.
         """
         stop_sections = [
             "reference", "acknowledgement", "acknowledgment", "supplementary",
             "references", "acknowledgements", "acknowledgments", "supplements"
         ]
-        soup = BeautifulSoup(html, "html.parser")
+        soup = make_soup(html, self.features)
         body = soup.body
         if not body:
-            return []
+            return None
 
         heading_tags = ["h2", "h3"]
         sections = []
         current_section = None
         started = False
+        converted_table = None
 
         for element in body.descendants:
             if isinstance(element, Tag):
@@ -493,7 +558,12 @@ class PMCHtmlTableParser(object):
                     # Tables: convert HTML
                     if element.name == "table" or (
                     "xtable" in element.get("class", []) if element.has_attr("class") else False):
-                        current_section["content"] += html_table_to_markdown(str(element)) + "\n"
+                        # the <table> inside a converted div.xtable is the same table
+                        if converted_table is not None and any(p is converted_table for p in element.parents):
+                            continue
+                        converted_table = element
+                        # convert the parsed element directly instead of re-parsing str(element)
+                        current_section["content"] += html_table_to_markdown(element) + "\n"
 
                     # Text elements: convert to plain text
                     elif element.name in ["p", "ul", "ol"]:
@@ -501,6 +571,8 @@ class PMCHtmlTableParser(object):
                         if text:
                             current_section["content"] += text + "\n"
 
+        if not started:
+            return None
         if current_section:
             current_section["content"] = current_section["content"].strip()
             sections.append(current_section)
@@ -509,13 +581,39 @@ class PMCHtmlTableParser(object):
 
 
 class HtmlTableExtractor(object):
-    def __init__(self):
+    def __init__(self, features: str = "html.parser"):
+        """
+        Args:
+            features (str): The BeautifulSoup tree builder, "html.parser" by default,
+                "lxml" is faster on large pages but may segment malformed html differently.
+        """
+        self.features = features
         self.parsers = [
-            PMCHtmlTableParser(),
-            HtmlTableParser(),
+            PMCHtmlTableParser(features),
+            HtmlTableParser(features),
         ]
 
-    def extract_tables(self, html: str):
+    def extract_all(self, html: str | Tag) -> ParsedArticle:
+        """
+        Parse the html once and run the sections, data availability and methods extractors
+        on the shared tree.
+        Returns:
+            ParsedArticle: The sections, data availability and methods of the article.
+        """
+        soup = make_soup(html, self.features)
+        # data availability and methods only read the tree, run them before
+        # HtmlTableParser.extract_sections removes the <a> tags from it
+        data_availability = self.extract_data_availability(soup)
+        methods = self.extract_methods(soup)
+        sections = self.extract_sections(soup)
+        return ParsedArticle(
+            sections=sections,
+            data_availability=data_availability,
+            methods=methods,
+        )
+
+    def extract_tables(self, html: str | Tag):
+        html = make_soup(html, self.features)
         tables = []
         for parser in self.parsers:
             tables = parser.extract_tables(html)
@@ -525,7 +623,8 @@ class HtmlTableExtractor(object):
         tables = HtmlTableExtractor._remove_duplicate(tables)
         return tables
     
-    def extract_title(self, html: str):
+    def extract_title(self, html: str | Tag):
+        html = make_soup(html, self.features)
         for parser in self.parsers:
             title = parser.extract_title(html)
             if title is not None:
@@ -533,7 +632,8 @@ class HtmlTableExtractor(object):
             
         return None
 
-    def extract_abstract(self, html: str):
+    def extract_abstract(self, html: str | Tag):
+        html = make_soup(html, self.features)
         for parser in self.parsers:
             abstract = parser.extract_abstract(html)
             if abstract is not None:
@@ -541,13 +641,14 @@ class HtmlTableExtractor(object):
 
         return None
     
-    def extract_data_availability(self, html: str):
-        return extract_data_availability(html)
+    def extract_data_availability(self, html: str | Tag):
+        return extract_data_availability(make_soup(html, self.features))
     
-    def extract_methods(self, html: str):
-        return extract_methods(html)
+    def extract_methods(self, html: str | Tag):
+        return extract_methods(make_soup(html, self.features))
 
-    def extract_sections(self, html: str) -> dict | None:
+    def extract_sections(self, html: str | Tag) -> dict | None:
+        html = make_soup(html, self.features)
         for parser in self.parsers:
             sections = parser.extract_sections(html)
             if sections is not None:
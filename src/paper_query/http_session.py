@@ -0,0 +1,101 @@
+import asyncio
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+import logging
+import threading
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import h2  # noqa: F401, httpx speaks HTTP/2 only if h2 is installed
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) timeouts in seconds
+NCBI_TIMEOUT = (10.0, 120.0)
+# the article service renders the page in a headless browser, so reading takes longer
+ARTICLE_TIMEOUT = (10.0, 600.0)
+# keep-alive connections per host, more than the workers that usually run concurrently
+POOL_MAXSIZE = 32
+
+# requests.Session isn't guaranteed to be thread safe, every thread keeps its own
+_thread_local = threading.local()
+# httpx.AsyncClient is bound to the event loop it is first used in, one client per loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+def _stateless_cookie_jar() -> CookieJar:
+    # like separate requests, cookies set by a response aren't sent with the next requests
+    return CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+
+def _create_session() -> requests.Session:
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    # retries are done by tenacity in the callers
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_session() -> requests.Session:
+    """
+    The calling thread's pooled keep-alive session, shared by the E-utilities, PubMed/PMC page
+    and article service requests of the thread.
+    """
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = _create_session()
+        _thread_local.session = session
+    return session
+
+def _to_httpx_timeout(timeout: tuple[float, float]) -> httpx.Timeout:
+    connect, read = timeout
+    return httpx.Timeout(read, connect=connect)
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    The pooled async client of the running event loop, HTTP/2 is used if h2 is installed.
+    Timeouts are given per request.
+    """
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                cookies=_stateless_cookie_jar(),
+                limits=httpx.Limits(max_connections=POOL_MAXSIZE, max_keepalive_connections=POOL_MAXSIZE),
+                timeout=_to_httpx_timeout(NCBI_TIMEOUT),
+            )
+            _async_clients[loop] = client
+    return client
+
+async def aclose_async_client():
+    """
+    Close the async client of the running event loop, e.g. before the loop is closed.
+    """
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+def http_get(url: str, timeout: tuple[float, float] = NCBI_TIMEOUT, **kwargs) -> requests.Response:
+    return get_session().get(url, timeout=timeout, **kwargs)
+
+def http_post(url: str, timeout: tuple[float, float] = NCBI_TIMEOUT, **kwargs) -> requests.Response:
+    return get_session().post(url, timeout=timeout, **kwargs)
+
+async def ahttp_get(url: str, timeout: tuple[float, float] = NCBI_TIMEOUT, **kwargs) -> httpx.Response:
+    return await get_async_client().get(url, timeout=_to_httpx_timeout(timeout), **kwargs)
+
+def ahttp_stream(url: str, timeout: tuple[float, float] = NCBI_TIMEOUT, **kwargs):
+    """
+    A streamed GET request, use it as `async with ahttp_stream(url) as res:` and read the body with res.aiter_bytes().
+    """
+    return get_async_client().stream("GET", url, timeout=_to_httpx_timeout(timeout), **kwargs)
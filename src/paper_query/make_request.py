@@ -1,48 +1,86 @@
-import requests
+import httpx
 from requests import Response
 import logging
-from typing import Optional
+from typing import Mapping, Optional
 import os
 
 from tenacity import retry, stop_after_attempt, wait_exponential
-from ratelimit import limits, sleep_and_retry
+
+from .rate_limiter import get_article_rate_limiter, get_ncbi_page_rate_limiter
+from .http_session import ARTICLE_TIMEOUT, NCBI_TIMEOUT, ahttp_get, ahttp_stream, http_get
 
 logger = logging.getLogger(__name__)
 
+# How the article service returns the article: "file" writes it to a file under TEMP_FOLDER
+# (the service and the client share the filesystem), "inline" streams it in the response body
+ARTICLE_TRANSPORT_ENV = "ARTICLE_TRANSPORT"
+ARTICLE_TRANSPORT_FILE = "file"
+ARTICLE_TRANSPORT_INLINE = "inline"
+# the largest inline article accepted, larger articles fail with status 413
+ARTICLE_MAX_BYTES_ENV = "ARTICLE_MAX_BYTES"
+DEFAULT_ARTICLE_MAX_BYTES = 50 * 1024 * 1024
+ARTICLE_CHUNK_SIZE = 64 * 1024
+
+def get_article_transport() -> str:
+    transport = os.environ.get(ARTICLE_TRANSPORT_ENV, ARTICLE_TRANSPORT_FILE).lower()
+    if transport not in (ARTICLE_TRANSPORT_FILE, ARTICLE_TRANSPORT_INLINE):
+        logger.error(f"Invalid {ARTICLE_TRANSPORT_ENV}: {transport}, using {ARTICLE_TRANSPORT_FILE}")
+        return ARTICLE_TRANSPORT_FILE
+    return transport
+
+def get_article_max_bytes() -> int:
+    try:
+        return int(os.environ.get(ARTICLE_MAX_BYTES_ENV, DEFAULT_ARTICLE_MAX_BYTES))
+    except ValueError:
+        logger.error(f"Invalid {ARTICLE_MAX_BYTES_ENV}: {os.environ.get(ARTICLE_MAX_BYTES_ENV)}, using {DEFAULT_ARTICLE_MAX_BYTES}")
+        return DEFAULT_ARTICLE_MAX_BYTES
+
+def _article_api_url() -> str:
+    baseurl = os.environ.get("BASE_URL", "http://127.0.0.1:3000")
+    return f"{baseurl}/api/article"
+
+def _decode_article(content: bytes, content_type: str | None, encoding: str | None) -> str:
+    # the body is utf-8 unless the service declares a charset
+    if content_type is None or "charset=" not in content_type.lower():
+        encoding = "utf-8"
+    return content.decode(encoding or "utf-8", errors="replace")
 
-# Rate limit configuration (e.g., 3 requests per second)
-@limits(calls=3, period=1)
-@sleep_and_retry
+def _too_large_reason(max_bytes: int) -> str:
+    return f"the article is larger than {max_bytes} bytes ({ARTICLE_MAX_BYTES_ENV})"
+
+
+# The page requests go to NCBI (PubMed and PMC) without the api key, they are limited to 3 requests
+# per second (see get_ncbi_page_rate_limiter). The limiter is acquired inside retry so that every
+# retry attempt is rate limited as well
 @retry(stop=stop_after_attempt(5), wait=wait_exponential())
 def make_get_request(
     url,
-    headers: dict[str, str],
+    headers: Mapping[str, str],
     allow_redirects: bool,
     cookies: dict[str, str],
     *args,
     **kwargs,
 ) -> Response:
+    get_ncbi_page_rate_limiter().acquire()
     logger.info(f"make get request to {url}")
     print(f"make get request to {url}")
-    res = requests.get(
+    kwargs.setdefault("timeout", NCBI_TIMEOUT)
+    res = http_get(
         url,
+        *args,
         headers=headers,
         cookies=cookies,
         allow_redirects=allow_redirects,
-        *args,
         **kwargs,
     )
 
     return res
 
 
-@limits(calls=3, period=1)
-@sleep_and_retry
 @retry(stop=stop_after_attempt(5), wait=wait_exponential())
 def make_article_request(url: str, fn: str, img_fn: Optional[str] = None) -> Response:
-    baseurl = os.environ.get("BASE_URL", "http://127.0.0.1:3000")
-    api_path = "/api/article"
-    the_url = f"{baseurl}{api_path}"
+    get_article_rate_limiter().acquire()
+    the_url = _article_api_url()
     logger.info(f"make article({url}) request to {the_url}")
     params = (
         {
@@ -56,8 +94,117 @@ def make_article_request(url: str, fn: str, img_fn: Optional[str] = None) -> Res
             "output": fn,
         }
     )
-    res = requests.get(
+    res = http_get(
         the_url,
         params=params,
+        timeout=ARTICLE_TIMEOUT,
+    )
+    return res
+
+
+@retry(stop=stop_after_attempt(5), wait=wait_exponential())
+def make_inline_article_request(url: str, max_bytes: int) -> tuple[int, str]:
+    """
+    Request an article that the article service returns in the response body, the body is read
+    in chunks and the request is aborted as soon as it exceeds max_bytes.
+    Returns:
+        tuple: The status code and the article, or the reason if the status code isn't 200
+            (413 if the article exceeds max_bytes).
+    """
+    get_article_rate_limiter().acquire()
+    the_url = _article_api_url()
+    logger.info(f"make inline article({url}) request to {the_url}")
+    with http_get(
+        the_url,
+        params={"url": url, "inline": "true"},
+        timeout=ARTICLE_TIMEOUT,
+        stream=True,
+    ) as res:
+        if res.status_code != 200:
+            return res.status_code, res.text or res.reason
+        if int(res.headers.get("content-length", 0)) > max_bytes:
+            return 413, _too_large_reason(max_bytes)
+        content = bytearray()
+        for chunk in res.iter_content(chunk_size=ARTICLE_CHUNK_SIZE):
+            content += chunk
+            if len(content) > max_bytes:
+                return 413, _too_large_reason(max_bytes)
+        return 200, _decode_article(bytes(content), res.headers.get("content-type"), res.encoding)
+
+
+def _with_cookie_header(headers: Mapping[str, str], cookies: dict[str, str]) -> Mapping[str, str]:
+    """
+    The shared async client doesn't take per-request cookies, send them as the cookie header
+    unless the headers have one already (which requests would send instead of the cookies, too).
+    """
+    if not cookies or any(key.lower() == "cookie" for key in headers):
+        return headers
+    return {**headers, "cookie": "; ".join(f"{key}={value}" for key, value in cookies.items())}
+
+# The async requests share the rate limiters with their sync counterparts
+@retry(stop=stop_after_attempt(5), wait=wait_exponential())
+async def amake_get_request(
+    url,
+    headers: Mapping[str, str],
+    allow_redirects: bool,
+    cookies: dict[str, str],
+    **kwargs,
+) -> httpx.Response:
+    await get_ncbi_page_rate_limiter().aacquire()
+    logger.info(f"make async get request to {url}")
+    kwargs.setdefault("timeout", NCBI_TIMEOUT)
+    res = await ahttp_get(
+        url,
+        headers=_with_cookie_header(headers, cookies),
+        follow_redirects=allow_redirects,
+        **kwargs,
+    )
+
+    return res
+
+
+@retry(stop=stop_after_attempt(5), wait=wait_exponential())
+async def amake_article_request(url: str, fn: str, img_fn: Optional[str] = None) -> httpx.Response:
+    await get_article_rate_limiter().aacquire()
+    the_url = _article_api_url()
+    logger.info(f"make async article({url}) request to {the_url}")
+    params = (
+        {
+            "url": url,
+            "output": fn,
+            "png_output": img_fn,
+        }
+        if img_fn is not None
+        else {
+            "url": url,
+            "output": fn,
+        }
     )
+    res = await ahttp_get(the_url, params=params, timeout=ARTICLE_TIMEOUT)
     return res
+
+
+@retry(stop=stop_after_attempt(5), wait=wait_exponential())
+async def amake_inline_article_request(url: str, max_bytes: int) -> tuple[int, str]:
+    """
+    Request an article returned in the response body asynchronously, see make_inline_article_request
+    """
+    await get_article_rate_limiter().aacquire()
+    the_url = _article_api_url()
+    logger.info(f"make async inline article({url}) request to {the_url}")
+    async with ahttp_stream(
+        the_url,
+        params={"url": url, "inline": "true"},
+        timeout=ARTICLE_TIMEOUT,
+    ) as res:
+        if res.status_code != 200:
+            await res.aread()
+            return res.status_code, res.text or res.reason_phrase
+        if int(res.headers.get("content-length", 0)) > max_bytes:
+            return 413, _too_large_reason(max_bytes)
+        content = bytearray()
+        async for chunk in res.aiter_bytes(chunk_size=ARTICLE_CHUNK_SIZE):
+            content += chunk
+            if len(content) > max_bytes:
+                return 413, _too_large_reason(max_bytes)
+        return 200, _decode_article(bytes(content), res.headers.get("content-type"), res.charset_encoding)
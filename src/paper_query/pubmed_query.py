@@ -1,12 +1,14 @@
 from typing import Any
-import requests
+import asyncio
+import httpx
 import logging 
-import time
 import math
 import xml.etree.ElementTree as ET
 
 from src.database.pmid_paper_db import PMIDPaperDB
-from .article_retriever import ArticleRetriever
+from .article_retriever import ArticleIds, ArticleRetriever
+from .rate_limiter import get_ncbi_api_key, get_ncbi_rate_limiter
+from .http_session import ahttp_get, http_get, http_post
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +55,10 @@ PUBMED_DATABASE_LIST = [
 ]
 ESEARCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
 EFETCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+ELINK_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/elink.fcgi"
+IDCONV_URL = "https://pmc.ncbi.nlm.nih.gov/tools/idconv/api/v1/articles/"
+# the PMC ID converter takes at most 200 ids per request
+IDCONV_STEP_COUNT = 200
 
 
 def build_query_param(
@@ -66,9 +72,25 @@ def build_query_param(
         else {"datetype": datetype if datetype is not None else "pdat"}
     return {**mindate_dict, **maxdate_dict, **datetype_dict}
 
-def safe_get(url, params, delay=0.4):
-    time.sleep(delay)  # ~3 requests/second
-    return requests.get(url, params=params)
+def _with_api_key(params: dict) -> dict:
+    api_key = get_ncbi_api_key()
+    if api_key is None:
+        return params
+    return {**params, "api_key": api_key}
+
+# the E-utilities requests share the process-wide NCBI rate limiter, and the pooled keep-alive
+# connections with the PubMed and PMC page requests (see http_session)
+def safe_get(url, params):
+    get_ncbi_rate_limiter().acquire()
+    return http_get(url, params=_with_api_key(params))
+
+def safe_post(url, data):
+    get_ncbi_rate_limiter().acquire()
+    return http_post(url, data=_with_api_key(data))
+
+async def asafe_get(url, params) -> httpx.Response:
+    await get_ncbi_rate_limiter().aacquire()
+    return await ahttp_get(url, params=_with_api_key(params))
 
 def safe_int(s, default=0):
     try:
@@ -152,6 +174,122 @@ def query_pmids(
         for id in ids:
             yield id
     
+def _parse_pubmed_article(article: ET.Element) -> tuple[str | None, str | None, str | None, bool]:
+    pmid = article.findtext("./MedlineCitation/PMID")
+    title = article.findtext(".//ArticleTitle")
+    abstract = article.findtext(".//Abstract/AbstractText")
+    is_preprint = False
+    publication_types = article.findall(".//PublicationType")
+    for pub_type in publication_types:
+        if pub_type.text.lower() in ["preprint", "pre-print"]:
+            is_preprint = True
+    return pmid, title, abstract, is_preprint
+
+def _parse_title_abstract_ispreprint(content: bytes) -> tuple[str | None, str | None, bool]:
+    root = ET.fromstring(content)
+    for article in root.findall(".//PubmedArticle"):
+        _, title, abstract, is_preprint = _parse_pubmed_article(article)
+        return title, abstract, is_preprint
+    
+    return None, None, False
+
+def _parse_titles_abstracts_ispreprints(content: bytes) -> dict[str, tuple[str | None, str | None, bool]]:
+    root = ET.fromstring(content)
+    papers = {}
+    for article in root.findall(".//PubmedArticle"):
+        pmid, title, abstract, is_preprint = _parse_pubmed_article(article)
+        if pmid is None:
+            continue
+        papers[pmid] = (title, abstract, is_preprint)
+    return papers
+
+HISTORY_STEP_COUNT = 10000
+def query_history(
+    term: str,
+    mindate: str | None = None,
+    maxdate: str | None = None,
+    datetype: str = "pdat",
+) -> tuple[int, str | None, str | None]:
+    """Runs the search once on the Entrez history server.
+    Args:
+        term (str): The search term to query PubMed.
+        mindate (str, optional): The minimum date for the search.
+        maxdate (str, optional): The maximum date for the search.
+        datetype (str): The type of date to use for the search.
+    Returns:
+        tuple: A tuple containing the result count, the WebEnv and the query_key,
+            WebEnv and query_key are None if the search failed.
+    """
+    query_param = build_query_param(
+        mindate=mindate,
+        maxdate=maxdate,
+        datetype=datetype,
+    )
+    params = {
+        "term": term,
+        "retmode": "json",
+        "retmax": 0,
+        "usehistory": "y",
+        "db": "pubmed",
+        **query_param,
+    }
+    res = None
+    try:
+        result = safe_get(
+            url=ESEARCH_URL,
+            params=params,
+        )
+        res: Any = result.json()
+        esearch_result = res['esearchresult']
+        cnt = safe_int(esearch_result['count'], 0)
+        return cnt, esearch_result['webenv'], esearch_result['querykey']
+    except Exception as e:
+        error_in_res = res['error'] if res and 'error' in res else 'unknown error'
+        logger.error(f"Error occurred in querying history: {str(e)}\n Error: {error_in_res}")
+        return 0, None, None
+
+def query_history_pmids(
+    webenv: str,
+    query_key: str,
+    count: int,
+    step_count: int = HISTORY_STEP_COUNT,
+):
+    """
+    Streams the PMIDs of a search stored on the history server (see query_history).
+    The ids are fetched with EFetch, so it isn't limited to the first 9,999 records as ESearch is.
+    Args:
+        webenv (str): The WebEnv returned by query_history.
+        query_key (str): The query_key returned by query_history.
+        count (int): The number of PMIDs to retrieve.
+        step_count (int): The number of PMIDs per request, at most 10,000.
+    Yields:
+        str: A PMID from the search results.
+    """
+    params = {
+        "db": "pubmed",
+        "WebEnv": webenv,
+        "query_key": query_key,
+        "rettype": "uilist",
+        "retmode": "text",
+        "retmax": step_count,
+    }
+    for ix in range(math.ceil(count/step_count)):
+        ids = []
+        try:
+            result = safe_get(
+                url=EFETCH_URL,
+                params={
+                    **params,
+                    "retstart": ix*step_count,
+                }
+            )
+            result.raise_for_status()
+            ids = [line.strip() for line in result.text.splitlines() if line.strip()]
+        except Exception as e:
+            logger.error(str(e))
+        for id in ids:
+            yield id
+
 def query_title_abstract_ispreprint(pmid: str) -> tuple[str | None, str | None, bool]:
     """Queries the title, abstract, and preprint status of a paper by its PubMed ID (PMID).
     Args:
@@ -171,34 +309,191 @@ def query_title_abstract_ispreprint(pmid: str) -> tuple[str | None, str | None,
             url=EFETCH_URL,
             params=params,
         )
-        root = ET.fromstring(result.content)
-        is_preprint = False
-        for article in root.findall(".//PubmedArticle"):
-            title = article.findtext(".//ArticleTitle")
-            abstract = article.findtext(".//Abstract/AbstractText")
-            publication_types = article.findall(".//PublicationType")
-            for pub_type in publication_types:
-                if pub_type.text.lower() in ["preprint", "pre-print"]:
-                    is_preprint = True
-            return title, abstract, is_preprint
-        
+        return _parse_title_abstract_ispreprint(result.content)
+    except Exception as e:
+        logger.error(str(e))
         return None, None, False
+
+def _efetch_titles_abstracts_ispreprints(data: dict) -> dict[str, tuple[str | None, str | None, bool]]:
+    try:
+        result = safe_post(
+            url=EFETCH_URL,
+            data={
+                **data,
+                "db": "pubmed",
+                "retmode": "xml",
+            },
+        )
+        return _parse_titles_abstracts_ispreprints(result.content)
+    except Exception as e:
+        logger.error(str(e))
+        return {}
+
+def query_titles_abstracts_ispreprints(pmids: list[str]) -> dict[str, tuple[str | None, str | None, bool]]:
+    """Queries the titles, abstracts, and preprint status of papers with one EFetch request.
+    The ids are posted, so the request isn't limited by the url length.
+    Args:
+        pmids (list[str]): The PubMed IDs of the papers.
+    Returns:
+        dict: A dictionary mapping PMID to a tuple of the title, abstract, and a boolean indicating if it is a preprint.
+            PMIDs that are not found in the response are not included.
+    """
+    if len(pmids) == 0:
+        return {}
+    return _efetch_titles_abstracts_ispreprints({"id": ",".join(pmids)})
+
+def query_history_titles_abstracts_ispreprints(
+    webenv: str,
+    query_key: str,
+    retstart: int,
+    retmax: int,
+) -> dict[str, tuple[str | None, str | None, bool]]:
+    """Queries the titles, abstracts, and preprint status of a page of a search stored on the history server.
+    Args:
+        webenv (str): The WebEnv returned by query_history.
+        query_key (str): The query_key returned by query_history.
+        retstart (int): The index of the first record of the page.
+        retmax (int): The number of records of the page.
+    Returns:
+        dict: A dictionary mapping PMID to a tuple of the title, abstract, and a boolean indicating if it is a preprint.
+    """
+    return _efetch_titles_abstracts_ispreprints({
+        "WebEnv": webenv,
+        "query_key": query_key,
+        "retstart": retstart,
+        "retmax": retmax,
+    })
+
+async def aquery_title_abstract_ispreprint(pmid: str) -> tuple[str | None, str | None, bool]:
+    """Asynchronously queries the title, abstract, and preprint status of a paper by its PubMed ID (PMID).
+    Args:
+        pmid (str): The PubMed ID of the paper.
+    Returns:
+        tuple: A tuple containing the title, abstract, and a boolean indicating if it is a preprint.
+    """
+    params = {
+        "id": pmid,
+        "db": "pubmed",
+        "retmode": "xml"
+    }
+    try:
+        result = await asafe_get(
+            url=EFETCH_URL,
+            params=params,
+        )
+        return _parse_title_abstract_ispreprint(result.content)
     except Exception as e:
         logger.error(str(e))
         return None, None, False
     
-def query_full_text(pmid: str) -> tuple[bool, str | None]:
+def query_article_ids(pmids: list[str]) -> dict[str, tuple[str | None, str | None]]:
+    """Queries the PMCIDs and DOIs of papers with one PMC ID converter request.
+    Args:
+        pmids (list[str]): The PubMed IDs of the papers, at most IDCONV_STEP_COUNT.
+    Returns:
+        dict: A dictionary mapping every PMID to a tuple of the PMCID and the DOI, None if the paper
+            isn't in PMC (the converter only knows the DOIs of PMC papers).
+            The dictionary is empty if the request failed.
+    """
+    if len(pmids) == 0:
+        return {}
+    try:
+        result = safe_get(
+            url=IDCONV_URL,
+            params={
+                "ids": ",".join(pmids),
+                "idtype": "pmid",
+                "format": "json",
+            },
+        )
+        result.raise_for_status()
+        records = result.json().get("records", [])
+    except Exception as e:
+        logger.error(f"Error occurred in converting {len(pmids)} PMIDs: {str(e)}")
+        return {}
+    article_ids: dict[str, tuple[str | None, str | None]] = {pmid: (None, None) for pmid in pmids}
+    for record in records:
+        pmid = record.get("pmid")
+        if pmid is None or str(pmid) not in article_ids:
+            continue
+        article_ids[str(pmid)] = (record.get("pmcid") or None, record.get("doi") or None)
+    return article_ids
+
+def query_full_text_links(pmids: list[str]) -> dict[str, str] | None:
+    """Queries the full-text links of papers (the links of the PubMed abstract page) with one ELink request.
+    Args:
+        pmids (list[str]): The PubMed IDs of the papers.
+    Returns:
+        dict: A dictionary mapping PMID to the first full-text link of the paper,
+            PMIDs without a link are not included. None if the request failed.
+    """
+    if len(pmids) == 0:
+        return {}
+    try:
+        result = safe_post(
+            url=ELINK_URL,
+            data={
+                "dbfrom": "pubmed",
+                "cmd": "prlinks",
+                "retmode": "json",
+                # one id parameter per PMID, so the links are returned per PMID
+                "id": pmids,
+            },
+        )
+        result.raise_for_status()
+        linksets = result.json().get("linksets", [])
+    except Exception as e:
+        logger.error(f"Error occurred in querying full-text links of {len(pmids)} PMIDs: {str(e)}")
+        return None
+    links = {}
+    for linkset in linksets:
+        for id_urls in linkset.get("idurllist", []):
+            urls = [obj_url.get("url", {}).get("value") for obj_url in id_urls.get("objurls", [])]
+            urls = [url for url in urls if url]
+            if "id" in id_urls and len(urls) > 0:
+                links[str(id_urls["id"])] = urls[0]
+    return links
+
+def build_full_text_url(pmcid: str | None, doi: str | None, link: str | None) -> str | None:
+    """
+    Where the full text of a paper is requested from: its PMC page, else its full-text link, else its DOI.
+    """
+    if pmcid is not None:
+        return f"https://www.ncbi.nlm.nih.gov/pmc/articles/{pmcid}"
+    if link is not None:
+        return link
+    if doi is not None:
+        return f"https://doi.org/{doi}"
+    return None
+
+def query_full_text(pmid: str, article_ids: ArticleIds | None = None) -> tuple[bool, str | None]:
     """
     Queries the full text of a paper by its PubMed ID (PMID).
     Args:
         pmid (str): The PubMed ID of the paper.
+        article_ids (ArticleIds, optional): The resolved ids of the paper, the full text is requested
+            from the right place directly instead of trying the PMC and abstract pages first.
     Returns:
         tuple: A tuple containing a boolean indicating success and the full text content (html format) or None if not found.
     Raises:
         Exception: If there is an error during the request.
     """
     retriever = ArticleRetriever()
-    res, html_content, _ =retriever.request_article(pmid)
+    res, html_content, _ =retriever.request_article(pmid, article_ids)
+
+    return res, html_content
+
+async def aquery_full_text(pmid: str, article_ids: ArticleIds | None = None) -> tuple[bool, str | None]:
+    """
+    Asynchronously queries the full text of a paper by its PubMed ID (PMID).
+    Args:
+        pmid (str): The PubMed ID of the paper.
+        article_ids (ArticleIds, optional): The resolved ids of the paper, see query_full_text.
+    Returns:
+        tuple: A tuple containing a boolean indicating success and the full text content (html format) or None if not found.
+    """
+    retriever = ArticleRetriever()
+    res, html_content, _ = await retriever.arequest_article(pmid, article_ids)
 
     return res, html_content
 
@@ -233,6 +528,33 @@ class PubMedPaperRetriever:
             str: A PMID from the search results.
         """
         return query_pmids(term, count, mindate, maxdate, datetype)
+
+    def query_pmids_with_history(
+        self,
+        term: str,
+        mindate: str | None = None,
+        maxdate: str | None = None,
+        datetype: str = "pdat",
+    ) -> tuple[list[str], str | None, str | None]:
+        """
+        Queries PubMed for PMIDs with the history server, the search runs once and the ids
+        are fetched in pages of 10,000. Falls back to query_pmids if the history search fails.
+        
+        Args:
+            term (str): The search term to query PubMed.
+            mindate (str, optional): The minimum date for the search.
+            maxdate (str, optional): The maximum date for the search.
+            datetype (str): The type of date to use for the search.
+        
+        Returns:
+            tuple: A tuple containing the PMIDs, the WebEnv and the query_key (None on fallback),
+                the WebEnv and query_key can be passed to prefetch_title_abstracts.
+        """
+        count, webenv, query_key = query_history(term, mindate, maxdate, datetype)
+        if webenv is None or query_key is None:
+            count = query_count(term, mindate, maxdate, datetype)
+            return list(query_pmids(term, count, mindate, maxdate, datetype)), None, None
+        return list(query_history_pmids(webenv, query_key, count)), webenv, query_key
     
     def query_title_abstract_ispreprint(self, pmid: str) -> tuple[str | None, str | None, bool]:
         """
@@ -251,6 +573,115 @@ class PubMedPaperRetriever:
         self.db.insert_paper_title_abstract(pmid, title, abstract, is_preprint)
         return title, abstract, is_preprint
     
+    def partition_cached_pmids(self, pmids: list[str]) -> tuple[list[str], list[str]]:
+        """
+        Splits PMIDs into the papers whose title and abstract are cached and the missing ones,
+        with bulk queries instead of one lookup per PMID.
+        
+        Args:
+            pmids (list[str]): The PubMed IDs of the papers.
+        
+        Returns:
+            tuple: A tuple containing the cached PMIDs and the missing PMIDs, both in input order.
+        """
+        papers = self.db.select_many(pmids, columns=["title"])
+        cached_pmids = []
+        missing_pmids = []
+        for pmid in pmids:
+            if pmid in papers and papers[pmid]["title"] is not None:
+                cached_pmids.append(pmid)
+            else:
+                missing_pmids.append(pmid)
+        return cached_pmids, missing_pmids
+
+    def prefetch_title_abstracts(
+        self,
+        pmids: list[str],
+        batch_size: int = 200,
+        webenv: str | None = None,
+        query_key: str | None = None,
+    ) -> int:
+        """
+        Fetches the titles, abstracts, and preprint status of the papers that are not cached yet,
+        one EFetch request per batch, and stores them in the paper database.
+        
+        Args:
+            pmids (list[str]): The PubMed IDs of the papers.
+            batch_size (int): The number of papers per EFetch request.
+            webenv (str, optional): The WebEnv of the search that returned pmids (see query_history).
+            query_key (str, optional): The query_key of the search that returned pmids.
+                If no paper is cached yet, the pages are fetched from the history server
+                instead of posting the PMIDs.
+        
+        Returns:
+            int: The number of papers fetched and stored.
+        """
+        _, missing_pmids = self.partition_cached_pmids(pmids)
+        use_history = webenv is not None and query_key is not None \
+            and len(missing_pmids) == len(pmids)
+        fetched_count = 0
+        for ix in range(0, len(missing_pmids), batch_size):
+            if use_history:
+                papers = query_history_titles_abstracts_ispreprints(webenv, query_key, ix, batch_size)
+            else:
+                papers = query_titles_abstracts_ispreprints(missing_pmids[ix:ix+batch_size])
+            rows = [
+                (pmid, title, abstract, is_preprint)
+                for pmid, (title, abstract, is_preprint) in papers.items()
+            ]
+            if self.db.insert_papers_title_abstract(rows):
+                fetched_count += len(rows)
+        logger.info(f"Prefetched title and abstract of {fetched_count} papers, {len(pmids) - len(missing_pmids)} papers are cached")
+        return fetched_count
+
+    def resolve_article_ids(self, pmids: list[str], batch_size: int = IDCONV_STEP_COUNT) -> int:
+        """
+        Resolves the PMCID, DOI and full-text link of the papers that are not resolved yet,
+        one PMC ID converter request per batch plus one ELink request for the papers of the batch
+        that aren't in PMC, and stores them in the paper database. query_full_text then requests
+        every paper from the right place directly.
+        
+        Args:
+            pmids (list[str]): The PubMed IDs of the papers.
+            batch_size (int): The number of papers per request, at most IDCONV_STEP_COUNT.
+        
+        Returns:
+            int: The number of papers resolved and stored.
+        """
+        papers = self.db.select_many(pmids, columns=["ids_resolved"])
+        unresolved_pmids = [
+            pmid for pmid in pmids
+            if pmid not in papers or not papers[pmid]["ids_resolved"]
+        ]
+        resolved_count = 0
+        for ix in range(0, len(unresolved_pmids), batch_size):
+            article_ids = query_article_ids(unresolved_pmids[ix:ix+batch_size])
+            # papers that aren't in PMC are requested from their full-text link
+            links = query_full_text_links([
+                pmid for pmid, (pmcid, _) in article_ids.items() if pmcid is None
+            ])
+            # a paper is resolved only if all its requests succeeded, the others are retried next time
+            rows = [{
+                "pmid": pmid,
+                "pmcid": pmcid,
+                "doi": doi,
+                "full_text_url": build_full_text_url(pmcid, doi, links.get(pmid) if links else None),
+                "ids_resolved": True,
+            } for pmid, (pmcid, doi) in article_ids.items() if pmcid is not None or links is not None]
+            if self.db.upsert_many(rows):
+                resolved_count += len(rows)
+        logger.info(f"Resolved article ids of {resolved_count} papers, {len(pmids) - len(unresolved_pmids)} papers are resolved already")
+        return resolved_count
+
+    def select_article_ids(self, pmid: str) -> ArticleIds | None:
+        """
+        The resolved ids of a paper, None if they haven't been resolved (see resolve_article_ids).
+        """
+        paper = self.db.select_many([pmid], columns=["pmcid", "doi", "full_text_url", "ids_resolved"]).get(pmid)
+        if paper is None or not paper["ids_resolved"]:
+            return None
+        return ArticleIds(paper["pmcid"], paper["doi"], paper["full_text_url"])
+
     def query_full_text(self, pmid: str) -> tuple[bool, str | None]:
         """
         Queries the full text of a paper by its PubMed ID (PMID).
@@ -264,9 +695,44 @@ class PubMedPaperRetriever:
         html_content = self.db.select_paper_html_content(pmid)
         if html_content is not None:
             return True, html_content
-        res, html_content = query_full_text(pmid)
+        res, html_content = query_full_text(pmid, self.select_article_ids(pmid))
         if res and html_content:
             self.db.insert_paper_html_content(pmid, html_content)
         return res, html_content
 
+    async def aquery_title_abstract_ispreprint(self, pmid: str) -> tuple[str | None, str | None, bool]:
+        """
+        Asynchronously queries the title, abstract, and preprint status of a paper by its PubMed ID (PMID).
+        
+        Args:
+            pmid (str): The PubMed ID of the paper.
+        
+        Returns:
+            tuple: A tuple containing the title, abstract, and a boolean indicating if it is a preprint.
+        """
+        # the sqlite calls block, they run in worker threads (the connections are per thread)
+        title, abstract, is_preprint = await asyncio.to_thread(self.db.select_paper_title_abstract, pmid)
+        if title is not None:
+            return title, abstract, is_preprint
+        title, abstract, is_preprint = await aquery_title_abstract_ispreprint(pmid)
+        await asyncio.to_thread(self.db.insert_paper_title_abstract, pmid, title, abstract, is_preprint)
+        return title, abstract, is_preprint
 
+    async def aquery_full_text(self, pmid: str) -> tuple[bool, str | None]:
+        """
+        Asynchronously queries the full text of a paper by its PubMed ID (PMID).
+        
+        Args:
+            pmid (str): The PubMed ID of the paper.
+        
+        Returns:
+            tuple: A tuple containing a boolean indicating success and the full text content (html format) or None if not found.
+        """
+        html_content = await asyncio.to_thread(self.db.select_paper_html_content, pmid)
+        if html_content is not None:
+            return True, html_content
+        article_ids = await asyncio.to_thread(self.select_article_ids, pmid)
+        res, html_content = await aquery_full_text(pmid, article_ids)
+        if res and html_content:
+            await asyncio.to_thread(self.db.insert_paper_html_content, pmid, html_content)
+        return res, html_content
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from src.database.db_utils import get_connection
+
+logger = logging.getLogger(__name__)
+
+# NCBI allows 3 requests per second, or 10 with an api key
+NCBI_API_KEY_ENV = "NCBI_API_KEY"
+NCBI_REQUESTS_PER_SECOND = 3.0
+NCBI_REQUESTS_PER_SECOND_WITH_API_KEY = 10.0
+# share the NCBI budget with the other processes using the same database folder, e.g. parallel scope runs
+NCBI_SHARED_RATE_LIMIT_ENV = "NCBI_SHARED_RATE_LIMIT"
+# requests per second to the local article service
+ARTICLE_REQUESTS_PER_SECOND = 3.0
+
+RATE_LIMIT_DB = "rate_limit"
+rate_limit_create_table_sql = f"""
+CREATE TABLE IF NOT EXISTS {RATE_LIMIT_DB} (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+rate_limit_select_sql = f"""
+SELECT tokens, updated_at FROM {RATE_LIMIT_DB} WHERE name = ?;
+"""
+rate_limit_upsert_sql = f"""
+INSERT INTO {RATE_LIMIT_DB} (name, tokens, updated_at) VALUES (?, ?, ?)
+ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at;
+"""
+
+def _take_token(tokens: float, updated_at: float, now: float, rate: float, capacity: float) -> tuple[float, float]:
+    """
+    Refill the bucket up to capacity and take a token, the tokens go negative when the caller has to wait.
+    Returns:
+        tuple: The remaining tokens and the seconds to wait for the token taken.
+    """
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate) - 1.0
+    return tokens, max(0.0, -tokens / rate)
+
+class TokenBucket:
+    """
+    A token bucket shared by the threads and coroutines of a process. A caller reserves a token
+    under the lock and waits for it outside of the lock, so waiting callers don't block each other
+    and the tokens are handed out in the order they were reserved.
+    """
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """
+        Args:
+            rate (float): The tokens (requests) per second.
+            capacity (float): The burst size, the requests that can be made at once after an idle period.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take a token, returns the seconds to wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens, wait = _take_token(self._tokens, self._updated_at, now, self.rate, self.capacity)
+            self._updated_at = now
+        return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class SqliteTokenBucket(TokenBucket):
+    """
+    A token bucket kept in the rate_limit database, shared by all processes using the same database folder.
+    Falls back to the process local bucket if the database is unavailable.
+    """
+    def __init__(self, name: str, rate: float, capacity: float = 1.0):
+        super().__init__(rate, capacity)
+        self.name = name
+
+    def reserve(self) -> float:
+        connection = get_connection(RATE_LIMIT_DB, [rate_limit_create_table_sql])
+        if connection is None:
+            return super().reserve()
+        try:
+            # the write lock is taken up front, so the read-modify-write is atomic across processes
+            connection.execute("BEGIN IMMEDIATE;")
+            try:
+                now = time.time()
+                row = connection.execute(rate_limit_select_sql, (self.name,)).fetchone()
+                tokens, updated_at = row if row else (self.capacity, now)
+                tokens, wait = _take_token(tokens, updated_at, now, self.rate, self.capacity)
+                connection.execute(rate_limit_upsert_sql, (self.name, tokens, now))
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+            return wait
+        except sqlite3.Error as e:
+            logger.error(f"Error reserving a {self.name} token, using the process rate limit: {e}")
+            return super().reserve()
+
+    async def aacquire(self):
+        # BEGIN IMMEDIATE waits up to the busy timeout for the other processes, not on the event loop
+        wait = await asyncio.to_thread(self.reserve)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+def get_ncbi_api_key() -> Optional[str]:
+    return os.environ.get(NCBI_API_KEY_ENV) or None
+
+def _create_bucket(name: str, rate: float) -> TokenBucket:
+    if os.environ.get(NCBI_SHARED_RATE_LIMIT_ENV, "").lower() in ("1", "true", "yes"):
+        return SqliteTokenBucket(name, rate)
+    return TokenBucket(rate)
+
+_buckets: dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+def _get_bucket(name: str, rate: float) -> TokenBucket:
+    bucket = _buckets.get(name)
+    if bucket is not None:
+        return bucket
+    with _buckets_lock:
+        if name not in _buckets:
+            _buckets[name] = _create_bucket(name, rate)
+            logger.info(f"{name} rate limit: {rate} requests per second")
+        return _buckets[name]
+
+def get_ncbi_rate_limiter() -> TokenBucket:
+    """
+    The rate limiter of the NCBI E-utilities requests of the process,
+    10 requests per second if $NCBI_API_KEY is set, 3 otherwise.
+    """
+    rate = NCBI_REQUESTS_PER_SECOND_WITH_API_KEY if get_ncbi_api_key() else NCBI_REQUESTS_PER_SECOND
+    return _get_bucket("ncbi", rate)
+
+def get_ncbi_page_rate_limiter() -> TokenBucket:
+    """
+    The rate limiter of the PubMed and PMC page requests of the process. They don't send the api key,
+    so they stay at 3 requests per second: in their own bucket if $NCBI_API_KEY is set,
+    in the E-utilities bucket otherwise.
+    """
+    if get_ncbi_api_key() is None:
+        return get_ncbi_rate_limiter()
+    return _get_bucket("ncbi_page", NCBI_REQUESTS_PER_SECOND)
+
+def get_article_rate_limiter() -> TokenBucket:
+    """
+    The rate limiter of the requests to the article service.
+    """
+    return _get_bucket("article", ARTICLE_REQUESTS_PER_SECOND)
+
+def reset_rate_limiters():
+    """
+    Forget the rate limiters, they are created again from the environment on next use.
+    """
+    with _buckets_lock:
+        _buckets.clear()
@@ -1,4 +1,4 @@
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
 import pandas as pd
 import re
 from difflib import get_close_matches
@@ -8,87 +8,99 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def html_table_to_markdown(html):
+# https://html.spec.whatwg.org/multipage/tables.html#attributes-common-to-td-and-th-elements
+MAX_COLSPAN = 1000
+MAX_ROWSPAN = 65534
+
+def _parse_span(value, max_span: int) -> int:
+    """
+    Parse a colspan/rowspan attribute, invalid values (e.g. "50%") count as 1,
+    0 is returned as is (a rowspan of 0 spans the remaining rows).
+    """
+    try:
+        span = int(str(value).strip())
+    except (TypeError, ValueError):
+        return 1
+    return min(max(span, 0), max_span)
+
+def _cell_text(cell: Tag) -> str:
+    """
+    The stripped strings of a cell joined together, superscripts (footnote marks) are skipped
+    without removing them from the tree.
+    """
+    parts = []
+    stack = list(reversed(cell.contents))
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Tag):
+            if node.name != "sup":
+                stack.extend(reversed(node.contents))
+        # like stripped_strings, only plain strings and CDATA are text
+        elif type(node) in (NavigableString, CData):
+            text = node.strip()
+            if text:
+                parts.append(text)
+    return "".join(parts)
+
+def html_table_to_markdown(html: str | Tag) -> str:
     """
     Convert an HTML table into a Markdown table, handling both colspan and rowspan.
 
-    :param html: HTML string containing a table
+    :param html: HTML string containing a table, or a parsed <table> (or an element containing one)
     :return: Markdown-formatted table as a string
     """
-    soup = BeautifulSoup(html, "html.parser")
-    table = soup.find("table")
+    if isinstance(html, Tag):
+        table = html if html.name == "table" else html.find("table")
+    else:
+        table = BeautifulSoup(html, "html.parser").find("table")
     if not table:
         return ""
 
     rows = table.find_all("tr")
+    n_rows = len(rows)
 
-    # Matrix to store the table structure, considering rowspan and colspan
-    table_matrix = []
-    max_cols = 0
-
-    rowspan_tracker = {}  # Dictionary to track rowspan placements
+    # The grid has a row per <tr>, a cell spanning several rows/columns is copied into
+    # every slot it covers, None marks slots no cell covers
+    grid: list[list[str | None]] = [[] for _ in range(n_rows)]
+    is_header_rows = []
 
     for row_idx, row in enumerate(rows):
         cols = row.find_all(["th", "td"])
-        row_data = []
+        is_header_rows.append(all(col.name == "th" for col in cols))
+        grid_row = grid[row_idx]
         col_idx = 0
 
-        # Fill in existing rowspan values
-        while col_idx in rowspan_tracker and rowspan_tracker[col_idx][1] > 0:
-            row_data.append(rowspan_tracker[col_idx][0])  # Use stored text
-            rowspan_tracker[col_idx] = (
-                rowspan_tracker[col_idx][0],
-                rowspan_tracker[col_idx][1] - 1,
-            )
-            if rowspan_tracker[col_idx][1] == 0:
-                del rowspan_tracker[col_idx]
-            col_idx += 1
-
-        is_header = all(col.name == "th" for col in cols)
-
         for col in cols:
-            for sup in col.find_all("sup"):  # Remove superscript elements
-                sup.decompose()
-
-            text = "".join(col.stripped_strings)
-            colspan = int(col.get("colspan", 1))
-            rowspan = int(col.get("rowspan", 1))
-
-            row_data.extend([text] * colspan)  # Expand colspan cells
-
-            if rowspan > 1:
-                for i in range(colspan):
-                    rowspan_tracker[col_idx + i] = (
-                        text,
-                        rowspan - 1,
-                    )  # Store rowspan values
-
+            # skip slots taken by rowspans from the rows above
+            while col_idx < len(grid_row) and grid_row[col_idx] is not None:
+                col_idx += 1
+            text = _cell_text(col)
+            colspan = _parse_span(col.get("colspan", 1), MAX_COLSPAN) or 1
+            rowspan = _parse_span(col.get("rowspan", 1), MAX_ROWSPAN)
+            last_row = n_rows if rowspan == 0 else min(n_rows, row_idx + rowspan)
+            for span_row in grid[row_idx:last_row]:
+                if len(span_row) < col_idx + colspan:
+                    span_row.extend([None] * (col_idx + colspan - len(span_row)))
+                span_row[col_idx:col_idx + colspan] = [text] * colspan
             col_idx += colspan
 
-        max_cols = max(max_cols, len(row_data))
-        table_matrix.append((row_data, is_header))
-
-    # Normalize all rows to the maximum column count, keeping rowspan values
-    for row, _ in table_matrix:
-        while len(row) < max_cols:
-            missing_col_idx = len(row)
-            if missing_col_idx in rowspan_tracker:
-                row.append(
-                    rowspan_tracker[missing_col_idx][0]
-                )  # Fill with rowspan text
-            else:
-                row.append("")  # Fallback to empty string
+    max_cols = max((len(row) for row in grid), default=0)
 
     # Identify header rows (continuous header rows at the beginning)
     header_end_idx = 0
-    for i, (_, is_header) in enumerate(table_matrix):
+    for i, is_header in enumerate(is_header_rows):
         if is_header:
             header_end_idx = i
         else:
             break
 
-    # Convert to Markdown
-    markdown_rows = ["| " + " | ".join(row) + " |" for row, _ in table_matrix]
+    # Convert to Markdown, slots no cell covers are empty
+    markdown_rows = [
+        "| " + " | ".join(
+            [cell if cell is not None else "" for cell in row] + [""] * (max_cols - len(row))
+        ) + " |"
+        for row in grid
+    ]
     separator = "| " + " | ".join(["---"] * max_cols) + " |"
 
     return "\n".join(
@@ -0,0 +1,53 @@
+import itertools
+import logging
+import threading
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from fake_useragent import UserAgent
+
+from .constants import headers
+
+logger = logging.getLogger(__name__)
+
+# the number of chrome user agents drawn from the fake_useragent database
+USER_AGENT_POOL_SIZE = 32
+FALLBACK_USER_AGENT = headers["user-agent"]
+
+_user_agent_pool: Optional[tuple[str, ...]] = None
+_user_agent_pool_lock = threading.Lock()
+# next() of itertools.count is atomic, so the rotation needs no lock
+_user_agent_counter = itertools.count()
+
+def _build_user_agent_pool(size: int) -> tuple[str, ...]:
+    try:
+        ua = UserAgent()
+        user_agents = list(dict.fromkeys(str(ua.chrome) for _ in range(size)))
+    except Exception as e:
+        logger.warning(f"Can't load the user agent database, using the fallback user agent: {e}")
+        user_agents = []
+    return tuple(user_agents) or (FALLBACK_USER_AGENT,)
+
+def get_user_agent_pool() -> tuple[str, ...]:
+    """
+    The user agents to rotate, the fake_useragent database is loaded once per process.
+    """
+    global _user_agent_pool
+    if _user_agent_pool is None:
+        with _user_agent_pool_lock:
+            if _user_agent_pool is None:
+                _user_agent_pool = _build_user_agent_pool(USER_AGENT_POOL_SIZE)
+    return _user_agent_pool
+
+def next_user_agent() -> str:
+    pool = get_user_agent_pool()
+    return pool[next(_user_agent_counter) % len(pool)]
+
+def build_request_headers() -> Mapping[str, str]:
+    """
+    A read-only copy of the browser headers with the next user agent of the pool,
+    so concurrent requests never share (or mutate) a header dict.
+    """
+    request_headers = {key: value for key, value in headers.items() if key.lower() != "user-agent"}
+    request_headers["User-Agent"] = next_user_agent()
+    return MappingProxyType(request_headers)
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+def ordered_concurrent_map(
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_workers: int,
+    max_pending: int | None = None,
+) -> Iterator[tuple[Any, Any]]:
+    """
+    Apply fn to items with a bounded thread pool, yielding (item, result) in input order.
+    Args:
+        fn (Callable): The function to apply to each item.
+        items (Iterable): The items to process, consumed lazily.
+        max_workers (int): The number of worker threads.
+        max_pending (int, optional): The maximum number of submitted but not yet yielded items,
+            defaults to twice the number of workers.
+    Yields:
+        tuple: A tuple of the item and the result of fn(item).
+    Raises:
+        Exception: Any exception raised by fn is re-raised when its item is reached.
+    """
+    max_workers = max(1, max_workers)
+    max_pending = max_pending if max_pending is not None else max_workers * 2
+    max_pending = max(max_workers, max_pending)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        try:
+            for item in items:
+                pending.append((item, executor.submit(fn, item)))
+                if len(pending) >= max_pending:
+                    item0, future = pending.popleft()
+                    yield item0, future.result()
+            while len(pending) > 0:
+                item0, future = pending.popleft()
+                yield item0, future.result()
+        finally:
+            # don't start queued work if the consumer stops early or an item failed
+            for _, future in pending:
+                future.cancel()
+
+async def aordered_concurrent_map(
+    afn: Callable[[Any], Awaitable[Any]],
+    items: Iterable[Any],
+    max_concurrency: int,
+    max_pending: int | None = None,
+) -> AsyncIterator[tuple[Any, Any]]:
+    """
+    Await afn for items with bounded concurrency, yielding (item, result) in input order.
+    Args:
+        afn (Callable): The coroutine function to apply to each item.
+        items (Iterable): The items to process, consumed lazily.
+        max_concurrency (int): The maximum number of afn calls running at the same time.
+        max_pending (int, optional): The maximum number of scheduled but not yet yielded items,
+            defaults to twice max_concurrency.
+    Yields:
+        tuple: A tuple of the item and the result of afn(item).
+    Raises:
+        Exception: Any exception raised by afn is re-raised when its item is reached.
+    """
+    max_concurrency = max(1, max_concurrency)
+    max_pending = max_pending if max_pending is not None else max_concurrency * 2
+    max_pending = max(max_concurrency, max_pending)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(item: Any) -> Any:
+        async with semaphore:
+            return await afn(item)
+
+    pending = deque()
+    try:
+        for item in items:
+            pending.append((item, asyncio.ensure_future(run(item))))
+            if len(pending) >= max_pending:
+                item0, task = pending.popleft()
+                yield item0, await task
+        while len(pending) > 0:
+            item0, task = pending.popleft()
+            yield item0, await task
+    finally:
+        for _, task in pending:
+            task.cancel()
@@ -1,6 +1,10 @@
 
+import asyncio
+from concurrent.futures import Executor
+import threading
 from typing import Callable, Optional
 from langgraph.graph import StateGraph, START, END
+from langchain_core.runnables import RunnableLambda
 from langchain_openai.chat_models.base import BaseChatOpenAI
 
 from ..paper_query.pubmed_query import (
@@ -12,24 +16,70 @@ from ..agents.identify_relevant_step import (
 )
 from ..agents.identify_original_step import (
     IdentifyOriginalDataStep,
+    get_scope_independent_research_goal,
+    split_scope_instructions,
 )
+from ..agents.identify_abstract_relevance_step import (
+    DEFAULT_ABSTRACT_RELEVANCE_THRESHOLD,
+    IdentifyAbstractRelevanceStep,
+)
+from ..agents.lexical_prefilter_step import LexicalPrefilterStep
+from ..database.original_verdict_db import OriginalVerdictDB
 from ..agents.agent_utils import IdentifyState, ResearchGoalEnum
 
-from .workflow_utils import convert_html_to_plaintext
+from .workflow_utils import EXTRACTOR_VERSION, extract_plaintext_and_sections
 from ..paper_query.pubmed_query import PubMedPaperRetriever
 
+class PaperUnavailableError(Exception):
+    """
+    The title or the full text of a paper couldn't be retrieved, e.g. a request failed.
+    Unlike a negative result, the paper is worth trying again.
+    """
+
 class IdentifyWorkflow:
     def __init__(
         self, 
         llm: BaseChatOpenAI, 
         step_callback: Optional[Callable] = None,
         two_steps_agent: bool = False,
+        html_executor: Optional[Executor] = None,
+        abstract_prefilter: bool = False,
+        abstract_relevance_threshold: float = DEFAULT_ABSTRACT_RELEVANCE_THRESHOLD,
+        lexical_prefilter: bool = False,
+        reuse_original_verdicts: bool = False,
     ):
+        """
+        Args:
+            html_executor (Executor, optional): The executor html to plaintext conversion is sent to,
+                e.g. a ProcessPoolExecutor so that parsing isn't serialized by the GIL with
+                the network and llm work of other papers. Conversion runs in the calling thread
+                (or a worker thread in aidentify) if None.
+            abstract_prefilter (bool): Screen the title and abstract first, papers that are clearly
+                not relevant are rejected before the full text is retrieved.
+            abstract_relevance_threshold (float): The minimum confidence of a "not relevant" answer
+                of the prefilter to reject a paper.
+            lexical_prefilter (bool): Look for accessions, repository links and the instruction keywords
+                in the full text, papers without any of them are not sent to the original data step.
+            reuse_original_verdicts (bool): Reuse the original data verdict on a paper for all scopes
+                (and runs) with the same data modality, original data instructions and model.
+                The original data step is run scope independently: it gets the data modality as research goal
+                and the instructions without the targeted disease lines, which are checked by the relevance step instead.
+        """
         self.llm = llm
         self.steps = []
         self.step_callback = step_callback
         self.paper_retriever = PubMedPaperRetriever()  # Placeholder for paper retriever if needed
         self.two_steps_agent = two_steps_agent
+        self.html_executor = html_executor
+        self.abstract_prefilter = abstract_prefilter
+        self.abstract_relevance_threshold = abstract_relevance_threshold
+        self.lexical_prefilter = lexical_prefilter
+        self.reuse_original_verdicts = reuse_original_verdicts
+        # the scopes of a paper run concurrently, the first one fetches and extracts the full text,
+        # the others wait for it and read the plaintext cache
+        self._plaintext_locks: dict[str, threading.Lock] = {}
+        self._plaintext_locks_lock = threading.Lock()
+        self._aplaintext_locks: dict[str, asyncio.Lock] = {}
 
     def compile(self):
         """
@@ -45,6 +95,7 @@ class IdentifyWorkflow:
             IdentifyOriginalDataStep(
                 llm=self.llm,
                 two_steps_agent=self.two_steps_agent,
+                verdict_db=OriginalVerdictDB() if self.reuse_original_verdicts else None,
             )
         )
         def check_original(state: IdentifyState) -> bool:
@@ -52,11 +103,63 @@ class IdentifyWorkflow:
             if original is None:
                 return False
             return original
+
+        def check_abstract_relevant(state: IdentifyState) -> bool:
+            return state.get("abstract_relevant", True) is not False
+
+        def check_full_text(state: IdentifyState) -> bool:
+            return bool(state.get("content"))
+
+        def check_lexical_evidence(state: IdentifyState) -> bool:
+            return state.get("original", None) is not False
         
         graph = StateGraph(IdentifyState)
-        graph.add_node("identify_relevance", self.steps[0].execute)
-        graph.add_node("identify_original_data", self.steps[1].execute)
-        graph.add_edge(START, "identify_original_data")
+        # nodes run execute() with graph.stream and aexecute() with graph.astream
+        graph.add_node(
+            "identify_relevance",
+            RunnableLambda(self.steps[0].execute, afunc=self.steps[0].aexecute),
+        )
+        graph.add_node(
+            "identify_original_data",
+            RunnableLambda(self.steps[1].execute, afunc=self.steps[1].aexecute),
+        )
+        graph.add_node(
+            "load_full_text",
+            RunnableLambda(self._load_full_text, afunc=self._aload_full_text),
+        )
+        if self.abstract_prefilter:
+            prefilter_step = IdentifyAbstractRelevanceStep(
+                llm=self.llm,
+                threshold=self.abstract_relevance_threshold,
+            )
+            self.steps.append(prefilter_step)
+            graph.add_node(
+                "identify_abstract_relevance",
+                RunnableLambda(prefilter_step.execute, afunc=prefilter_step.aexecute),
+            )
+            graph.add_edge(START, "identify_abstract_relevance")
+            graph.add_conditional_edges("identify_abstract_relevance", check_abstract_relevant, {
+                True: "load_full_text", False: END
+            })
+        else:
+            graph.add_edge(START, "load_full_text")
+        if self.lexical_prefilter:
+            lexical_step = LexicalPrefilterStep()
+            self.steps.append(lexical_step)
+            graph.add_node(
+                "lexical_prefilter",
+                RunnableLambda(lexical_step.execute, afunc=lexical_step.aexecute),
+            )
+            graph.add_conditional_edges("load_full_text", check_full_text, {
+                True: "lexical_prefilter", False: END
+            })
+            graph.add_conditional_edges("lexical_prefilter", check_lexical_evidence, {
+                True: "identify_original_data", False: END
+            })
+        else:
+            graph.add_conditional_edges("load_full_text", check_full_text, {
+                True: "identify_original_data", False: END
+            })
         graph.add_conditional_edges("identify_original_data", check_original, {
             True: "identify_relevance", False: END
         })
@@ -70,34 +173,46 @@ class IdentifyWorkflow:
         research_goal: str,
         identify_original_instructions: Optional[str] = None,
         identify_relevant_instructions: Optional[str] = None,
+        raise_if_unavailable: bool = False,
     ) -> bool:
         """
         Identify the relevance and original data of a paper by its PubMed ID (PMID).
         Args:
             pmid (str): The PubMed ID of the paper.
+            raise_if_unavailable (bool): Raise PaperUnavailableError if the title or the full text
+                can't be retrieved, e.g. to record the paper as failed and retry it, instead of returning False.
         Returns:
-            IdentifyState: The state containing the results of the identification process.
+            bool: True if the paper is relevant and has original data, False otherwise.
+        Raises:
+            PaperUnavailableError: If the title or the full text can't be retrieved and raise_if_unavailable is set.
         """
-        title, abstract, is_preprint = self.paper_retriever.query_title_abstract_ispreprint(pmid) # query_title_abstract_ispreprint(pmid)
-        if not title or not abstract or is_preprint:
-            return False
-        res, html_content = self.paper_retriever.query_full_text(pmid) # query_full_text(pmid)
-        if not res or not html_content:
-            return False
-        full_text = convert_html_to_plaintext(html_content)
-        if not full_text:
+        try:
+            return self._identify(pmid, research_goal, identify_original_instructions, identify_relevant_instructions)
+        except PaperUnavailableError:
+            if raise_if_unavailable:
+                raise
             return False
-        
 
-        state = IdentifyState(
+    def _identify(
+        self,
+        pmid: str,
+        research_goal: str,
+        identify_original_instructions: Optional[str],
+        identify_relevant_instructions: Optional[str],
+    ) -> bool:
+        title, abstract, is_preprint = self.paper_retriever.query_title_abstract_ispreprint(pmid) # query_title_abstract_ispreprint(pmid)
+        if not title:
+            raise PaperUnavailableError(f"Can't retrieve the title of paper with PMID {pmid}")
+        if not abstract or is_preprint:
+            return False
+        # the full text is loaded by the load_full_text node, after the optional prefilter
+        state = self._build_state(
             pmid=pmid,
             research_goal=research_goal,
             title=title,
             abstract=abstract,
-            content=full_text,
-            step_output_callback=self.step_callback,
-            identify_original_instructions=identify_original_instructions or "N/A",
-            identify_relevant_instructions=identify_relevant_instructions or "N/A",
+            identify_original_instructions=identify_original_instructions,
+            identify_relevant_instructions=identify_relevant_instructions,
         )
 
         s = None
@@ -113,6 +228,168 @@ class IdentifyWorkflow:
             return False
         return s.get("relevant", False) and s.get("original", False)
 
+    async def aidentify(
+        self, 
+        pmid: str, 
+        research_goal: str,
+        identify_original_instructions: Optional[str] = None,
+        identify_relevant_instructions: Optional[str] = None,
+        raise_if_unavailable: bool = False,
+    ) -> bool:
+        """
+        Asynchronously identify the relevance and original data of a paper by its PubMed ID (PMID).
+        Network requests and llm calls are awaited, so many papers can be in flight in one event loop.
+        Args:
+            pmid (str): The PubMed ID of the paper.
+            raise_if_unavailable (bool): See identify.
+        Returns:
+            bool: True if the paper is relevant and has original data, False otherwise.
+        Raises:
+            PaperUnavailableError: If the title or the full text can't be retrieved and raise_if_unavailable is set.
+        """
+        try:
+            return await self._aidentify(pmid, research_goal, identify_original_instructions, identify_relevant_instructions)
+        except PaperUnavailableError:
+            if raise_if_unavailable:
+                raise
+            return False
+
+    async def _aidentify(
+        self,
+        pmid: str,
+        research_goal: str,
+        identify_original_instructions: Optional[str],
+        identify_relevant_instructions: Optional[str],
+    ) -> bool:
+        title, abstract, is_preprint = await self.paper_retriever.aquery_title_abstract_ispreprint(pmid)
+        if not title:
+            raise PaperUnavailableError(f"Can't retrieve the title of paper with PMID {pmid}")
+        if not abstract or is_preprint:
+            return False
+        # the full text is loaded by the load_full_text node, after the optional prefilter
+        state = self._build_state(
+            pmid=pmid,
+            research_goal=research_goal,
+            title=title,
+            abstract=abstract,
+            identify_original_instructions=identify_original_instructions,
+            identify_relevant_instructions=identify_relevant_instructions,
+        )
+
+        s = None
+        async for s in self.graph.astream(
+            input=state,
+            stream_mode="values",
+            config={"recursion_limit": 1000},
+        ):
+            continue
+
+        if s is None:
+            return False
+        return s.get("relevant", False) and s.get("original", False)
+
+    def _load_full_text(self, state: IdentifyState) -> dict:
+        full_text, sections = self._query_plaintext(state["pmid"])
+        return {"content": full_text, "sections": sections}
+
+    async def _aload_full_text(self, state: IdentifyState) -> dict:
+        full_text, sections = await self._aquery_plaintext(state["pmid"])
+        return {"content": full_text, "sections": sections}
+
+    def _query_plaintext(self, pmid: str) -> tuple[str | None, list[dict] | None]:
+        """
+        Get the plaintext and sections of a paper, the html content is only fetched and parsed
+        if no plaintext of the current extractor version is cached. Concurrent calls for the same paper
+        (its scopes) wait for the first one.
+        Raises:
+            PaperUnavailableError: If the full text can't be retrieved.
+        """
+        with self._plaintext_locks_lock:
+            lock = self._plaintext_locks.setdefault(pmid, threading.Lock())
+        with lock:
+            try:
+                return self._query_plaintext_once(pmid)
+            finally:
+                with self._plaintext_locks_lock:
+                    self._plaintext_locks.pop(pmid, None)
+
+    def _query_plaintext_once(self, pmid: str) -> tuple[str | None, list[dict] | None]:
+        db = self.paper_retriever.db
+        full_text, sections = db.select_paper_plaintext(pmid, EXTRACTOR_VERSION)
+        if full_text is not None:
+            return full_text, sections
+        res, html_content = self.paper_retriever.query_full_text(pmid)
+        if not res or not html_content:
+            raise PaperUnavailableError(f"Can't retrieve the full text of paper with PMID {pmid}")
+        if self.html_executor is None:
+            full_text, sections = extract_plaintext_and_sections(html_content)
+        else:
+            full_text, sections = self.html_executor.submit(
+                extract_plaintext_and_sections, html_content,
+            ).result()
+        if full_text:
+            db.insert_paper_plaintext(pmid, EXTRACTOR_VERSION, full_text, sections)
+        return full_text, sections
+
+    async def _aquery_plaintext(self, pmid: str) -> tuple[str | None, list[dict] | None]:
+        lock = self._aplaintext_locks.setdefault(pmid, asyncio.Lock())
+        async with lock:
+            try:
+                return await self._aquery_plaintext_once(pmid)
+            finally:
+                self._aplaintext_locks.pop(pmid, None)
+
+    async def _aquery_plaintext_once(self, pmid: str) -> tuple[str | None, list[dict] | None]:
+        # the sqlite calls block, they run in worker threads (the connections are per thread)
+        db = self.paper_retriever.db
+        full_text, sections = await asyncio.to_thread(db.select_paper_plaintext, pmid, EXTRACTOR_VERSION)
+        if full_text is not None:
+            return full_text, sections
+        res, html_content = await self.paper_retriever.aquery_full_text(pmid)
+        if not res or not html_content:
+            raise PaperUnavailableError(f"Can't retrieve the full text of paper with PMID {pmid}")
+        # html parsing is cpu bound, keep it off the event loop
+        if self.html_executor is None:
+            full_text, sections = await asyncio.to_thread(extract_plaintext_and_sections, html_content)
+        else:
+            full_text, sections = await asyncio.get_running_loop().run_in_executor(
+                self.html_executor, extract_plaintext_and_sections, html_content,
+            )
+        if full_text:
+            await asyncio.to_thread(db.insert_paper_plaintext, pmid, EXTRACTOR_VERSION, full_text, sections)
+        return full_text, sections
+
+    def _build_state(
+        self,
+        pmid: str,
+        research_goal: str,
+        title: str,
+        abstract: str,
+        identify_original_instructions: Optional[str] = None,
+        identify_relevant_instructions: Optional[str] = None,
+    ) -> IdentifyState:
+        identify_original_instructions = identify_original_instructions or "N/A"
+        identify_relevant_instructions = identify_relevant_instructions or "N/A"
+        original_research_goal = None
+        if self.reuse_original_verdicts:
+            original_research_goal = get_scope_independent_research_goal(research_goal)
+            identify_original_instructions, scope_lines = split_scope_instructions(identify_original_instructions)
+            if scope_lines:
+                identify_relevant_instructions = "\n".join([
+                    identify_relevant_instructions.rstrip(),
+                    *[f"- {line}" for line in scope_lines],
+                ])
+        return IdentifyState(
+            pmid=pmid,
+            research_goal=research_goal,
+            title=title,
+            abstract=abstract,
+            step_output_callback=self.step_callback,
+            identify_original_instructions=identify_original_instructions,
+            identify_relevant_instructions=identify_relevant_instructions,
+            original_research_goal=original_research_goal,
+        )
+
         
 def identify_workflow(
     wf: IdentifyWorkflow,
@@ -120,6 +397,7 @@ def identify_workflow(
     research_goal: str,
     identify_original_instructions: Optional[str] = None,
     identify_relevant_instructions: Optional[str] = None,
+    raise_if_unavailable: bool = False,
 ) -> bool:
     """
     Identify the relevance and original data of a paper by its PubMed ID (PMID).
@@ -129,6 +407,7 @@ def identify_workflow(
         step_callback (Optional[Callable]): Callback function for step output.
         research_goal (ResearchGoalEnum): The research goal to use.
         identify_original_instructions (Optional[str]): Additional instructions for identification.
+        raise_if_unavailable (bool): See IdentifyWorkflow.identify.
     Returns:
         bool: True if the paper is relevant and has original data, False otherwise.
     """
@@ -136,5 +415,32 @@ def identify_workflow(
         pmid=pmid,
         research_goal=research_goal,
         identify_original_instructions=identify_original_instructions,
-        identify_relevant_instructions=identify_relevant_instructions,
-    )
\ No newline at end of file
+        identify_relevant_instructions=identify_relevant_instructions,        raise_if_unavailable=raise_if_unavailable,
+    )
+
+async def aidentify_workflow(
+    wf: IdentifyWorkflow,
+    pmid: str, 
+    research_goal: str,
+    identify_original_instructions: Optional[str] = None,
+    identify_relevant_instructions: Optional[str] = None,
+    raise_if_unavailable: bool = False,
+) -> bool:
+    """
+    Asynchronously identify the relevance and original data of a paper by its PubMed ID (PMID).
+    Args:
+        wf (IdentifyWorkflow): The compiled identify workflow.
+        pmid (str): The PubMed ID of the paper.
+        research_goal (str): The research goal (scope) to use.
+        identify_original_instructions (Optional[str]): Additional instructions for identifying original data.
+        identify_relevant_instructions (Optional[str]): Additional instructions for identifying relevance.
+        raise_if_unavailable (bool): See IdentifyWorkflow.identify.
+    Returns:
+        bool: True if the paper is relevant and has original data, False otherwise.
+    """
+    return await wf.aidentify(
+        pmid=pmid,
+        research_goal=research_goal,
+        identify_original_instructions=identify_original_instructions,
+        identify_relevant_instructions=identify_relevant_instructions,        raise_if_unavailable=raise_if_unavailable,
+    )
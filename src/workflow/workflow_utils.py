@@ -1,10 +1,109 @@
 
 import logging
+import re
 
+from ..agents.content_packing import format_section
 from ..paper_query.html_extractor import HtmlTableExtractor
 
 logger = logging.getLogger(__name__)
 
+# Bump EXTRACTOR_VERSION whenever the output of extract_plaintext_and_sections changes,
+# plaintext cached by an older extractor is then ignored and re-extracted.
+EXTRACTOR_VERSION = "5"
+
+def _normalize_text(text: str) -> str:
+    # section contents have their braces escaped, data availability and methods don't
+    text = text.replace("{{", "{").replace("}}", "}")
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+def _normalize_heading(heading: str) -> str:
+    return re.sub(r"[^a-z]", "", heading.lower())
+
+def merge_extra_sections(sections: list[dict], extra_sections: list[dict]) -> list[dict]:
+    """
+    Merge the separately extracted sections (data availability, methods) into the sections,
+    so that every piece of content is emitted once:
+    an extra section already covered by the text of the sections is dropped, an extra section
+    covering the section of the same heading replaces it, otherwise it is appended.
+    """
+    sections = list(sections)
+    document = _normalize_text(" ".join(sec["content"] for sec in sections))
+    for extra in extra_sections:
+        extra_content = _normalize_text(extra["content"])
+        if not extra_content or extra_content in document:
+            continue
+        heading = _normalize_heading(extra["section"])
+        for ix, sec in enumerate(sections):
+            if _normalize_heading(sec["section"]) == heading and _normalize_text(sec["content"]) in extra_content:
+                sections[ix] = {"section": sec["section"], "content": extra["content"]}
+                break
+        else:
+            sections.append(extra)
+        document = _normalize_text(" ".join(sec["content"] for sec in sections))
+    return sections
+
+def join_sections(sections: list[dict]) -> tuple[str, list[dict]]:
+    """
+    Join the sections into plain text.
+    Returns:
+        tuple: The plain text and the sections with their offsets in it,
+            [{"section": ..., "content": ..., "start": ..., "end": ...}, ...] with end exclusive.
+    """
+    parts = []
+    indexed_sections = []
+    offset = 0
+    for sec in sections:
+        text = format_section(sec)
+        indexed_sections.append({**sec, "start": offset, "end": offset + len(text)})
+        parts.append(text)
+        offset += len(text) + 1
+    return "\n".join(parts), indexed_sections
+
+def _extract_sections(
+    html: str,
+    include_data_availability=True,
+    include_methods=True,
+) -> list[dict] | None:
+    # one parse shared by the sections, data availability and methods extractors
+    parsed = HtmlTableExtractor().extract_all(html)
+    sections = parsed["sections"]
+    if sections is None:
+        return None
+    extra_sections = []
+    if include_data_availability:
+        data_availability = parsed["data_availability"]
+        if data_availability:
+            extra_sections.append({"section": "Data Availability", "content": data_availability})
+    
+    if include_methods:
+        methods = parsed["methods"]
+        if methods:
+            extra_sections.append({"section": "Methods", "content": methods})
+    return merge_extra_sections(sections, extra_sections)
+
+def extract_plaintext_and_sections(
+    html: str,
+    include_data_availability=True,
+    include_methods=True,
+) -> tuple[str | None, list[dict] | None]:
+    """
+    Extracts the sections of the HTML content and joins them into plain text.
+    Args:
+        html (str): The HTML content to convert.
+    Returns:
+        tuple: A tuple containing the plain text and the sections, which index it with their offsets
+            ([{"section": ..., "content": ..., "start": ..., "end": ...}, ...], see join_sections),
+            (None, None) if the conversion fails.
+    """
+    try:
+        sections = _extract_sections(html, include_data_availability, include_methods)
+        if sections is None:
+            return None, None
+        return join_sections(sections)
+    except Exception as e:
+        logger.error(f"Error converting HTML to plaintext: {e}")
+        return None, None
+
 def convert_html_to_plaintext(
     html: str, 
     include_data_availability=True,
@@ -17,26 +116,13 @@ def convert_html_to_plaintext(
     Returns:
         str: The plain text content.
     """
-    try:
-        extractor = HtmlTableExtractor()
-        sections = extractor.extract_sections(html)
-        if sections is None:
-            return None
-        if include_data_availability:
-            data_availability = extractor.extract_data_availability(html)
-            if data_availability:
-                sections.append({"section": "Data Availability", "content": data_availability})
-        
-        if include_methods:
-            methods = extractor.extract_methods(html)
-            if methods:
-                sections.append({"section": "Methods", "content": methods})
-        return "\n".join([sec["section"].strip() + "\n" + sec["content"].strip() \
-                          for sec in sections])
-    except Exception as e:
-        logger.error(f"Error converting HTML to plaintext: {e}")
-        return None  # Return original HTML if conversion fails
-    
+    plaintext, _ = extract_plaintext_and_sections(
+        html,
+        include_data_availability=include_data_availability,
+        include_methods=include_methods,
+    )
+    return plaintext
+
 def obtain_full_text(pmid: str) -> str | None:
     """
     Obtain the full text of a paper given its PubMed ID (PMID).
@@ -1,9 +1,13 @@
 
 import logging
-from typing import Optional
+from typing import Any, List, Optional
 import pytest
 import os
 
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
 from langchain_openai.chat_models import AzureChatOpenAI, ChatOpenAI
 from dotenv import load_dotenv
 
@@ -32,6 +36,36 @@ def get_azure_openai():
         max_completion_tokens=int(os.environ.get("OPENAI_MAX_OUTPUT_TOKENS", 4096)),
     )
 
+class FakeChatModel(BaseChatModel):
+    """
+    Offline chat model: every call returns `reasoning`, and structured output
+    is built from `answer`. `calls` counts the llm generations.
+    """
+    answer: dict = {}
+    reasoning: str = "reasoning process\n**FinalAnswer**: Yes"
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=self.reasoning))],
+            llm_output={"token_usage": {"total_tokens": 3, "prompt_tokens": 2, "completion_tokens": 1}},
+        )
+
+    def _combine_llm_outputs(self, llm_outputs: List[Optional[dict]]) -> dict:
+        token_usage = {**DEFAULT_TOKEN_USAGE}
+        for output in llm_outputs:
+            if output is not None:
+                token_usage = increase_token_usage(token_usage, output["token_usage"])
+        return {"token_usage": token_usage}
+
+    def with_structured_output(self, schema, **kwargs):
+        return self | RunnableLambda(lambda _: schema(**self.answer))
+
 @pytest.fixture(scope="session", autouse=True)
 def prepare_logging():
     level = logging.INFO
@@ -54,6 +88,19 @@ def prepare_logging():
 def llm():
     return get_azure_openai()
 
+@pytest.fixture
+def fake_llm():
+    return FakeChatModel(answer={
+        "reasoning_process": "reasoning process",
+        "original_and_accessible": True,
+        "relevant": True,
+    })
+
+@pytest.fixture
+def data_folder(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_FOLDER", str(tmp_path))
+    return tmp_path
+
 @pytest.fixture(scope="module")
 def sc_alzheimers_query():
     return read_config_query("Alzheimer_SingleCell")
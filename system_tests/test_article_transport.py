@@ -0,0 +1,98 @@
+
+import asyncio
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.paper_query.article_retriever import ArticleRetriever
+from src.paper_query.http_session import aclose_async_client
+
+ARTICLE_HTML = "<html><body><p>snRNA-seq données</p></body></html>"
+
+class ArticleServiceHandler(BaseHTTPRequestHandler):
+    """
+    A stand-in for the article service, articles of urls ending with /large are 10 kB
+    and sent without a content length, so the size cap applies while reading the body.
+    """
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        url = query["url"][0]
+        html = ARTICLE_HTML if not url.endswith("/large") else "<p>" + "x" * 10000 + "</p>"
+        body = html.encode("utf-8")
+        if "inline" in query:
+            self.server.requests.append("inline")
+            if not self.server.inline_supported:
+                return self._send(400, b"missing output")
+            return self._send(200, body, "text/html", content_length=not url.endswith("/large"))
+        self.server.requests.append("file")
+        # the client and the service share the temp folder
+        with open(query["output"][0], "w") as fobj:
+            fobj.write(html)
+        self._send(200, b"{}", "application/json")
+
+    def _send(self, status: int, body: bytes, content_type: str = "text/plain", content_length: bool = True):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if content_length:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def article_service(monkeypatch, tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ArticleServiceHandler)
+    server.requests = []
+    server.inline_supported = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("BASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setenv("TEMP_FOLDER", str(tmp_path))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _arequest_full_text_from_url(url: str):
+    async def request():
+        try:
+            return await ArticleRetriever()._arequest_full_text_from_url(url)
+        finally:
+            await aclose_async_client()
+    return asyncio.run(request())
+
+def test_file_transport(article_service, monkeypatch, tmp_path):
+    monkeypatch.delenv("ARTICLE_TRANSPORT", raising=False)
+    assert ArticleRetriever()._request_full_text_from_url("https://publisher.org/1") == (True, ARTICLE_HTML, 200)
+    assert article_service.requests == ["file"]
+    # the temporary file is removed
+    assert os.listdir(tmp_path) == []
+
+def test_inline_transport(article_service, monkeypatch, tmp_path):
+    monkeypatch.setenv("ARTICLE_TRANSPORT", "inline")
+    assert ArticleRetriever()._request_full_text_from_url("https://publisher.org/1") == (True, ARTICLE_HTML, 200)
+    assert _arequest_full_text_from_url("https://publisher.org/1") == (True, ARTICLE_HTML, 200)
+    assert article_service.requests == ["inline", "inline"]
+    assert os.listdir(tmp_path) == []
+
+def test_inline_transport_size_cap(article_service, monkeypatch):
+    monkeypatch.setenv("ARTICLE_TRANSPORT", "inline")
+    monkeypatch.setenv("ARTICLE_MAX_BYTES", "1000")
+    res, reason, code = ArticleRetriever()._request_full_text_from_url("https://publisher.org/large")
+    assert (res, code) == (False, 413)
+    assert "ARTICLE_MAX_BYTES" in reason
+    res, _, code = _arequest_full_text_from_url("https://publisher.org/large")
+    assert (res, code) == (False, 413)
+    # an article below the cap is returned
+    assert ArticleRetriever()._request_full_text_from_url("https://publisher.org/1")[0]
+
+def test_inline_transport_falls_back_to_file(article_service, monkeypatch):
+    monkeypatch.setenv("ARTICLE_TRANSPORT", "inline")
+    article_service.inline_supported = False
+    assert ArticleRetriever()._request_full_text_from_url("https://publisher.org/1") == (True, ARTICLE_HTML, 200)
+    assert _arequest_full_text_from_url("https://publisher.org/1") == (True, ARTICLE_HTML, 200)
+    assert article_service.requests == ["inline", "file", "inline", "file"]
@@ -0,0 +1,65 @@
+
+import asyncio
+import random
+import threading
+import time
+import pytest
+
+from src.workflow.concurrent_utils import aordered_concurrent_map, ordered_concurrent_map
+
+def test_ordered_concurrent_map_keeps_input_order():
+    def slow_square(x: int) -> int:
+        time.sleep(random.random() * 0.01)
+        return x * x
+
+    items = list(range(50))
+    results = list(ordered_concurrent_map(slow_square, iter(items), max_workers=8))
+    assert [item for item, _ in results] == items
+    assert [res for _, res in results] == [x * x for x in items]
+
+def test_ordered_concurrent_map_bounds_workers():
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+
+    def work(x: int) -> int:
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.005)
+        with lock:
+            running -= 1
+        return x
+
+    list(ordered_concurrent_map(work, range(40), max_workers=4))
+    assert max_running <= 4
+
+def test_ordered_concurrent_map_reraises_exception():
+    def fail_on_three(x: int) -> int:
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+
+    with pytest.raises(ValueError):
+        list(ordered_concurrent_map(fail_on_three, range(10), max_workers=2))
+
+def test_aordered_concurrent_map_keeps_input_order():
+    running = 0
+    max_running = 0
+
+    async def slow_square(x: int) -> int:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(random.random() * 0.01)
+        running -= 1
+        return x * x
+
+    async def collect():
+        return [res async for res in aordered_concurrent_map(slow_square, range(50), max_concurrency=5)]
+
+    results = asyncio.run(collect())
+    assert [item for item, _ in results] == list(range(50))
+    assert [res for _, res in results] == [x * x for x in range(50)]
+    assert max_running <= 5
@@ -0,0 +1,85 @@
+
+import pytest
+
+from src.agents import content_packing
+from src.agents.content_packing import (
+    ORIGINAL_DATA_SECTION_PRIORITIES,
+    RELEVANCE_SECTION_PRIORITIES,
+    count_tokens,
+    dedupe_sections,
+    pack_content,
+    pack_sections,
+)
+from src.agents.identify_original_step import IdentifyOriginalDataStep
+
+SECTIONS = [
+    {"section": "Abstract", "content": "We profiled nuclei from the substantia nigra."},
+    {"section": "Introduction", "content": "Parkinson's disease background. " * 200},
+    {"section": "Results", "content": "SOX6+ neurons were depleted. " * 200},
+    {"section": "Data availability", "content": "Raw data are available in GEO (GSE184950)."},
+    {"section": "Methods", "content": "Libraries were prepared with 10x Genomics Chromium v3."},
+    # appended by the plaintext builder after the sections they were extracted from
+    {"section": "Data Availability", "content": "Raw data are available in  GEO (GSE184950).\n"},
+    {"section": "Methods", "content": "Libraries were prepared with 10x Genomics Chromium v3."},
+]
+
+@pytest.fixture
+def estimated_tokens(monkeypatch):
+    # chars / 4 estimates keep the budgets deterministic without the tiktoken encoding file
+    monkeypatch.setattr(content_packing, "_encoding", None)
+    monkeypatch.setattr(content_packing, "_encoding_loaded", True)
+
+def test_count_tokens_estimates_if_encoding_fails_to_load(monkeypatch):
+    def get_encoding(name):
+        # e.g. the encoding file can't be downloaded
+        raise ConnectionError("network is unreachable")
+
+    if content_packing.tiktoken is not None:
+        monkeypatch.setattr(content_packing.tiktoken, "get_encoding", get_encoding)
+    monkeypatch.setattr(content_packing, "_encoding", None)
+    monkeypatch.setattr(content_packing, "_encoding_loaded", False)
+    assert count_tokens("a" * 10) == 3
+    assert content_packing._encoding_loaded
+
+def test_dedupe_sections():
+    sections = dedupe_sections(SECTIONS + [{"section": "Empty", "content": " "}])
+    assert [s["section"] for s in sections] == [
+        "Abstract", "Introduction", "Results", "Data availability", "Methods",
+    ]
+
+def test_pack_sections_without_budget():
+    packed = pack_sections(SECTIONS, 0, ORIGINAL_DATA_SECTION_PRIORITIES)
+    assert packed.count("GSE184950") == 1
+    assert packed.startswith("Abstract\nWe profiled")
+
+def test_pack_sections_prioritizes_per_step(estimated_tokens):
+    original = pack_sections(SECTIONS, 300, ORIGINAL_DATA_SECTION_PRIORITIES)
+    assert count_tokens(original) <= 300
+    assert "GSE184950" in original and "10x Genomics" in original
+    # the rest of the budget is filled in document order, sections stay in document order
+    assert original.index("Abstract") < original.index("Data availability") < original.index("Methods")
+
+    relevance = pack_sections(SECTIONS, 300, RELEVANCE_SECTION_PRIORITIES)
+    assert count_tokens(relevance) <= 300
+    assert relevance.startswith("Abstract\nWe profiled")
+    assert "Parkinson's disease background." in relevance
+    assert "GSE184950" not in relevance
+
+def test_pack_content_without_sections(estimated_tokens):
+    assert pack_content("a" * 100, None, 10, RELEVANCE_SECTION_PRIORITIES) == "a" * 40
+    assert pack_content("a" * 100, None, 0, RELEVANCE_SECTION_PRIORITIES) == "a" * 100
+
+def test_IdentifyOriginalDataStep_packs_content(fake_llm, estimated_tokens, monkeypatch):
+    monkeypatch.setenv("IDENTIFY_ORIGINAL_CONTENT_TOKENS", "200")
+    step = IdentifyOriginalDataStep(fake_llm)
+    assert step.content_token_budget == 200
+    state = {
+        "pmid": "1",
+        "title": "title",
+        "content": "\n".join(s["section"] + "\n" + s["content"] for s in SECTIONS),
+        "sections": SECTIONS,
+        "step_output_callback": None,
+    }
+    _, system_prompt, _ = step._prepare_agent(state)
+    assert system_prompt.count("GSE184950") == 1
+    assert "SOX6+ neurons" not in system_prompt
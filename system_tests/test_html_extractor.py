@@ -0,0 +1,75 @@
+
+import json
+import pytest
+from bs4 import BeautifulSoup
+
+from src.paper_query import html_extractor
+from src.paper_query.html_extractor import HtmlTableExtractor, HtmlTableParser, PMCHtmlTableParser
+
+SAMPLE_FILES = [
+    "system_tests/data/sample_pmc_article.html",
+    "system_tests/data/sample_publisher_article.html",
+]
+
+def _read_sample(fn: str) -> str:
+    with open(fn, "r") as f:
+        return f.read()
+
+@pytest.mark.parametrize("fn", SAMPLE_FILES)
+def test_extract_all_matches_separate_extractors(fn):
+    html = _read_sample(fn)
+    extractor = HtmlTableExtractor()
+    parsed = extractor.extract_all(html)
+    assert parsed["sections"] == extractor.extract_sections(html)
+    assert parsed["data_availability"] == extractor.extract_data_availability(html)
+    assert parsed["methods"] == extractor.extract_methods(html)
+
+def test_extract_all_parses_once(monkeypatch):
+    html = _read_sample(SAMPLE_FILES[0])
+    parses = []
+
+    def counting_soup(*args, **kwargs):
+        parses.append(args[1] if len(args) > 1 else None)
+        return BeautifulSoup(*args, **kwargs)
+
+    monkeypatch.setattr(html_extractor, "BeautifulSoup", counting_soup)
+    parsed = HtmlTableExtractor().extract_all(html)
+    assert parses == ["html.parser"]
+    assert "GSE184950" in parsed["data_availability"]
+    assert "10x Genomics" in parsed["methods"]
+    assert parsed["sections"][0]["section"] == "Abstract"
+
+def test_extract_sections_falls_back_to_generic_parser():
+    html = _read_sample(SAMPLE_FILES[1])
+    # no h2/h3 "Abstract" heading, it isn't a PMC article
+    assert PMCHtmlTableParser().extract_sections(html) is None
+    sections = HtmlTableExtractor().extract_sections(html)
+    assert sections == HtmlTableParser().extract_sections(html)
+    assert sections[0]["section"] == "Introduction"
+
+def test_pmc_extract_tables():
+    html = _read_sample(SAMPLE_FILES[0])
+    tables = HtmlTableExtractor().extract_tables(html)
+    assert len(tables) == 1
+    assert tables[0]["caption"] == "Table 1. Donor characteristics"
+    assert "Braak stage" in tables[0]["footnote"]
+    assert tables[0]["table"] is not None
+
+def test_generic_extract_sections_matches_previous_output():
+    # sections produced by the find_all_next based implementation
+    with open("system_tests/data/sample_sections_expected.json", "r") as f:
+        expected = json.load(f)
+    for fn, sections in expected.items():
+        html = _read_sample(f"system_tests/data/{fn}")
+        assert HtmlTableParser().extract_sections(html) == sections
+
+def test_generic_find_first_occurrence():
+    parser = HtmlTableParser()
+    soup = BeautifulSoup(
+        "<div><span>Abstract</span><div class='x'><!-- abstract -->text</div>"
+        "<p>The <b>abstract</b></p><section>Abstract here</section></div>",
+        "html.parser",
+    )
+    # comments are direct strings as well, text inside child tags is not
+    assert parser._find_first_occurrence(soup, ["abstract"]).get("class") == ["x"]
+    assert parser._find_first_occurrence(soup, ["missing"]) is None
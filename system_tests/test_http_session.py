@@ -0,0 +1,64 @@
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.paper_query.http_session import aclose_async_client, ahttp_get, get_session, http_get
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.client_ports.add(self.client_address[1])
+        body = self.headers.get("cookie", "").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Set-Cookie", "session=1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    server.client_ports = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_session_reuses_connection(server):
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    for _ in range(3):
+        res = http_get(url, cookies={"a": "b"})
+        assert res.status_code == 200
+        # the cookie set by the previous response isn't sent again
+        assert res.text == "a=b"
+    assert len(server.client_ports) == 1
+    assert get_session() is get_session()
+
+def test_session_is_per_thread():
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(get_session()))
+    thread.start()
+    thread.join()
+    assert sessions[0] is not get_session()
+
+def test_async_client_reuses_connection(server):
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    async def get_many():
+        try:
+            return [await ahttp_get(url) for _ in range(3)]
+        finally:
+            await aclose_async_client()
+
+    responses = asyncio.run(get_many())
+    assert [res.status_code for res in responses] == [200] * 3
+    assert [res.text for res in responses] == [""] * 3
+    assert len(server.client_ports) == 1
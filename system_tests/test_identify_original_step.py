@@ -1,8 +1,10 @@
 
+import asyncio
 import pytest
 import logging
 from src.agents.identify_relevant_step import IdentifyRelevanceStep
-from src.agents.identify_original_step import IdentifyOriginalDataStep
+from src.agents.identify_original_step import IdentifyOriginalDataStep, hash_instructions
+from src.database.original_verdict_db import OriginalVerdictDB
 from src.agents.agent_utils import IdentifyState, ResearchGoalEnum
 from src.paper_query.pubmed_query import query_title_abstract_ispreprint
 from src.workflow.workflow_utils import obtain_full_text
@@ -112,4 +114,36 @@ def test_IdentifyOriginalDataStep_on_40429980(llm, step_callback):
     # Check if the result contains the expected keys
     assert "original" in result_state
     assert isinstance(result_state["original"], bool)  # Should be a boolean value indicating original data availability
-    logger.info(f"PMID: {pmid}, Original Data Available: {result_state['original']}")
\ No newline at end of file
+    logger.info(f"PMID: {pmid}, Original Data Available: {result_state['original']}")
+
+def test_hash_instructions_normalizes_format():
+    assert hash_instructions("Include **GEO** accessions,\n  “GSE” IDs") == hash_instructions("include GEO accessions, \"GSE\" ids")
+    assert hash_instructions("Include GEO accessions") != hash_instructions("Include Synapse IDs")
+    assert hash_instructions(None) == hash_instructions("N/A")
+
+def test_IdentifyOriginalDataStep_reuses_verdict(fake_llm, data_folder):
+    step = IdentifyOriginalDataStep(fake_llm, verdict_db=OriginalVerdictDB())
+
+    def build_state(pmid: str, instructions: str, content: str = "Data are available in GEO (GSE123456).") -> dict:
+        return {
+            "pmid": pmid,
+            "research_goal": "Alzheimer_SingleCell",
+            "original_research_goal": "**single-cell RNA sequencing**",
+            "title": "title",
+            "content": content,
+            "identify_original_instructions": instructions,
+            "step_output_callback": None,
+        }
+
+    assert step.execute(build_state("1", "Include GSE IDs"))["original"] is True
+    assert fake_llm.calls == 1
+    # the same inputs reuse the verdict, trivial formatting differences of the instructions are ignored
+    fake_llm.answer = {**fake_llm.answer, "original_and_accessible": False}
+    assert step.execute(build_state("1", "include  GSE IDs"))["original"] is True
+    assert asyncio.run(step.aexecute(build_state("1", "Include GSE IDs")))["original"] is True
+    assert fake_llm.calls == 1
+    # other papers, instructions or content (e.g. of a new extractor version) ask the llm
+    assert step.execute(build_state("2", "Include GSE IDs"))["original"] is False
+    assert step.execute(build_state("1", "Include Synapse IDs"))["original"] is False
+    assert step.execute(build_state("1", "Include GSE IDs", "Data are available in GEO (GSE654321)."))["original"] is False
+    assert fake_llm.calls == 4
@@ -1,7 +1,11 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 import pytest
 
 from src.agents.agent_utils import ResearchGoalEnum
-from src.workflow.identify_workflow import IdentifyWorkflow, identify_workflow
+from src.agents.identify_original_step import IdentifyOriginalDataStep
+from src.config_utils import read_config_identify_original_instructions, read_config_identify_relevant_instructions
+from src.workflow.identify_workflow import IdentifyWorkflow, PaperUnavailableError, aidentify_workflow, identify_workflow
 
 @pytest.mark.skip()
 def test_IdentifyWorkflow_sc_alzheimer(
@@ -82,4 +86,212 @@ def test_IdentifyWorkflow_sc_parkinson(
         
     # Check if the result is a boolean indicating relevance
     assert isinstance(result, bool)
-    step_callback(step_output=f"{pmid} is {'relevant' if result else 'NOT relevant'}")
\ No newline at end of file
+    step_callback(step_output=f"{pmid} is {'relevant' if result else 'NOT relevant'}")
+
+def _prepare_offline_workflow(fake_llm, monkeypatch, **kwargs) -> IdentifyWorkflow:
+    workflow = IdentifyWorkflow(llm=fake_llm, two_steps_agent=True, **kwargs)
+    workflow.compile()
+
+    async def aquery_title_abstract_ispreprint(pmid):
+        return "title", "abstract", False
+
+    async def aquery_full_text(pmid):
+        return True, "<html></html>"
+
+    monkeypatch.setattr(workflow.paper_retriever, "aquery_title_abstract_ispreprint", aquery_title_abstract_ispreprint)
+    monkeypatch.setattr(workflow.paper_retriever, "aquery_full_text", aquery_full_text)
+    monkeypatch.setattr(
+        "src.workflow.identify_workflow.extract_plaintext_and_sections",
+        lambda html: (
+            "Abstract\nsnRNA-seq data are available in GEO (GSE123456).",
+            [{"section": "Abstract", "content": "snRNA-seq data are available in GEO (GSE123456)."}],
+        ),
+    )
+    return workflow
+
+def test_IdentifyWorkflow_aidentify_offline(fake_llm, data_folder, monkeypatch):
+    workflow = _prepare_offline_workflow(fake_llm, monkeypatch)
+
+    result = asyncio.run(aidentify_workflow(
+        wf=workflow,
+        pmid="1",
+        research_goal="Alzheimer_SingleCell",
+    ))
+    assert result
+    # two steps (original data and relevance), each of them with CoT + final answer
+    assert fake_llm.calls == 4
+
+def test_IdentifyWorkflow_aidentify_stops_on_non_original(fake_llm, data_folder, monkeypatch):
+    fake_llm.answer = {**fake_llm.answer, "original_and_accessible": False}
+    workflow = _prepare_offline_workflow(fake_llm, monkeypatch)
+
+    result = asyncio.run(workflow.aidentify(pmid="1", research_goal="Alzheimer_SingleCell"))
+    assert not result
+    assert fake_llm.calls == 2
+
+def test_IdentifyWorkflow_abstract_prefilter_rejects(fake_llm, data_folder, monkeypatch):
+    fake_llm.answer = {**fake_llm.answer, "relevant": False, "confidence": 0.9}
+    workflow = _prepare_offline_workflow(fake_llm, monkeypatch, abstract_prefilter=True)
+
+    async def aquery_full_text(pmid):
+        pytest.fail("full text should not be retrieved")
+
+    monkeypatch.setattr(workflow.paper_retriever, "aquery_full_text", aquery_full_text)
+    result = asyncio.run(workflow.aidentify(pmid="1", research_goal="Alzheimer_SingleCell"))
+    assert not result
+    # only the prefilter ran
+    assert fake_llm.calls == 1
+
+def test_IdentifyWorkflow_abstract_prefilter_passes_uncertain(fake_llm, data_folder, monkeypatch):
+    # "not relevant" below the threshold doesn't reject the paper, the full text is still screened
+    fake_llm.answer = {**fake_llm.answer, "relevant": False, "confidence": 0.5}
+    workflow = _prepare_offline_workflow(fake_llm, monkeypatch, abstract_prefilter=True)
+
+    asyncio.run(workflow.aidentify(pmid="1", research_goal="Alzheimer_SingleCell"))
+    assert fake_llm.calls == 5
+
+def test_IdentifyWorkflow_lexical_prefilter(fake_llm, data_folder, monkeypatch):
+    workflow = _prepare_offline_workflow(fake_llm, monkeypatch, lexical_prefilter=True)
+
+    # the GEO accession in the full text passes the prefilter
+    result = asyncio.run(workflow.aidentify(pmid="1", research_goal="Alzheimer_SingleCell"))
+    assert result
+    assert fake_llm.calls == 4
+
+    monkeypatch.setattr(
+        "src.workflow.identify_workflow.extract_plaintext_and_sections",
+        lambda html: ("Abstract\nWe reanalyzed published data.", None),
+    )
+    result = asyncio.run(workflow.aidentify(pmid="2", research_goal="Alzheimer_SingleCell"))
+    assert not result
+    # no llm call for a paper without accessions, links or keywords
+    assert fake_llm.calls == 4
+
+def test_IdentifyWorkflow_reuses_original_verdicts(fake_llm, data_folder, monkeypatch):
+    workflow = _prepare_offline_workflow(fake_llm, monkeypatch, reuse_original_verdicts=True)
+    prompts = []
+    original_prompt = IdentifyOriginalDataStep._prepare_agent
+
+    def prepare_agent(step, typed_state):
+        agent, system_prompt, verdict_key = original_prompt(step, typed_state)
+        prompts.append(system_prompt)
+        return agent, system_prompt, verdict_key
+
+    monkeypatch.setattr(IdentifyOriginalDataStep, "_prepare_agent", prepare_agent)
+
+    def identify(scope: str) -> bool:
+        return asyncio.run(workflow.aidentify(
+            pmid="1",
+            research_goal=scope,
+            identify_original_instructions=read_config_identify_original_instructions(scope),
+            identify_relevant_instructions=read_config_identify_relevant_instructions(scope),
+        ))
+
+    for scope in ["Alzheimer_SingleCell", "Parkinson_SingleCell", "Huntingtons_SingleCell"]:
+        assert identify(scope)
+    # the original data step runs once (CoT + final answer), the relevance step per scope
+    assert fake_llm.calls == 2 + 3 * 2
+    # the scope independent prompt leaves the targeted disease to the relevance step
+    assert "targeted disease" not in prompts[0]
+    assert "Alzheimer" not in prompts[0] and "single-cell RNA sequencing" in prompts[0]
+    state = workflow._build_state(
+        pmid="1",
+        research_goal="Parkinson_SingleCell",
+        title="title",
+        abstract="abstract",
+        identify_original_instructions=read_config_identify_original_instructions("Parkinson_SingleCell"),
+        identify_relevant_instructions=read_config_identify_relevant_instructions("Parkinson_SingleCell"),
+    )
+    assert "targeted disease: Parkinson is the focus" in state["identify_relevant_instructions"]
+
+    # a scope with another data modality has its own verdict
+    assert identify("Alzheimer_Spatial")
+    assert fake_llm.calls == 2 + 4 * 2 + 2
+
+def test_IdentifyWorkflow_raises_if_paper_unavailable(fake_llm, data_folder, monkeypatch):
+    workflow = _prepare_offline_workflow(fake_llm, monkeypatch)
+
+    async def aquery_full_text(pmid):
+        return False, "Service Unavailable"
+
+    monkeypatch.setattr(workflow.paper_retriever, "aquery_full_text", aquery_full_text)
+    # a failed fetch isn't a negative result, the run state records it as failed
+    with pytest.raises(PaperUnavailableError):
+        asyncio.run(workflow.aidentify(pmid="1", research_goal="Alzheimer_SingleCell", raise_if_unavailable=True))
+    assert not asyncio.run(workflow.aidentify(pmid="1", research_goal="Alzheimer_SingleCell"))
+
+    async def aquery_title_abstract_ispreprint(pmid):
+        return None, None, False
+
+    monkeypatch.setattr(workflow.paper_retriever, "aquery_title_abstract_ispreprint", aquery_title_abstract_ispreprint)
+    with pytest.raises(PaperUnavailableError):
+        asyncio.run(workflow.aidentify(pmid="1", research_goal="Alzheimer_SingleCell", raise_if_unavailable=True))
+    assert not asyncio.run(workflow.aidentify(pmid="1", research_goal="Alzheimer_SingleCell"))
+    assert fake_llm.calls == 0
+
+def test_IdentifyWorkflow_reuses_cached_plaintext(fake_llm, data_folder, monkeypatch):
+    workflow = IdentifyWorkflow(llm=fake_llm, two_steps_agent=True)
+    html = (
+        "<html><body><section><h2>Abstract</h2><p>single-cell RNA sequencing</p></section>"
+        "<section><h2>Data Availability</h2><p>Data are available in GEO (GSE123456).</p></section>"
+        "</body></html>"
+    )
+    fetches = []
+
+    def query_full_text(pmid):
+        fetches.append(pmid)
+        return True, html
+
+    monkeypatch.setattr(workflow.paper_retriever, "query_full_text", query_full_text)
+    full_text, sections = workflow._query_plaintext("1")
+    assert "GSE123456" in full_text
+    assert sections[0]["section"] == "Abstract"
+    # the second call is served from the plaintext cache, html is neither fetched nor parsed
+    monkeypatch.setattr(
+        "src.workflow.identify_workflow.extract_plaintext_and_sections",
+        lambda html: pytest.fail("html should not be parsed again"),
+    )
+    assert workflow._query_plaintext("1") == (full_text, sections)
+    assert asyncio.run(workflow._aquery_plaintext("1")) == (full_text, sections)
+    assert fetches == ["1"]
+
+def test_IdentifyWorkflow_fetches_paper_once_for_concurrent_scopes(fake_llm, data_folder, monkeypatch):
+    workflow = IdentifyWorkflow(llm=fake_llm, two_steps_agent=True)
+    fetches = []
+
+    async def aquery_full_text(pmid):
+        fetches.append(pmid)
+        await asyncio.sleep(0.05)
+        return True, "<html></html>"
+
+    monkeypatch.setattr(workflow.paper_retriever, "aquery_full_text", aquery_full_text)
+    monkeypatch.setattr(
+        "src.workflow.identify_workflow.extract_plaintext_and_sections",
+        lambda html: ("Abstract\ntext", [{"section": "Abstract", "content": "text"}]),
+    )
+
+    async def query_scopes():
+        return await asyncio.gather(*[workflow._aquery_plaintext("1") for _ in range(3)])
+
+    assert asyncio.run(query_scopes()) == [("Abstract\ntext", [{"section": "Abstract", "content": "text"}])] * 3
+    assert fetches == ["1"]
+    assert workflow._aplaintext_locks == {}
+
+def test_IdentifyWorkflow_converts_html_in_process_pool(fake_llm, data_folder, monkeypatch):
+    with open("system_tests/data/sample_pmc_article.html", "r") as f:
+        html = f.read()
+    inline = IdentifyWorkflow(llm=fake_llm)
+    monkeypatch.setattr(inline.paper_retriever, "query_full_text", lambda pmid: (True, html))
+    expected = inline._query_plaintext("1")
+    assert "GSE184950" in expected[0]
+
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        workflow = IdentifyWorkflow(llm=fake_llm, html_executor=executor)
+
+        async def aquery_full_text(pmid):
+            return True, html
+
+        monkeypatch.setattr(workflow.paper_retriever, "query_full_text", lambda pmid: (True, html))
+        monkeypatch.setattr(workflow.paper_retriever, "aquery_full_text", aquery_full_text)
+        assert workflow._query_plaintext("2") == expected
+        assert asyncio.run(workflow._aquery_plaintext("3")) == expected
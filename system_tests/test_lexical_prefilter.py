@@ -0,0 +1,79 @@
+
+from src.agents.lexical_prefilter import (
+    EVIDENCE_ACCESSION,
+    EVIDENCE_KEYWORD,
+    EVIDENCE_LINK,
+    EVIDENCE_REQUEST_ONLY,
+    extract_instruction_keywords,
+    find_lexical_evidence,
+    format_lexical_evidence,
+    has_data_signal,
+)
+from src.agents.lexical_prefilter_step import LexicalPrefilterStep
+
+INSTRUCTIONS = """
+1. Flag studies that mention any of the following keywords:
+    * snRNA-seq
+    * Library preparation / Library was prepared
+    * 10X Genomics
+  Include papers that provide any of the following:
+    * A **GEO accession number** (e.g., GSE ID)
+    * Alzheimer's disease (AD) patient tissue, or
+"""
+
+def test_extract_instruction_keywords():
+    assert extract_instruction_keywords(INSTRUCTIONS) == (
+        "snRNA-seq", "Library preparation", "Library was prepared", "10X Genomics",
+    )
+    assert extract_instruction_keywords(None) == ()
+    assert extract_instruction_keywords("N/A") == ()
+
+def test_find_lexical_evidence():
+    text = (
+        "Nuclei were profiled by snRNA seq with 10x Genomics Chromium. "
+        "Data are deposited in GEO (GSE123456) and Synapse (syn2580853), "
+        "code at https://github.com/example/repo. GSE123456 also has raw data. "
+        "Clinical data are available from the corresponding author upon reasonable request."
+    )
+    evidence = find_lexical_evidence(text, INSTRUCTIONS)
+    matches = [(item["kind"], item["match"]) for item in evidence]
+    assert matches == [
+        (EVIDENCE_ACCESSION, "GSE123456"),
+        (EVIDENCE_ACCESSION, "syn2580853"),
+        (EVIDENCE_LINK, "https://github.com/example/repo"),
+        (EVIDENCE_KEYWORD, "snRNA seq"),
+        (EVIDENCE_KEYWORD, "10x Genomics"),
+        (EVIDENCE_REQUEST_ONLY, "available from the corresponding author upon reasonable request"),
+    ]
+    assert "GEO (GSE123456)" in evidence[0]["context"]
+    assert has_data_signal(evidence)
+    assert "**GSE123456**" in format_lexical_evidence(evidence)
+
+def test_find_lexical_evidence_without_data_signal():
+    text = "We reanalyzed published microarray data. Data are available upon request."
+    evidence = find_lexical_evidence(text, INSTRUCTIONS)
+    assert [item["kind"] for item in evidence] == [EVIDENCE_REQUEST_ONLY]
+    assert not has_data_signal(evidence)
+    assert find_lexical_evidence("", INSTRUCTIONS) == []
+    # keywords are matched as whole words
+    assert find_lexical_evidence("We used asnRNA-seqx.", INSTRUCTIONS) == []
+
+def test_LexicalPrefilterStep():
+    step = LexicalPrefilterStep()
+    state = step.execute({
+        "pmid": "1",
+        "content": "We reanalyzed published microarray data.",
+        "identify_original_instructions": INSTRUCTIONS,
+        "step_output_callback": None,
+    })
+    assert state["original"] is False
+    assert state["lexical_evidence"] == []
+
+    state = step.execute({
+        "pmid": "1",
+        "content": "Libraries were sequenced (snRNA-seq).",
+        "identify_original_instructions": INSTRUCTIONS,
+        "step_output_callback": None,
+    })
+    assert "original" not in state
+    assert state["lexical_evidence"][0]["match"] == "snRNA-seq"
@@ -0,0 +1,76 @@
+
+import asyncio
+import time
+import pytest
+
+from src.agents.identify_original_step import IdentifyOriginalDataStep
+from src.agents.llm_cache import set_llm_cache
+from src.database.llm_cache_db import LLMCacheDB
+
+@pytest.fixture
+def llm_cache(data_folder):
+    cache = LLMCacheDB()
+    set_llm_cache(cache)
+    yield cache
+    set_llm_cache(None)
+
+def _original_state(content: str) -> dict:
+    return {
+        "pmid": "1",
+        "research_goal": "Alzheimer_SingleCell",
+        "title": "title",
+        "content": content,
+        "step_output_callback": None,
+    }
+
+def test_LLMCacheDB_select_insert(data_folder):
+    cache = LLMCacheDB()
+    assert cache.select("key") is None
+    assert cache.insert("key", {"result": {"relevant": True}, "reasoning_process": None})
+    assert cache.select("key") == {"result": {"relevant": True}, "reasoning_process": None}
+
+def test_LLMCacheDB_expires_entries(data_folder):
+    cache = LLMCacheDB(ttl_days=1.0)
+    cache.insert("key", {"result": 1})
+    connection = cache._connect_db()
+    with connection:
+        connection.execute("UPDATE llm_cache SET created_at = ?;", (time.time() - 2 * 24 * 3600,))
+    assert cache.select("key") is None
+    assert connection.execute("SELECT COUNT(*) FROM llm_cache;").fetchone()[0] == 0
+
+def test_LLMCacheDB_evicts_least_recently_used(data_folder):
+    cache = LLMCacheDB(max_mb=0.0)
+    for ix in range(3):
+        cache.insert(f"key{ix}", {"result": "x" * 100})
+    size = cache._connect_db().execute("SELECT size FROM llm_cache WHERE cache_key = 'key0';").fetchone()[0]
+    cache.max_bytes = 2 * size
+    connection = cache._connect_db()
+    with connection:
+        for ix, accessed_at in enumerate([3.0, 1.0, 2.0]):
+            connection.execute("UPDATE llm_cache SET accessed_at = ? WHERE cache_key = ?;", (accessed_at, f"key{ix}"))
+    assert cache.evict()
+    keys = [row[0] for row in connection.execute("SELECT cache_key FROM llm_cache ORDER BY cache_key;")]
+    assert keys == ["key0", "key2"]
+
+@pytest.mark.parametrize("two_steps_agent, calls", [(False, 1), (True, 2)])
+def test_cached_agent_skips_llm(fake_llm, llm_cache, two_steps_agent, calls):
+    step = IdentifyOriginalDataStep(fake_llm, two_steps_agent=two_steps_agent)
+    state = step.execute(_original_state("GSE123456"))
+    assert state["original"] is True
+    assert fake_llm.calls == calls
+
+    # the same prompt is answered from the cache, also by the async agent
+    fake_llm.answer = {**fake_llm.answer, "original_and_accessible": False}
+    assert step.execute(_original_state("GSE123456"))["original"] is True
+    assert asyncio.run(step.aexecute(_original_state("GSE123456")))["original"] is True
+    assert fake_llm.calls == calls
+
+    # a different prompt calls the llm
+    assert step.execute(_original_state("GSE654321"))["original"] is False
+    assert fake_llm.calls == 2 * calls
+
+def test_agent_without_cache(fake_llm, data_folder):
+    step = IdentifyOriginalDataStep(fake_llm)
+    step.execute(_original_state("GSE123456"))
+    step.execute(_original_state("GSE123456"))
+    assert fake_llm.calls == 2
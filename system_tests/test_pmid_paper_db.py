@@ -0,0 +1,153 @@
+
+import os
+import sqlite3
+import threading
+import zlib
+import pytest
+
+from src.database.codec_utils import ZLIB_MARKER, compress_text, decompress_text, is_compressed
+from src.database.db_utils import get_database_folder
+from src.database.pmid_paper_db import PMIDPaperDB
+
+def test_PMIDPaperDB_insert_and_select(data_folder):
+    db = PMIDPaperDB()
+    assert db.select_paper_html_content("1") is None
+    assert db.select_paper_title_abstract("1") == (None, None, False)
+
+    assert db.insert_paper_title_abstract("1", "title", "abstract", True)
+    assert db.insert_paper_html_content("1", "<html>1</html>")
+    assert db.select_paper_title_abstract("1") == ("title", "abstract", True)
+    assert db.select_paper_html_content("1") == "<html>1</html>"
+
+def test_PMIDPaperDB_reuses_wal_connection(data_folder):
+    db = PMIDPaperDB()
+    connection = db._connect_db()
+    assert connection is not None
+    assert connection.execute("PRAGMA journal_mode;").fetchone()[0] == "wal"
+    db.insert_paper_html_content("1", "<html>1</html>")
+    db.select_paper_html_content("1")
+    assert db._connect_db() is connection
+    # another instance in the same thread shares the connection as well
+    assert PMIDPaperDB()._connect_db() is connection
+
+def test_PMIDPaperDB_concurrent_workers(data_folder):
+    db = PMIDPaperDB()
+    connections = set()
+    errors = []
+
+    def worker(ix: int):
+        try:
+            for jx in range(20):
+                pmid = f"{ix}-{jx}"
+                assert db.insert_paper_html_content(pmid, f"<html>{pmid}</html>")
+                assert db.select_paper_html_content(pmid) == f"<html>{pmid}</html>"
+            connections.add(id(db._connect_db()))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(ix,)) for ix in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(connections) == 8
+    assert db.select_paper_html_content("7-19") == "<html>7-19</html>"
+
+def test_PMIDPaperDB_upsert_many_and_select_many(data_folder, monkeypatch):
+    monkeypatch.setattr("src.database.pmid_paper_db.SELECT_MANY_CHUNK_SIZE", 7)
+    db = PMIDPaperDB()
+    rows = [
+        {"pmid": str(ix), "title": f"title {ix}", "abstract": f"abstract {ix}", "is_preprint": ix % 2 == 0}
+        for ix in range(20)
+    ]
+    assert db.upsert_many(rows)
+    # a row with another column set doesn't overwrite title and abstract
+    assert db.upsert_many([{"pmid": "3", "html_content": "<html>3</html>"}])
+
+    papers = db.select_many([str(ix) for ix in range(25)])
+    assert len(papers) == 20
+    assert papers["3"] == {
+        "html_content": "<html>3</html>",
+        "title": "title 3",
+        "abstract": "abstract 3",
+        "is_preprint": False,
+    }
+    assert db.select_many(["4"], columns=["title", "is_preprint"]) == {
+        "4": {"title": "title 4", "is_preprint": True},
+    }
+
+def test_PMIDPaperDB_rejects_unknown_columns(data_folder):
+    db = PMIDPaperDB()
+    with pytest.raises(ValueError):
+        db.upsert_many([{"pmid": "1", "title; DROP TABLE pmid_paper": "x"}])
+    with pytest.raises(ValueError):
+        db.select_many(["1"], columns=["datetime"])
+
+def test_PMIDPaperDB_compresses_html_content(data_folder):
+    db = PMIDPaperDB()
+    html = "<html><body>" + "<p>single-cell RNA sequencing</p>" * 1000 + "</body></html>"
+    assert db.insert_paper_html_content("1", html)
+    stored = db._connect_db().execute("SELECT html_content FROM pmid_paper WHERE pmid = '1'").fetchone()[0]
+    assert isinstance(stored, bytes)
+    assert is_compressed(stored)
+    assert len(stored) * 5 < len(html)
+    assert db.select_paper_html_content("1") == html
+    assert db.select_many(["1"], columns=["html_content"])["1"]["html_content"] == html
+
+def test_PMIDPaperDB_migrates_plain_html_content(data_folder):
+    db = PMIDPaperDB()
+    connection = db._connect_db()
+    with connection:
+        # a row written before compression was introduced
+        connection.execute("INSERT INTO pmid_paper (pmid, html_content) VALUES ('1', '<html>legacy</html>')")
+    assert db.select_paper_html_content("1") == "<html>legacy</html>"
+    stored = connection.execute("SELECT html_content FROM pmid_paper WHERE pmid = '1'").fetchone()[0]
+    assert is_compressed(stored)
+    assert db.select_paper_html_content("1") == "<html>legacy</html>"
+
+def test_PMIDPaperDB_plaintext_cache(data_folder):
+    db = PMIDPaperDB()
+    assert db.select_paper_plaintext("1", "1") == (None, None)
+    sections = [{"section": "Methods", "content": "snRNA-seq"}]
+    assert db.insert_paper_plaintext("1", "1", "Methods\nsnRNA-seq", sections)
+    assert db.select_paper_plaintext("1", "1") == ("Methods\nsnRNA-seq", sections)
+    # plaintext produced by another extractor version is not returned
+    assert db.select_paper_plaintext("1", "2") == (None, None)
+    assert db.insert_paper_plaintext("1", "1", "Methods\nsnRNA-seq v2")
+    assert db.select_paper_plaintext("1", "1") == ("Methods\nsnRNA-seq v2", None)
+
+def test_codec_round_trip():
+    text = "Données disponibles: GSE123456 {braces}"
+    assert decompress_text(compress_text(text)) == text
+    assert decompress_text(ZLIB_MARKER + zlib.compress(text.encode("utf-8"))) == text
+    assert decompress_text(text) == text
+    assert decompress_text(None) is None
+
+def test_PMIDPaperDB_adds_article_id_columns(data_folder):
+    # a database created before the article id columns were introduced
+    os.makedirs(get_database_folder(), exist_ok=True)
+    connection = sqlite3.connect(os.path.join(get_database_folder(), "pmid_paper.db"))
+    with connection:
+        connection.execute("""
+CREATE TABLE pmid_paper (
+    pmid TEXT PRIMARY KEY,
+    html_content TEXT DEFAULT NULL,
+    title TEXT DEFAULT NULL,
+    abstract TEXT DEFAULT NULL,
+    is_preprint BOOLEAN DEFAULT FALSE,
+    datetime TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now')),
+    UNIQUE(pmid)
+);
+""")
+        connection.execute("INSERT INTO pmid_paper (pmid, title) VALUES ('1', 'title')")
+    connection.close()
+
+    db = PMIDPaperDB()
+    assert db.select_many(["1"], columns=["title", "pmcid", "ids_resolved"]) == {
+        "1": {"title": "title", "pmcid": None, "ids_resolved": False},
+    }
+    assert db.upsert_many([{"pmid": "1", "pmcid": "PMC1", "doi": "10.1/1", "ids_resolved": True}])
+    assert db.select_many(["1"], columns=["title", "pmcid", "doi", "ids_resolved"]) == {
+        "1": {"title": "title", "pmcid": "PMC1", "doi": "10.1/1", "ids_resolved": True},
+    }
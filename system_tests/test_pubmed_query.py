@@ -1,10 +1,20 @@
 
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from urllib.parse import parse_qs, urlparse
 import pytest
 import logging
+from src.paper_query.article_retriever import ArticleIds, ArticleRetriever
 from src.paper_query.pubmed_query import (
+    ESEARCH_URL,
+    PubMedPaperRetriever,
     query_count, 
+    query_history,
+    query_history_pmids,
     query_pmids, 
     query_title_abstract_ispreprint, 
+    query_titles_abstracts_ispreprints,
     query_full_text,
 )
 from src.paper_query.html_extractor import HtmlTableExtractor
@@ -150,4 +160,233 @@ def test_html_extractor_for_methods():
         methods = extractor.extract_methods(html_content)
         assert methods is not None and len(methods) > 0
         
-    
\ No newline at end of file
+    
+EFETCH_XML = b"""<?xml version="1.0" ?>
+<PubmedArticleSet>
+<PubmedArticle><MedlineCitation><PMID Version="1">111</PMID><Article>
+<ArticleTitle>First title</ArticleTitle><Abstract><AbstractText>First abstract</AbstractText></Abstract>
+<PublicationTypeList><PublicationType>Journal Article</PublicationType></PublicationTypeList>
+</Article></MedlineCitation></PubmedArticle>
+<PubmedArticle><MedlineCitation><PMID Version="1">222</PMID><Article>
+<ArticleTitle>Second title</ArticleTitle><Abstract><AbstractText>Second abstract</AbstractText></Abstract>
+<PublicationTypeList><PublicationType>Preprint</PublicationType></PublicationTypeList>
+</Article></MedlineCitation></PubmedArticle>
+</PubmedArticleSet>
+"""
+
+class _FakeResponse:
+    def __init__(self, content: bytes):
+        self.content = content
+
+def test_query_titles_abstracts_ispreprints_in_one_request(monkeypatch):
+    posted = []
+    def fake_safe_post(url, data):
+        posted.append(data)
+        return _FakeResponse(EFETCH_XML)
+    monkeypatch.setattr("src.paper_query.pubmed_query.safe_post", fake_safe_post)
+
+    papers = query_titles_abstracts_ispreprints(["111", "222", "333"])
+    assert len(posted) == 1
+    assert posted[0]["id"] == "111,222,333"
+    assert papers == {
+        "111": ("First title", "First abstract", False),
+        "222": ("Second title", "Second abstract", True),
+    }
+
+def test_prefetch_title_abstracts(monkeypatch, data_folder):
+    posted = []
+    def fake_safe_post(url, data):
+        posted.append(data["id"])
+        return _FakeResponse(EFETCH_XML)
+    monkeypatch.setattr("src.paper_query.pubmed_query.safe_post", fake_safe_post)
+
+    retriever = PubMedPaperRetriever()
+    fetched = retriever.prefetch_title_abstracts(["111", "222", "333"], batch_size=2)
+    assert posted == ["111,222", "333"]
+    assert fetched == 4  # the canned response holds both papers for each batch
+    assert retriever.db.select_paper_title_abstract("222") == ("Second title", "Second abstract", True)
+
+    # cached papers are not fetched again
+    posted.clear()
+    retriever.prefetch_title_abstracts(["111", "222"])
+    assert posted == []
+
+class _FakeJsonResponse:
+    def __init__(self, data: dict | None = None, text: str = ""):
+        self.data = data
+        self.text = text
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        pass
+
+def test_query_pmids_with_history(monkeypatch):
+    requests = []
+    def fake_safe_get(url, params):
+        requests.append((url, params))
+        if url == ESEARCH_URL:
+            assert params["usehistory"] == "y"
+            return _FakeJsonResponse({"esearchresult": {"count": "5", "webenv": "WEBENV_1", "querykey": "1"}})
+        assert params["WebEnv"] == "WEBENV_1" and params["query_key"] == "1"
+        start = params["retstart"]
+        ids = [str(100 + i) for i in range(start, min(start + params["retmax"], 5))]
+        return _FakeJsonResponse(text="\n".join(ids) + "\n")
+    monkeypatch.setattr("src.paper_query.pubmed_query.safe_get", fake_safe_get)
+
+    count, webenv, query_key = query_history("Alzheimer")
+    assert (count, webenv, query_key) == (5, "WEBENV_1", "1")
+    pmids = list(query_history_pmids(webenv, query_key, count, step_count=2))
+    assert pmids == ["100", "101", "102", "103", "104"]
+    # one search and three pages
+    assert len(requests) == 4
+
+def test_query_pmids_with_history_falls_back(monkeypatch):
+    def fake_safe_get(url, params):
+        if params.get("usehistory") == "y":
+            return _FakeJsonResponse({"error": "history unavailable"})
+        if params["retmax"] == 0:
+            return _FakeJsonResponse({"esearchresult": {"count": "2"}})
+        return _FakeJsonResponse({"esearchresult": {"idlist": ["1", "2"]}})
+    monkeypatch.setattr("src.paper_query.pubmed_query.safe_get", fake_safe_get)
+
+    pmids, webenv, query_key = PubMedPaperRetriever().query_pmids_with_history("Alzheimer")
+    assert pmids == ["1", "2"]
+    assert webenv is None and query_key is None
+
+def test_prefetch_title_abstracts_from_history(monkeypatch, data_folder):
+    posted = []
+    def fake_safe_post(url, data):
+        posted.append(data)
+        return _FakeResponse(EFETCH_XML)
+    monkeypatch.setattr("src.paper_query.pubmed_query.safe_post", fake_safe_post)
+
+    retriever = PubMedPaperRetriever()
+    retriever.prefetch_title_abstracts(["111", "222"], webenv="WEBENV_1", query_key="1")
+    assert len(posted) == 1
+    assert "id" not in posted[0]
+    assert posted[0]["WebEnv"] == "WEBENV_1" and posted[0]["retstart"] == 0
+    assert retriever.db.select_paper_title_abstract("111") == ("First title", "First abstract", False)
+
+def test_partition_cached_pmids(data_folder):
+    retriever = PubMedPaperRetriever()
+    retriever.db.upsert_many([
+        {"pmid": "1", "title": "title", "abstract": "abstract", "is_preprint": False},
+        {"pmid": "2", "html_content": "<html></html>"},
+    ])
+    cached, missing = retriever.partition_cached_pmids(["3", "2", "1"])
+    assert cached == ["1"]
+    assert missing == ["3", "2"]
+
+class _IdResolutionHandler(BaseHTTPRequestHandler):
+    """
+    A stand-in for the PMC ID converter (GET /idconv) and ELink (POST /elink).
+    """
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        pmids = query["ids"][0].split(",")
+        self.server.requests.append(("idconv", pmids))
+        records = [
+            {"pmid": pmid, "pmcid": f"PMC{pmid}", "doi": f"10.1/{pmid}"} if int(pmid) % 2 == 0
+            else {"pmid": pmid, "status": "error", "errmsg": "invalid article id"}
+            for pmid in pmids
+        ]
+        self._send_json({"status": "ok", "records": records})
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8"))
+        pmids = form["id"]
+        self.server.requests.append(("elink", pmids))
+        if self.server.elink_fails:
+            return self._send_json({"error": "unavailable"}, 503)
+        self._send_json({"linksets": [{"idurllist": [
+            {"id": pmid, "objurls": [{"url": {"value": f"https://publisher.org/{pmid}"}}]}
+            for pmid in pmids if pmid != "3"
+        ]}]})
+
+    def _send_json(self, data: dict, status: int = 200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def id_resolution_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _IdResolutionHandler)
+    server.requests = []
+    server.elink_fails = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr("src.paper_query.pubmed_query.IDCONV_URL", f"{base_url}/idconv")
+    monkeypatch.setattr("src.paper_query.pubmed_query.ELINK_URL", f"{base_url}/elink")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_resolve_article_ids(id_resolution_server, data_folder):
+    retriever = PubMedPaperRetriever()
+    assert retriever.select_article_ids("2") is None
+    assert retriever.resolve_article_ids(["1", "2", "3", "4"], batch_size=3) == 4
+    # one converter request per batch, ELink only for the papers that aren't in PMC
+    assert id_resolution_server.requests == [
+        ("idconv", ["1", "2", "3"]),
+        ("elink", ["1", "3"]),
+        ("idconv", ["4"]),
+    ]
+    assert retriever.select_article_ids("2") == ArticleIds(
+        "PMC2", "10.1/2", "https://www.ncbi.nlm.nih.gov/pmc/articles/PMC2",
+    )
+    assert retriever.select_article_ids("1") == ArticleIds(None, None, "https://publisher.org/1")
+    assert retriever.select_article_ids("3") == ArticleIds(None, None, None)
+
+    # resolved papers are not requested again
+    id_resolution_server.requests.clear()
+    assert retriever.resolve_article_ids(["1", "2", "5"]) == 1
+    assert id_resolution_server.requests == [("idconv", ["5"]), ("elink", ["5"])]
+
+def test_resolve_article_ids_retries_failed_requests(id_resolution_server, data_folder):
+    retriever = PubMedPaperRetriever()
+    id_resolution_server.elink_fails = True
+    # the PMC paper is resolved, the other one depends on the failed ELink request
+    assert retriever.resolve_article_ids(["1", "2"]) == 1
+    assert retriever.select_article_ids("1") is None
+    assert retriever.select_article_ids("2").pmcid == "PMC2"
+
+    id_resolution_server.elink_fails = False
+    id_resolution_server.requests.clear()
+    assert retriever.resolve_article_ids(["1", "2"]) == 1
+    assert id_resolution_server.requests == [("idconv", ["1"]), ("elink", ["1"])]
+    assert retriever.select_article_ids("1") == ArticleIds(None, None, "https://publisher.org/1")
+
+def test_request_article_routes_by_article_ids(monkeypatch):
+    requested = []
+    retriever = ArticleRetriever()
+    monkeypatch.setattr(retriever, "_request_pmc_full_text", lambda pmid: requested.append(("pmc", pmid)) or (True, "pmc", 200))
+    monkeypatch.setattr(retriever, "_request_full_text_from_url", lambda url: requested.append(("url", url)) or (True, "article", 200))
+    monkeypatch.setattr(
+        retriever,
+        "_extract_full_text_url_from_abstract_page",
+        lambda pmid: requested.append(("abstract", pmid)) or (True, "https://abstract.org/1", 200),
+    )
+
+    assert retriever.request_article("1", ArticleIds("PMC1", None, None)) == (True, "pmc", 200)
+    assert retriever.request_article("2", ArticleIds(None, "10.1/2", "https://doi.org/10.1/2")) == (True, "article", 200)
+    assert requested == [("pmc", "PMC1"), ("url", "https://doi.org/10.1/2")]
+
+    # without a full-text link the abstract page is scraped, skipping the PMC request
+    requested.clear()
+    retriever.request_article("3", ArticleIds(None, None, None))
+    assert requested == [("abstract", "3"), ("url", "https://abstract.org/1")]
+
+    # the abstract page links to the full-text link that failed, it isn't requested twice
+    requested.clear()
+    monkeypatch.setattr(retriever, "_request_full_text_from_url", lambda url: requested.append(("url", url)) or (False, "failed", 500))
+    assert retriever.request_article("4", ArticleIds(None, None, "https://abstract.org/1")) == (False, "failed", 500)
+    assert requested == [("url", "https://abstract.org/1"), ("abstract", "4")]
@@ -0,0 +1,92 @@
+
+import asyncio
+import threading
+import time
+
+from src.paper_query.rate_limiter import (
+    SqliteTokenBucket,
+    TokenBucket,
+    get_ncbi_page_rate_limiter,
+    get_ncbi_rate_limiter,
+    reset_rate_limiters,
+)
+
+def _acquire_times(bucket: TokenBucket, threads: int, calls: int) -> list[float]:
+    times = []
+    lock = threading.Lock()
+
+    def work():
+        for _ in range(calls):
+            bucket.acquire()
+            with lock:
+                times.append(time.monotonic())
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sorted(times)
+
+def test_TokenBucket_limits_threads():
+    bucket = TokenBucket(rate=50.0)
+    times = _acquire_times(bucket, threads=4, calls=5)
+    # 20 tokens at 50/s, the first one is available immediately
+    assert times[-1] - times[0] >= 19 / 50 - 0.01
+
+def test_TokenBucket_limits_coroutines_and_threads_together():
+    bucket = TokenBucket(rate=50.0)
+
+    async def acquire_many():
+        await asyncio.gather(*[bucket.aacquire() for _ in range(10)])
+
+    start = time.monotonic()
+    thread = threading.Thread(target=lambda: [bucket.acquire() for _ in range(10)])
+    thread.start()
+    asyncio.run(acquire_many())
+    thread.join()
+    assert time.monotonic() - start >= 19 / 50 - 0.01
+
+def test_TokenBucket_burst_after_idle():
+    bucket = TokenBucket(rate=100.0, capacity=5.0)
+    assert [bucket.reserve() for _ in range(5)] == [0.0] * 5
+    assert bucket.reserve() > 0
+
+def test_SqliteTokenBucket_shares_tokens(data_folder):
+    # two buckets with the same name share one budget, like two processes do
+    buckets = [SqliteTokenBucket("test", rate=10.0), SqliteTokenBucket("test", rate=10.0)]
+    waits = [buckets[ix % 2].reserve() for ix in range(4)]
+    assert waits[0] == 0.0
+    assert waits[1:] == sorted(waits[1:])
+    assert waits[3] >= 0.25
+
+def test_ncbi_rate_depends_on_api_key(monkeypatch):
+    monkeypatch.delenv("NCBI_API_KEY", raising=False)
+    reset_rate_limiters()
+    assert get_ncbi_rate_limiter().rate == 3.0
+    monkeypatch.setenv("NCBI_API_KEY", "key")
+    reset_rate_limiters()
+    assert get_ncbi_rate_limiter().rate == 10.0
+    assert get_ncbi_rate_limiter() is get_ncbi_rate_limiter()
+    reset_rate_limiters()
+
+def test_ncbi_page_requests_stay_at_the_keyless_rate(monkeypatch):
+    monkeypatch.delenv("NCBI_API_KEY", raising=False)
+    reset_rate_limiters()
+    assert get_ncbi_page_rate_limiter() is get_ncbi_rate_limiter()
+    # the page requests don't send the api key
+    monkeypatch.setenv("NCBI_API_KEY", "key")
+    reset_rate_limiters()
+    assert get_ncbi_page_rate_limiter().rate == 3.0
+    assert get_ncbi_rate_limiter().rate == 10.0
+    reset_rate_limiters()
+
+def test_SqliteTokenBucket_aacquire(data_folder):
+    bucket = SqliteTokenBucket("test", rate=50.0)
+
+    async def acquire_many():
+        await asyncio.gather(*[bucket.aacquire() for _ in range(5)])
+
+    start = time.monotonic()
+    asyncio.run(acquire_many())
+    assert time.monotonic() - start >= 4 / 50 - 0.01
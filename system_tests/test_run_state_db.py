@@ -0,0 +1,30 @@
+
+from src.database.run_state_db import RunStateDB
+
+def test_RunStateDB_finished_pmids(data_folder):
+    db = RunStateDB()
+    assert db.select_finished("scope", "identify") == {}
+
+    for pmid in ["1", "2", "3", "4"]:
+        assert db.mark_started("scope", pmid, "identify")
+    db.mark_done("scope", "1", "identify", True)
+    db.mark_done("scope", "2", "identify", False)
+    db.mark_failed("scope", "3", "identify", "RuntimeError('boom')")
+    # "4" is still running, e.g. the process was killed
+    db.mark_done("other_scope", "4", "identify", True)
+
+    assert db.select_finished("scope", "identify") == {"1": True, "2": False}
+    assert db.select_finished("other_scope", "identify") == {"4": True}
+    assert db.select_finished("scope", "other_stage") == {}
+
+def test_RunStateDB_retry(data_folder):
+    db = RunStateDB()
+    db.mark_started("scope", "1", "identify")
+    db.mark_failed("scope", "1", "identify", "timeout")
+    db.mark_started("scope", "1", "identify")
+    db.mark_done("scope", "1", "identify", True)
+    assert db.select_finished("scope", "identify") == {"1": True}
+    row = db._connect_db().execute(
+        "SELECT status, error, attempts FROM run_state WHERE scope = 'scope' AND pmid = '1';"
+    ).fetchone()
+    assert row == ("done", None, 2)
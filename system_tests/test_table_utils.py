@@ -0,0 +1,35 @@
+
+from bs4 import BeautifulSoup
+
+from src.paper_query.table_utils import html_table_to_markdown
+
+def test_html_table_to_markdown_spans():
+    html = (
+        "<table><thead><tr><th rowspan='2'>Group</th><th colspan='2'>Donors</th></tr>"
+        "<tr><th>Male</th><th>Female<sup>a</sup></th></tr></thead>"
+        "<tbody><tr><td>Control</td><td rowspan='2'>6</td><td>6</td></tr>"
+        "<tr><td>PD</td><td>5<sup>b</sup></td></tr></tbody></table>"
+    )
+    assert html_table_to_markdown(html) == "\n".join([
+        "| Group | Donors | Donors |",
+        "| Group | Male | Female |",
+        "| --- | --- | --- |",
+        "| Control | 6 | 6 |",
+        # the rowspan in the middle of the row keeps its column
+        "| PD | 6 | 5 |",
+    ])
+
+def test_html_table_to_markdown_on_parsed_tag():
+    html = "<div class='xtable'><table><tr><th>A</th><th>B</th></tr><tr><td>1<sup>*</sup></td></tr></table></div>"
+    soup = BeautifulSoup(html, "html.parser")
+    expected = "| A | B |\n| --- | --- |\n| 1 |  |"
+    assert html_table_to_markdown(soup.div) == expected
+    assert html_table_to_markdown(soup.table) == expected
+    assert html_table_to_markdown(html) == expected
+    # superscripts are skipped, not removed from the tree
+    assert soup.find("sup") is not None
+
+def test_html_table_to_markdown_invalid_spans():
+    html = "<table><tr><td colspan='50%'>a</td><td rowspan='0'>b</td></tr><tr><td>c</td></tr></table>"
+    assert html_table_to_markdown(html) == "| a | b |\n| --- | --- |\n| c | b |"
+    assert html_table_to_markdown("<p>no table</p>") == ""
@@ -0,0 +1,51 @@
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.paper_query import user_agents
+from src.paper_query.constants import headers
+
+@pytest.fixture
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(user_agents, "_user_agent_pool", None)
+
+def test_user_agent_pool_is_built_once(fresh_pool, monkeypatch):
+    built = []
+
+    class CountingUserAgent:
+        def __init__(self):
+            built.append(self)
+            self._count = 0
+
+        @property
+        def chrome(self):
+            self._count += 1
+            return f"chrome-{self._count % 3}"
+
+    monkeypatch.setattr(user_agents, "UserAgent", CountingUserAgent)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: user_agents.build_request_headers(), range(64)))
+
+    assert len(built) == 1
+    assert user_agents.get_user_agent_pool() == ("chrome-1", "chrome-2", "chrome-0")
+    assert {res["User-Agent"] for res in results} == {"chrome-0", "chrome-1", "chrome-2"}
+
+def test_user_agent_pool_falls_back(fresh_pool, monkeypatch):
+    def broken_user_agent():
+        raise RuntimeError("no database")
+
+    monkeypatch.setattr(user_agents, "UserAgent", broken_user_agent)
+    assert user_agents.get_user_agent_pool() == (user_agents.FALLBACK_USER_AGENT,)
+
+def test_build_request_headers_copies(fresh_pool):
+    original = dict(headers)
+    first = user_agents.build_request_headers()
+    second = user_agents.build_request_headers()
+
+    assert first is not second
+    assert "user-agent" not in first
+    assert first["accept"] == headers["accept"]
+    with pytest.raises(TypeError):
+        first["User-Agent"] = "changed"
+    assert dict(headers) == original
@@ -0,0 +1,47 @@
+
+from src.workflow.workflow_utils import (
+    convert_html_to_plaintext,
+    extract_plaintext_and_sections,
+    merge_extra_sections,
+)
+
+def _read_sample(fn: str) -> str:
+    with open(fn, "r") as f:
+        return f.read()
+
+def test_convert_html_to_plaintext_emits_sections_once():
+    html = _read_sample("system_tests/data/sample_pmc_article.html")
+    plaintext = convert_html_to_plaintext(html)
+    # data availability and methods are part of the sections already
+    assert plaintext.count("GSE184950") == 1
+    assert plaintext.count("10x Genomics") == 1
+    # the table of div.xtable is converted once
+    assert plaintext.count("| Control | 6 | 6 |") == 1
+
+def test_extract_plaintext_and_sections_indexes_sections():
+    html = _read_sample("system_tests/data/sample_pmc_article.html")
+    plaintext, sections = extract_plaintext_and_sections(html)
+    assert plaintext == convert_html_to_plaintext(html)
+    assert [sec["section"] for sec in sections][:3] == ["Abstract", "Introduction", "Results"]
+    for sec in sections:
+        assert plaintext[sec["start"]:sec["end"]].startswith(sec["section"])
+    data_availability = sections[-1]
+    assert "GSE184950" in plaintext[data_availability["start"]:data_availability["end"]]
+    assert data_availability["end"] == len(plaintext)
+
+def test_merge_extra_sections():
+    sections = [
+        {"section": "Abstract", "content": "Abstract text."},
+        {"section": "Data availability", "content": "Data are in GEO."},
+    ]
+    merged = merge_extra_sections(sections, [
+        # covers the section of the same heading, replaces it in place
+        {"section": "Data Availability", "content": "Data are in GEO.\nCode is on GitHub."},
+        {"section": "Methods", "content": "New methods text."},
+        {"section": "Methods", "content": "abstract   TEXT."},
+    ])
+    assert merged == [
+        {"section": "Abstract", "content": "Abstract text."},
+        {"section": "Data availability", "content": "Data are in GEO.\nCode is on GitHub."},
+        {"section": "Methods", "content": "New methods text."},
+    ]